@@ -0,0 +1,240 @@
+import sys, os, time, types, uuid, datetime, argparse, statistics, subprocess, contextlib, typing
+
+import sqlalchemy as sqla
+from sqlalchemy import orm as sqla_orm
+from sqlalchemy.dialects import postgresql as sqla_pg
+from sqlalchemy.ext import hybrid as sqla_hyb
+
+# run from a source checkout without 'pip install -e .'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from europy_db_controllers import controller, _controller_base, _controller_attr, \
+                                  _controller_obj_setup, _controller_json
+from europy_db_controllers.entity_capsules import capsule_main, _capsule_utils
+
+######################################################################################
+# Startup benchmark of the capsule and controller setup
+#   - generates synthetic declarative schemas ('tbl_<i>' tables) with
+#       - a FK chain: tbl_<i> refers to tbl_<i-1> (list 'tbl_<i>s' on tbl_<i-1>)
+#       - data columns of the types supported by _capsule_utils.dictSqlaToType
+#       - 'name' columns, '_display_lists' and hybrid properties
+#   - times each setup phase (capsule_main.CAPSULE_SETUP_PHASES and the steps of
+#     controller.setupControllerClass) and the import of europy_db_controllers
+#
+#   usage: python benchmarks/bench_setup.py --tables 10 50 200 --columns 8 --repeat 5
+######################################################################################
+
+DATA_COLUMN_TYPES = [sqla.FLOAT, sqla.String, sqla.Integer, sqla.BOOLEAN, sqla.DateTime]
+CHANGE_TRACK_FIELDS = ['created_at', 'modified_at']
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Synthetic schema
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def getTableName(tableIndex: int) -> str:
+  return f"tbl_{tableIndex}"
+def getTableTypeName(tableIndex: int) -> str:
+  return _capsule_utils.getSqlalchemyTableTypeFromBaseName(
+                _capsule_utils.getBaseNameFromString(getTableName(tableIndex)))
+def getListName(tableIndex: int) -> str:
+  return f"{getTableName(tableIndex)}s"
+
+def makeSchema(numberOfTables: int,
+               numberOfColumns: int,
+               nameEvery: int = 2,
+               displayListEvery: int = 3,
+               withHybridProperties: bool = True) -> typing.Dict[str, typing.Any]:
+  # returns the 'callingGlobals' holding the declarative base and the table types
+  result: typing.Dict[str, typing.Any] = {}
+  declarativeBase = types.new_class("BenchBase", (sqla_orm.DeclarativeBase,))
+  result['BenchBase'] = declarativeBase
+  for tableIndex in range(numberOfTables):
+    tableName = getTableName(tableIndex)
+    namespace: typing.Dict[str, typing.Any] = {
+          '__tablename__': tableName,
+          '_changeTrackFields': CHANGE_TRACK_FIELDS,
+          '_exclude_from_json': [],
+          '_display_lists': [],
+          '_sorted_by': None,
+          'id': sqla.Column(sqla_pg.UUID(as_uuid = True), primary_key = True, default = uuid.uuid4),
+          'created_at': sqla.Column(sqla.DateTime, default = datetime.datetime.now),
+          'modified_at': sqla.Column(sqla.DateTime, default = datetime.datetime.now)}
+    if tableIndex % nameEvery == 0:
+      namespace['name'] = sqla.Column(sqla.String, unique = True)
+      namespace['_sorted_by'] = ['name']
+    for columnIndex in range(numberOfColumns):
+      columnType = DATA_COLUMN_TYPES[columnIndex % len(DATA_COLUMN_TYPES)]
+      namespace[f"col_{columnIndex}"] = sqla.Column(columnType)
+    if withHybridProperties and numberOfColumns > 0:
+      # FLOAT column 'col_0' -> read only column like property
+      namespace['col_0_doubled'] = sqla_hyb.hybrid_property(
+                  lambda self: None if self.col_0 is None else self.col_0 * 2)
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # FK chain
+    if tableIndex > 0:
+      parentName = getTableName(tableIndex - 1)
+      namespace[f"{parentName}_id"] = sqla.Column(sqla_pg.UUID(as_uuid = True),
+                                                  sqla.ForeignKey(f"{parentName}.id"))
+      namespace[parentName] = sqla_orm.relationship(getTableTypeName(tableIndex - 1),
+                                                    back_populates = getListName(tableIndex))
+    if tableIndex < numberOfTables - 1:
+      listName = getListName(tableIndex + 1)
+      namespace[listName] = sqla_orm.relationship(getTableTypeName(tableIndex + 1),
+                                                  back_populates = tableName)
+      if (tableIndex + 1) % displayListEvery == 0:
+        namespace['_display_lists'] = [listName]
+        namespace['_exclude_from_json'] = [listName]
+    tableTypeName = getTableTypeName(tableIndex)
+    result[tableTypeName] = types.new_class(tableTypeName, (declarativeBase,), {},
+                                            lambda ns: ns.update(namespace))
+  sqla_orm.configure_mappers()
+  return result
+
+# Sub-controllers of 'tablesPerController' capsule types each and the head 'Controller'
+def makeControllers(callingGlobals: typing.Dict[str, typing.Any],
+                    capsuleList: typing.List[type],
+                    tablesPerController: int) -> typing.Tuple[typing.List[str], type]:
+  subControllerTypes = []
+  for position in range(0, len(capsuleList), tablesPerController):
+    subControllerIndex = len(subControllerTypes)
+    subControllerType = types.new_class(f"Sub{subControllerIndex}", (_controller_base.ControllerBase,), {},
+                      lambda ns: ns.update({'_key': f"sub_{subControllerIndex}",
+                                            '_content': capsuleList[position:position + tablesPerController]}))
+    callingGlobals[subControllerType.__name__] = subControllerType
+    subControllerTypes.append(subControllerType)
+  def controllerInit(self, session: sqla_orm.Session) -> None:
+    _controller_base.ControllerBase.__init__(self, session)
+    for subControllerType in subControllerTypes:
+      setattr(self, subControllerType._key, subControllerType(session))
+  callingGlobals['Controller'] = types.new_class("Controller", (_controller_base.ControllerBase,), {},
+                      lambda ns: ns.update({'_key': "",
+                                            '_subControllerTypes': subControllerTypes,
+                                            '__init__': controllerInit}))
+  controllerKeyEnumType = _controller_base.BaseControllerKeyEnum(
+                      "BenchControllerKeyEnum",
+                      {subControllerType._key.upper(): subControllerType._key \
+                          for subControllerType in subControllerTypes})
+  return [subControllerType.__name__ for subControllerType in subControllerTypes] + ['Controller'], \
+         controllerKeyEnumType
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Timing of the setup phases
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def getTimedFnc(fnc: typing.Callable,
+                phaseName: str,
+                timings: typing.Dict[str, float]) -> typing.Callable:
+  def timedFnc(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+      return fnc(*args, **kwargs)
+    finally:
+      timings[phaseName] = timings.get(phaseName, 0.0) + time.perf_counter() - start
+  return timedFnc
+
+@contextlib.contextmanager
+def timedPhases(timings: typing.Dict[str, float]):
+  # capsule setup phases
+  capsuleSetupPhases = list(capsule_main.CAPSULE_SETUP_PHASES)
+  capsule_main.CAPSULE_SETUP_PHASES[:] = [
+        getTimedFnc(fnc = setupPhase,
+                    phaseName = "capsule" + setupPhase.__name__.lstrip("_").removeprefix("add"),
+                    timings = timings) for setupPhase in capsuleSetupPhases]
+  # controller setup steps (module functions looked up by controller.setupControllerClass)
+  controllerSteps = [(_controller_attr, 'addAttributes'),
+                     (_controller_obj_setup, 'addSetupMethods'),
+                     (_controller_json, 'addDictFunctions')]
+  originalFncs = [getattr(module, fncName) for module, fncName in controllerSteps]
+  for (module, fncName), originalFnc in zip(controllerSteps, originalFncs):
+    setattr(module, fncName, getTimedFnc(fnc = originalFnc,
+                                         phaseName = "controller" + fncName.removeprefix("add"),
+                                         timings = timings))
+  try:
+    yield timings
+  finally:
+    capsule_main.CAPSULE_SETUP_PHASES[:] = capsuleSetupPhases
+    for (module, fncName), originalFnc in zip(controllerSteps, originalFncs):
+      setattr(module, fncName, originalFnc)
+
+def runSetup(numberOfTables: int,
+             arguments: argparse.Namespace) -> typing.Dict[str, float]:
+  callingGlobals = makeSchema(numberOfTables = numberOfTables,
+                              numberOfColumns = arguments.columns,
+                              nameEvery = arguments.name_every,
+                              displayListEvery = arguments.display_list_every,
+                              withHybridProperties = not arguments.no_hybrid)
+  capsuleList = []
+  timings: typing.Dict[str, float] = {}
+  with timedPhases(timings = timings):
+    start = time.perf_counter()
+    capsule_main.setupCapsules(declarativeBase = callingGlobals['BenchBase'],
+                               capsuleList = capsuleList,
+                               callingGlobals = callingGlobals,
+                               codeCacheDir = arguments.code_cache_dir,
+                               lazy = arguments.lazy)
+    timings['capsuleTotal'] = time.perf_counter() - start
+    controllerTypeNames, controllerKeyEnumType = makeControllers(
+                              callingGlobals = callingGlobals,
+                              capsuleList = capsuleList,
+                              tablesPerController = arguments.tables_per_controller)
+    start = time.perf_counter()
+    controller.setupControllerClass(callingGlobals = callingGlobals,
+                                    controllerTypeNames = controllerTypeNames,
+                                    controllerTypeEnumType = controllerKeyEnumType,
+                                    codeCacheDir = arguments.code_cache_dir)
+    timings['controllerTotal'] = time.perf_counter() - start
+  return timings
+
+# Import time of the package measured in a fresh interpreter
+def getImportTime() -> float:
+  code = "import time; start = time.perf_counter(); " + \
+         "import europy_db_controllers.controller, europy_db_controllers.entity_capsules.capsule_main; " + \
+         "print(time.perf_counter() - start)"
+  environment = dict(os.environ)
+  environment['PYTHONPATH'] = os.pathsep.join([sys.path[0], environment.get('PYTHONPATH', '')])
+  output = subprocess.run([sys.executable, "-c", code], capture_output = True, text = True,
+                          check = True, env = environment)
+  return float(output.stdout.strip())
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def getArguments() -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description = "Startup benchmark of capsule and controller setup")
+  parser.add_argument("--tables", type = int, nargs = "+", default = [10, 50, 200],
+                      help = "numbers of tables of the synthetic schemas")
+  parser.add_argument("--columns", type = int, default = 8,
+                      help = "data columns per table")
+  parser.add_argument("--name-every", type = int, default = 2,
+                      help = "every n-th table has a 'name' column")
+  parser.add_argument("--display-list-every", type = int, default = 3,
+                      help = "every n-th list relationship is a display list")
+  parser.add_argument("--no-hybrid", action = "store_true",
+                      help = "omit the hybrid properties")
+  parser.add_argument("--tables-per-controller", type = int, default = 10)
+  parser.add_argument("--repeat", type = int, default = 3,
+                      help = "repetitions per schema size (median reported)")
+  parser.add_argument("--import-repeat", type = int, default = 5)
+  parser.add_argument("--lazy", action = "store_true",
+                      help = "lazy capsule setup (see capsule_main.setupCapsules)")
+  parser.add_argument("--code-cache-dir", default = None,
+                      help = "directory of the code cache (see utils.code_cache)")
+  return parser.parse_args()
+
+def main() -> None:
+  arguments = getArguments()
+  importTimes = [getImportTime() for _ in range(arguments.import_repeat)]
+  print(f"import europy_db_controllers: {statistics.median(importTimes) * 1000:10.1f} ms " + \
+        f"(median of {arguments.import_repeat})")
+  for numberOfTables in arguments.tables:
+    runs = [runSetup(numberOfTables = numberOfTables,
+                     arguments = arguments) for _ in range(arguments.repeat)]
+    print(f"\n{numberOfTables} tables, {arguments.columns} columns " + \
+          f"(median of {arguments.repeat}{', lazy' if arguments.lazy else ''}):")
+    for phaseName in runs[0].keys():
+      phaseTime = statistics.median(run.get(phaseName, 0.0) for run in runs)
+      print(f"  {phaseName:<40}{phaseTime * 1000:10.1f} ms")
+
+if __name__ == "__main__":
+  main()
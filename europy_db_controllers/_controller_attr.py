@@ -7,7 +7,7 @@ from sqlalchemy import orm as sqlalchemy_orm
 import sqlalchemy
 
 
-from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils 
+from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils, _capsule_json
 from europy_db_controllers import _controller_base, _controller_utils
 
 T = typing.TypeVar("T", bound=_controller_base.ControllerBase)
@@ -24,13 +24,38 @@ def __addCapsuleAttributes(controllerType: type[T],
               scope: _controller_base.ControllerDataScopes = 
                      _controller_base.ControllerDataScopes.NEW_AND_DIRTY,
               sortedBy: str = "",
-              filterConditions: typing.Dict[str, any] = None):
+              filterConditions: typing.Dict[str, any] = None,
+              forExport: bool = False):
+    # forExport: eager loading of the relationships read by 'toDict' (see _capsule_json)
+    loaderOptions = _capsule_json.getToDictLoaderOptions(capsuleType = capsuleType) \
+                      if forExport else None
+    if scope == _controller_base.ControllerDataScopes.STORED_ON_DB:
+      # sorted by sql and streamed in batches (no new or dirty objects to merge)
+      orderByClauses = _controller_utils.getDbOrderByClauses(capsuleType = capsuleType,
+                                                              sortedBy = sortedBy)
+      if not orderByClauses is None:
+        _controller_utils.checkNoNewOrDirtySqlalchemyTables(capsuleType = capsuleType,
+                                                            controllerType = controllerType,
+                                                            self = self,
+                                                            scope = scope,
+                                                            filterConditions = filterConditions)
+        for sqlalchemyTable in _controller_utils.iterDbSqlalchemyTables(
+                                    capsuleType = capsuleType,
+                                    session = self.session,
+                                    orderByClauses = orderByClauses,
+                                    filterConditions = filterConditions,
+                                    loaderOptions = loaderOptions):
+          yield capsuleType.defineBySqlalchemyTable(
+                    session = self.session,
+                    sqlalchemyTableEntity = sqlalchemyTable)
+        return
     sqlalchemyTables = _controller_utils.getSqlAlchemyTablesOfScope(
                             capsuleType = capsuleType,
                             controllerType = controllerType, 
                             self = self, 
                             scope = scope,
-                            filterConditions = filterConditions)
+                            filterConditions = filterConditions,
+                            loaderOptions = loaderOptions)
     # Sorting of sqlalchemyTables
     if not sortedBy is None: # 'None' is explicitly not sorted
       if len(sortedBy) > 0: # sort as specified on input
@@ -47,19 +72,54 @@ def __addCapsuleAttributes(controllerType: type[T],
                 sqlalchemyTableEntity = sqlalchemyTable)
   def lenOfFnc(self: T, 
                scope: _controller_base.ControllerDataScopes = 
-                      _controller_base.ControllerDataScopes.NEW_AND_DIRTY) -> bool:
-    sqlalchemyTables = _controller_utils.getSqlAlchemyTablesOfScope(
-                            capsuleType = capsuleType,
-                            controllerType = controllerType, 
-                            self = self, 
-                            scope = scope)
-    return len(sqlalchemyTables)
+                      _controller_base.ControllerDataScopes.NEW_AND_DIRTY,
+               filterConditions: typing.Dict[str, any] = None) -> int:
+    return _controller_utils.getLenOfScope(capsuleType = capsuleType,
+                                           controllerType = controllerType, 
+                                           self = self, 
+                                           scope = scope,
+                                           filterConditions = filterConditions)
+  # page of capsules stored on the db (keyset pagination)
+  #   -> (<list of capsules>, <cursor of the next page - 'None' if last page>)
+  def pageOfFnc(self: T,
+                pageSize: int = 100,
+                cursor: str = None,
+                sortedBy: str = "",
+                filterConditions: typing.Dict[str, any] = None,
+                scope: _controller_base.ControllerDataScopes = 
+                       _controller_base.ControllerDataScopes.STORED_ON_DB
+                ) -> typing.Tuple[typing.List[CT], str]:
+    if scope != _controller_base.ControllerDataScopes.STORED_ON_DB:
+      fncName = _controller_utils.getCapsuleTypePageOfFncName(capsuleType)
+      errMsg = f"[Unsupported data scope] - {fncName} on {controllerType.__name__}\n" + \
+               f"Pages are provided for the scope {_controller_base.ControllerDataScopes.STORED_ON_DB.name} " + \
+               f"only. Scope specified: {scope.name}."
+      self._raiseException(errMsg)
+    _controller_utils.checkNoNewOrDirtySqlalchemyTables(capsuleType = capsuleType,
+                                                        controllerType = controllerType,
+                                                        self = self,
+                                                        scope = scope,
+                                                        filterConditions = filterConditions)
+    sqlalchemyTables, nextCursor = _controller_utils.getDbSqlalchemyTablesPage(
+                                        capsuleType = capsuleType,
+                                        session = self.session,
+                                        pageSize = pageSize,
+                                        cursor = cursor,
+                                        sortedBy = sortedBy,
+                                        filterConditions = filterConditions)
+    capsules = [capsuleType.defineBySqlalchemyTable(session = self.session,
+                                                    sqlalchemyTableEntity = sqlalchemyTable) \
+                  for sqlalchemyTable in sqlalchemyTables]
+    return capsules, nextCursor
   iterFncDecorated = _controller_base.cleanAndCloseSession(iterFnc)
   lenOfFncDecorated = _controller_base.cleanAndCloseSession(lenOfFnc)
+  pageOfFncDecorated = _controller_base.cleanAndCloseSession(pageOfFnc)
   fncNameIter = _controller_utils.getCapsuleTypeIterFncName(capsuleType)
   fncNameLenOf = _controller_utils.getCapsuleTypeLenOfFncName(capsuleType)
+  fncNamePageOf = _controller_utils.getCapsuleTypePageOfFncName(capsuleType)
   setattr(controllerType, fncNameIter, iterFncDecorated)     
   setattr(controllerType, fncNameLenOf, lenOfFncDecorated)     
+  setattr(controllerType, fncNamePageOf, pageOfFncDecorated)     
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # the key used in json
   sqlalchemyTableType = capsuleType.sqlalchemyTableType
@@ -73,7 +133,8 @@ def __addControllerTypeAttributes(controllerType: type[T]):
   def iterByKeyFnc(self: T,
                    capsuleKey: str,
                    scope: _controller_base.ControllerDataScopes = 
-                          _controller_base.ControllerDataScopes.NEW_AND_DIRTY):
+                          _controller_base.ControllerDataScopes.NEW_AND_DIRTY,
+                   forExport: bool = False):
     capsuleType: CT = None
     if len(capsuleTypes) == 0: return None
     for thisCapsuleType in capsuleTypes:
@@ -82,7 +143,8 @@ def __addControllerTypeAttributes(controllerType: type[T]):
         capsuleType = thisCapsuleType
         break
     capsuleIterAttributeName = _controller_utils.getCapsuleTypeIterFncName(capsuleType)
-    for capsule in getattr(self, capsuleIterAttributeName)(scope = scope):
+    for capsule in getattr(self, capsuleIterAttributeName)(scope = scope,
+                                                                 forExport = forExport):
       yield capsule
   def lenOfByKeyFnc(self: T,
                     capsuleKey: str,
@@ -104,15 +166,24 @@ def __addControllerTypeAttributes(controllerType: type[T]):
 
 def __addGetValidationItemsAttribute(controllerType: type[T]):
   validationItemsFncName = _capsule_utils.getValidationItemsFncName()
+  # the validation items of the controller's capsule types (computed on first call)
+  controllerValidationItems: typing.List[typing.Tuple[type[CT], ...]] = []
+  def getControllerValidationItems() -> typing.Tuple[type[CT], ...]:
+    if len(controllerValidationItems) == 0:
+      result: typing.List[type[CT]] = []
+      for content in controllerType._content:
+        for capsuleValidationItem in getattr(content, validationItemsFncName)():
+          if not capsuleValidationItem in result:
+            result.append(capsuleValidationItem)
+      controllerValidationItems.append(tuple(result))
+    return controllerValidationItems[0]
   def getterFnc(self,
-                validationItems: typing.List[type[CT]] = list[type[CT]]()
+                validationItems: typing.List[type[CT]] = None
                 ) -> typing.List[type[CT]]:
-    result: typing.List[type[CT]] = validationItems
-    for content in self._content:
-      capsuleValidationItems = getattr(content, validationItemsFncName)()
-      for capsuleValidationItem in capsuleValidationItems:
-        if not capsuleValidationItem in result:
-          result.append(capsuleValidationItem)
+    result: typing.List[type[CT]] = [] if validationItems is None else validationItems
+    for capsuleValidationItem in getControllerValidationItems():
+      if not capsuleValidationItem in result:
+        result.append(capsuleValidationItem)
     return result
   propertyGetter = classmethod(getterFnc)
   setattr(controllerType, validationItemsFncName, propertyGetter)    
@@ -3,6 +3,8 @@ from __future__ import annotations
 import sys, enum
 from sqlalchemy import orm as sqlalchemy_orm
 
+from europy_db_controllers.entity_capsules import capsule_type_index
+
 
 HEAD_KEY = "head"
 # BASIC_SPECIFICATION_KEY = "basic_specification"
@@ -85,9 +87,16 @@ class ControllerBase():
   _content = []
   _subControllerTypes = []
   _headSubControllerType = None
+  # the scopes of the capsule types (and exports) read the new, dirty and persistent 
+  #   objects of the session from its type index (enabled on the session by the
+  #   controller - see capsule_type_index) / 'False' - the session is scanned per 
+  #   capsule type
+  _type_index = True
   def __init__(self,
                session: sqlalchemy_orm.Session) -> None:
     self.session = session
+    if self._type_index and session is not None:
+      capsule_type_index.enableTypeIndex(session = session)
   
   def _raiseException(self, errMsg: str): 
     self.session.expunge_all()
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import typing, re
+
+from sqlalchemy.ext import declarative as sqlalchemy_decl
+from sqlalchemy import orm as sqlalchemy_orm
+import sqlalchemy
+
+
+FILTER_PATH_SEPARATOR = '.'
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Filter operators - the value of a filter condition is either
+#   - a plain value (equality) or
+#   - a dict of operators and their operands (all to be met), e.g.
+#       {'trade_date': {'>=': datetime.date(2024, 1, 1), '<': datetime.date(2025, 1, 1)},
+#        'portfolio.name': {'in': ['p1', 'p2']},
+#        'name': {'startswith': 'EUR'},
+#        'closed_at': {'is null': True}}
+#   - sql semantics for session objects: 'None' values only match '==' / 'is null' 
+#     (and '!=' to a non-None operand is not met by 'None' values)
+#   - 'like' patterns ('%', '_') are matched case sensitive on session objects
+def __likeToRegex(pattern: str) -> re.Pattern:
+  regex = "".join(".*" if char == '%' else "." if char == '_' else re.escape(char) \
+                      for char in pattern)
+  return re.compile(f"^{regex}$", re.DOTALL)
+def __getInValues(operand: typing.Iterable[any]) -> typing.Collection[any]:
+  operand = list(operand)
+  try:
+    return frozenset(operand)
+  except TypeError: # unhashable values
+    return operand
+def __getBetweenBounds(operand: typing.Sequence[any]) -> typing.Tuple[any, any]:
+  if not isinstance(operand, (list, tuple)) or len(operand) != 2:
+    raise ValueError(f"[Filter operator 'between'] Two bounds ([lower, upper]) required. Provided: {operand}")
+  return operand[0], operand[1]
+
+# {<operator>: (<sql criterion of column and operand>, 
+#               <python predicate of the compiled operand and the attribute value>,
+#               <compiler of the operand for the python predicate>)}
+FILTER_OPERATORS: typing.Dict[str, typing.Tuple[typing.Callable, typing.Callable, typing.Callable]] = {
+  '==': (lambda column, operand: column == operand,
+         lambda value, operand: value == operand,
+         lambda operand: operand),
+  '!=': (lambda column, operand: column != operand,
+         lambda value, operand: value is not None if operand is None else \
+                                (value is not None and value != operand),
+         lambda operand: operand),
+  '<':  (lambda column, operand: column < operand,
+         lambda value, operand: value is not None and value < operand,
+         lambda operand: operand),
+  '<=': (lambda column, operand: column <= operand,
+         lambda value, operand: value is not None and value <= operand,
+         lambda operand: operand),
+  '>':  (lambda column, operand: column > operand,
+         lambda value, operand: value is not None and value > operand,
+         lambda operand: operand),
+  '>=': (lambda column, operand: column >= operand,
+         lambda value, operand: value is not None and value >= operand,
+         lambda operand: operand),
+  'in': (lambda column, operand: column.in_(list(operand)),
+         lambda value, operand: value is not None and value in operand,
+         __getInValues),
+  'not in': (lambda column, operand: column.not_in(list(operand)),
+             lambda value, operand: value is not None and not value in operand,
+             __getInValues),
+  'between': (lambda column, operand: column.between(*__getBetweenBounds(operand)),
+              lambda value, operand: value is not None and operand[0] <= value <= operand[1],
+              __getBetweenBounds),
+  'like': (lambda column, operand: column.like(operand),
+           lambda value, operand: value is not None and operand.match(value) is not None,
+           __likeToRegex),
+  'startswith': (lambda column, operand: column.startswith(operand, autoescape = True),
+                 lambda value, operand: value is not None and value.startswith(operand),
+                 lambda operand: operand),
+  'is null': (lambda column, operand: column.is_(None) if operand else column.is_not(None),
+              lambda value, operand: (value is None) == bool(operand),
+              lambda operand: operand),
+}
+
+def isFilterOperatorSpec(filterValue: any) -> bool:
+  # dicts of operators only - other dicts are compared for equality
+  if not isinstance(filterValue, dict) or len(filterValue) == 0: return False
+  knownOperators = [operator in FILTER_OPERATORS for operator in filterValue.keys()]
+  if all(knownOperators): return True
+  if any(knownOperators):
+    unknownOperators = [operator for operator in filterValue.keys() if not operator in FILTER_OPERATORS]
+    raise ValueError(f"[Unknown filter operators] {unknownOperators} - supported operators: " + \
+                     f"{list(FILTER_OPERATORS.keys())}")
+  return False
+
+class FilterPredicate():
+  # the operators of the value of a filter condition (compiled once per condition)
+  def __init__(self,
+               filterValue: any) -> None:
+    operatorSpec = filterValue if isFilterOperatorSpec(filterValue) else {'==': filterValue}
+    self.operations = []
+    for operator, operand in operatorSpec.items():
+      sqlFnc, pythonFnc, operandCompiler = FILTER_OPERATORS[operator]
+      self.operations.append((sqlFnc, operand, pythonFnc, operandCompiler(operand)))
+  def getCriterion(self,
+                   column: any) -> sqlalchemy.ColumnElement:
+    criteria = [sqlFnc(column, operand) for sqlFnc, operand, _, _ in self.operations]
+    return criteria[0] if len(criteria) == 1 else sqlalchemy.and_(*criteria)
+  def evaluate(self,
+               value: any) -> bool:
+    for _, _, pythonFnc, compiledOperand in self.operations:
+      if not pythonFnc(value, compiledOperand):
+        return False
+    return True
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Compiled filter paths of 'filterConditions' (e.g. 'portfolio.client.name')
+#   - compiled once per (sqlalchemyTableType, path) - see getFilterPath
+#   - sql: many-to-one hops are joined (one alias per path prefix - conditions sharing
+#          a prefix share the join); paths with a collection hop ('one-to-many') are
+#          expressed as 'EXISTS' (any/has) in order not to multiply the rows
+#   - session objects: the path is followed along the relationship attributes
+#          (a collection hop matches if any of the related objects matches)
+class FilterHop():
+  def __init__(self,
+               relationshipName: str,
+               targetType: type[sqlalchemy_decl.DeclarativeMeta],
+               uselist: bool,
+               alias: sqlalchemy_orm.util.AliasedClass) -> None:
+    self.relationshipName = relationshipName
+    self.targetType = targetType
+    self.uselist = uselist
+    self.alias = alias
+
+class FilterPath():
+  def __init__(self,
+               sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+               filterPath: str) -> None:
+    self.sqlalchemyTableType = sqlalchemyTableType
+    self.filterPath = filterPath
+    attributeNames = filterPath.split(FILTER_PATH_SEPARATOR)
+    self.hops: typing.List[FilterHop] = []
+    self.attributeName = attributeNames[-1]
+    currentType = sqlalchemyTableType
+    for pos, attributeName in enumerate(attributeNames[:-1]):
+      relationship = sqlalchemy.inspect(currentType).relationships.get(attributeName)
+      if relationship is None:
+        path = FILTER_PATH_SEPARATOR.join(attributeNames[:pos])
+        raise AttributeError(f"Cannot find relationship '{attributeName}' in filter path '{filterPath}'. "
+                             f"Search failed at '{path}' on type {currentType.__name__}. "
+                             f"Original sqlalchemy table type: {sqlalchemyTableType.__name__}")
+      currentType = relationship.mapper.class_
+      prefixPath = FILTER_PATH_SEPARATOR.join(attributeNames[:pos + 1])
+      self.hops.append(FilterHop(relationshipName = attributeName,
+                                 targetType = currentType,
+                                 uselist = relationship.uselist,
+                                 alias = _getAlias(sqlalchemyTableType = sqlalchemyTableType,
+                                                   prefixPath = prefixPath,
+                                                   targetType = currentType)))
+    if not hasattr(currentType, self.attributeName):
+      raise AttributeError(f"Cannot find attribute '{self.attributeName}' in filter path '{filterPath}'. "
+                           f"Original sqlalchemy table type: {sqlalchemyTableType.__name__}")
+    self.hasCollectionHop = any(hop.uselist for hop in self.hops)
+
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # sql
+  def getJoins(self) -> typing.List[typing.Tuple[str, any]]:
+    # [(<prefix path>, <relationship attribute of the join>)] - no joins for 'EXISTS' paths
+    if self.hasCollectionHop: return []
+    result = []
+    parentEntity = self.sqlalchemyTableType
+    prefixPath = ""
+    for hop in self.hops:
+      prefixPath = hop.relationshipName if len(prefixPath) == 0 else \
+                   f"{prefixPath}{FILTER_PATH_SEPARATOR}{hop.relationshipName}"
+      result.append((prefixPath, getattr(parentEntity, hop.relationshipName).of_type(hop.alias)))
+      parentEntity = hop.alias
+    return result
+  def getCriterion(self,
+                   predicate: FilterPredicate) -> sqlalchemy.ColumnElement:
+    if not self.hasCollectionHop:
+      entity = self.sqlalchemyTableType if len(self.hops) == 0 else self.hops[-1].alias
+      return predicate.getCriterion(column = getattr(entity, self.attributeName))
+    # nested 'EXISTS' from the last hop backwards
+    criterion = predicate.getCriterion(column = getattr(self.hops[-1].targetType, self.attributeName))
+    for pos in range(len(self.hops) - 1, -1, -1):
+      parentType = self.sqlalchemyTableType if pos == 0 else self.hops[pos - 1].targetType
+      relationshipAttr = getattr(parentType, self.hops[pos].relationshipName)
+      criterion = relationshipAttr.any(criterion) if self.hops[pos].uselist else \
+                  relationshipAttr.has(criterion)
+    return criterion
+
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # session objects
+  def matches(self,
+              sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta,
+              predicate: FilterPredicate) -> bool:
+    return self.__matchesFrom(currentObj = sqlalchemyTable,
+                              pos = 0,
+                              predicate = predicate)
+  def __matchesFrom(self,
+                    currentObj: sqlalchemy_decl.DeclarativeMeta,
+                    pos: int,
+                    predicate: FilterPredicate) -> bool:
+    if pos == len(self.hops):
+      return predicate.evaluate(value = getattr(currentObj, self.attributeName))
+    hop = self.hops[pos]
+    relatedObj = getattr(currentObj, hop.relationshipName)
+    if relatedObj is None:
+      return False
+    if hop.uselist:
+      for relatedItem in relatedObj:
+        if self.__matchesFrom(currentObj = relatedItem, pos = pos + 1, predicate = predicate):
+          return True
+      return False
+    return self.__matchesFrom(currentObj = relatedObj, pos = pos + 1, predicate = predicate)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Caches of the compiled filter paths and of the aliases of the joined tables
+_filterPaths: typing.Dict[typing.Tuple[type, str], FilterPath] = {}
+_aliases: typing.Dict[typing.Tuple[type, str], sqlalchemy_orm.util.AliasedClass] = {}
+
+def _getAlias(sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+              prefixPath: str,
+              targetType: type[sqlalchemy_decl.DeclarativeMeta]) -> sqlalchemy_orm.util.AliasedClass:
+  aliasKey = (sqlalchemyTableType, prefixPath)
+  alias = _aliases.get(aliasKey)
+  if alias is None:
+    alias = _aliases[aliasKey] = sqlalchemy_orm.aliased(targetType)
+  return alias
+
+def getFilterPath(sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+                  filterPath: str) -> FilterPath:
+  filterPathKey = (sqlalchemyTableType, filterPath)
+  result = _filterPaths.get(filterPathKey)
+  if result is None:
+    result = _filterPaths[filterPathKey] = FilterPath(sqlalchemyTableType = sqlalchemyTableType,
+                                                      filterPath = filterPath)
+  return result
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Application of filterConditions ({<filter path>: <value or dict of operators>})
+def addDbFilterConditions(sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+                          dbQuery: typing.Union[sqlalchemy_orm.Query, sqlalchemy.Select],
+                          filterConditions: typing.Dict[str, any] = None
+                          ) -> typing.Union[sqlalchemy_orm.Query, sqlalchemy.Select]:
+  if not filterConditions: return dbQuery
+  joinedPrefixPaths = set()
+  for filterPathName, filterValue in filterConditions.items():
+    filterPath = getFilterPath(sqlalchemyTableType = sqlalchemyTableType,
+                               filterPath = filterPathName)
+    for prefixPath, joinAttr in filterPath.getJoins():
+      if prefixPath in joinedPrefixPaths: continue
+      dbQuery = dbQuery.join(joinAttr)
+      joinedPrefixPaths.add(prefixPath)
+    dbQuery = dbQuery.filter(filterPath.getCriterion(predicate = FilterPredicate(filterValue = filterValue)))
+  return dbQuery
+
+def getFilterFunction(sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+                      filterConditions: typing.Dict[str, any]
+                      ) -> typing.Callable[[sqlalchemy_decl.DeclarativeMeta], bool]:
+  compiledConditions = [(getFilterPath(sqlalchemyTableType = sqlalchemyTableType,
+                                       filterPath = filterPathName), 
+                         FilterPredicate(filterValue = filterValue)) \
+                          for filterPathName, filterValue in filterConditions.items()]
+  def filterFunction(sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta) -> bool:
+    for filterPath, predicate in compiledConditions:
+      if not filterPath.matches(sqlalchemyTable = sqlalchemyTable,
+                                predicate = predicate):
+        return False
+    return True
+  return filterFunction
@@ -1,9 +1,10 @@
-import typing, sys, json, uuid, datetime
+import typing, sys, json, uuid, datetime, contextlib
 
 from . import controller, _controller_utils, _controller_base
 from sqlalchemy import orm as sqlalchemy_orm
 
-from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils, _capsule_json
+from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils, _capsule_json, \
+                                                  capsule_deferred_consistency
 
 T = typing.TypeVar('T', bound=_controller_base.ControllerBase)
 CT = typing.TypeVar('CT', bound=_capsule_base.CapsuleBase)
@@ -115,7 +116,9 @@ def __addToDictFunctions(controllerType : type[T],
         countOfCapsule = 0
         numberedCapsulesDict = {}
         capsulesByKeyFncName = _controller_utils.getControllerIterByKeyFncName()
-        capsules = getattr(self, capsulesByKeyFncName)(capsuleKey = capsuleKey, scope = thisScope)
+        capsules = getattr(self, capsulesByKeyFncName)(capsuleKey = capsuleKey, 
+                                                       scope = thisScope,
+                                                       forExport = True)
         for capsule in capsules:
           if capsule == None:
             # set dictionary of capsuleKey to None if no value is present 
@@ -152,7 +155,11 @@ def __addFromDictFunctions(controllerType : type[T],
   def fncFromDict(self: T, 
                   session: sqlalchemy_orm.Session,
                   controllerDict: dict[str, any],
-                  persistentMustHaveId: bool = False) -> T:
+                  persistentMustHaveId: bool = False,
+                  bulk: bool = False) -> T:
+    # bulk: the relationships of all capsules constructed are sourced and checked at
+    #       once on exit (see capsule_deferred_consistency.bulkConstruction) - opt-in
+    #       as the relationships are neither sourced nor checked until then
     # print(f"[_controller_json.fncFromDict]")
     def ensureSomeControllerKeyInDict() -> None:
       for subControllerType in self._subControllerTypes:
@@ -193,47 +200,56 @@ def __addFromDictFunctions(controllerType : type[T],
                             f"class {self.__name__}. \n" + \
                             f"Key missing: {key}. \n" + \
                             "Dictionary:\n" + str(controllerDict))
-    output = controllerType(session = session)   
-    #print('ControllerDict: \n', controllerDict) 
-    if len(self._key) == 0:
-      ensureOnlyControllerKeyInDict()
-      ensureSomeControllerKeyInDict()
-      for subControllerType in self._subControllerTypes:
-        subControllerKey = subControllerType._key
-        subControllerTypeName = subControllerType.__name__
-        subControllerAttributeName = _controller_utils.getStartsWithLowerCase(subControllerTypeName)
-        #FIXME: trows error here cause fifoData has no key
-        if not subControllerKey in controllerDict:
-          continue
-        subControllerDict = controllerDict[subControllerKey]
-        _ = getattr(subControllerType, nameOfFromDictFnc)(
-                                  session = session,
-                                  controllerDict = subControllerDict,
-                                  persistentMustHaveId = persistentMustHaveId)
-    else:
-      if self._key in controllerDict:
-        controllerDict = controllerDict[self._key]
-      ensureAllKeysInSubControllerDict()
-      relationshipEntitiesCatalog: typing.Dict[str, dict] = dict[str, dict]()
-      for contentPos in range(0, len(self._content)):
-        # keys of sub controller and content of sub controller come in same order
-        contentType = self._content[contentPos]
-        contentKey = self._keys[contentPos]
-        if not contentKey in controllerDict: continue # do nothing if key not present
-        contentDict = controllerDict[contentKey]
-        # core_account = controllerDict['core_account']
-        # asset_static_ca = core_account['1']
-        # print(f"  asset>static core_account: {asset_static_ca}")
-        for capsuleDict in contentDict.values():
-          # Do not try to convert validation list entries into capsules
-          if len(capsuleDict) == 1 and 'name' in capsuleDict: continue
-          _ = contentType.fromDict(session = output.session,
-                                   capsuleDict = capsuleDict,
-                                   persistentMustHaveId = persistentMustHaveId,
-                                   relationshipEntitiesCatalog = relationshipEntitiesCatalog)
-          # if contentKey == 'transaction_type':
-          #   ctDict = contentType.toDict()
-          #   print('ctDict: \n', ctDict)
+    constructionContext = capsule_deferred_consistency.bulkConstruction(session = session) if bulk else \
+                          contextlib.nullcontext()
+    with constructionContext:
+      output = controllerType(session = session)   
+      #print('ControllerDict: \n', controllerDict) 
+      if len(self._key) == 0:
+        ensureOnlyControllerKeyInDict()
+        ensureSomeControllerKeyInDict()
+        for subControllerType in self._subControllerTypes:
+          subControllerKey = subControllerType._key
+          subControllerTypeName = subControllerType.__name__
+          subControllerAttributeName = _controller_utils.getStartsWithLowerCase(subControllerTypeName)
+          #FIXME: trows error here cause fifoData has no key
+          if not subControllerKey in controllerDict:
+            continue
+          subControllerDict = controllerDict[subControllerKey]
+          _ = getattr(subControllerType, nameOfFromDictFnc)(
+                                    session = session,
+                                    controllerDict = subControllerDict,
+                                    persistentMustHaveId = persistentMustHaveId,
+                                    bulk = bulk)
+      else:
+        if self._key in controllerDict:
+          controllerDict = controllerDict[self._key]
+        ensureAllKeysInSubControllerDict()
+        # relationships referred to by name are resolved for all capsule dicts at once
+        relationshipEntitiesCatalog: typing.Dict[tuple, dict] = _capsule_json.getRelationshipEntitiesCatalog(
+                  session = output.session,
+                  capsuleDictsOfTypes = [(self._content[contentPos], controllerDict[self._keys[contentPos]].values()) \
+                                            for contentPos in range(0, len(self._content)) \
+                                              if self._keys[contentPos] in controllerDict])
+        for contentPos in range(0, len(self._content)):
+          # keys of sub controller and content of sub controller come in same order
+          contentType = self._content[contentPos]
+          contentKey = self._keys[contentPos]
+          if not contentKey in controllerDict: continue # do nothing if key not present
+          contentDict = controllerDict[contentKey]
+          # core_account = controllerDict['core_account']
+          # asset_static_ca = core_account['1']
+          # print(f"  asset>static core_account: {asset_static_ca}")
+          for capsuleDict in contentDict.values():
+            # Do not try to convert validation list entries into capsules
+            if len(capsuleDict) == 1 and 'name' in capsuleDict: continue
+            _ = contentType.fromDict(session = output.session,
+                                     capsuleDict = capsuleDict,
+                                     persistentMustHaveId = persistentMustHaveId,
+                                     relationshipEntitiesCatalog = relationshipEntitiesCatalog)
+            # if contentKey == 'transaction_type':
+            #   ctDict = contentType.toDict()
+            #   print('ctDict: \n', ctDict)
     return output              
                 
               
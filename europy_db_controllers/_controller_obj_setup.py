@@ -6,6 +6,7 @@ import sqlalchemy
 
 from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils 
 from europy_db_controllers import _controller_base, _controller_utils
+from europy_db_controllers.utils import code_cache
 
 T = typing.TypeVar("T", bound=_controller_base.ControllerBase)
 CT = typing.TypeVar("CT", bound=_capsule_base.CapsuleBase)
@@ -35,6 +36,20 @@ def isColumnAttributeNameToAdd(columnAttributeName: str,
   isIdFieldAttribute = key == _capsule_utils.REL_ATTR_DICT_KEY_ID
   return not (isNone or isInternalNameAttribute or isIdFieldAttribute)
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Function identifying the column attributes defined on the capsule type
+#    - derived from the table metadata (as the capsule's __init__, see _capsule_init):
+#      capsule types set up lazily are not materialized by the controller setup
+#    - the name attribute of a relationship is defined if the related sqlalchemyTableType
+#      has a 'name'
+def isCapsuleColumnAttribute(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta],
+                             column: sqlalchemy.Column,
+                             key: str) -> bool:
+  if key != _capsule_utils.REL_ATTR_DICT_KEY_NAME: return True
+  relationship = _capsule_utils.getRelationship(sqlalchemyTableType = sqlalchemyTableType,
+                                                column = column)
+  return hasattr(relationship.mapper.class_, 'name')
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -62,7 +77,7 @@ def __getObjectSetupCode(capsuleType: type[CT],
     output = ""
     for key, columnAttributeName in columnAttrNameDict.items():
       if isColumnAttributeNameToAdd(columnAttributeName = columnAttributeName, key = key): 
-        if hasattr(capsuleType, columnAttributeName):
+        if isCapsuleColumnAttribute(sqlalchemyTableType = sqlalchemyTableType, column = column, key = key):
           output = output + getBasicInputLine(
                                 varName=columnAttributeName,
                                 # typeName=pythonType, FIXME: type of input will be defined when suitable
@@ -97,7 +112,7 @@ def __getObjectSetupCode(capsuleType: type[CT],
         columnAttrNameDict = tableAttrNameDict[column.name]
         for key, columnAttributeName in columnAttrNameDict.items():
           if isColumnAttributeNameToAdd(columnAttributeName = columnAttributeName, key = key): 
-            if hasattr(capsuleType, columnAttributeName):
+            if isCapsuleColumnAttribute(sqlalchemyTableType = sqlalchemyTableType, column = column, key = key):
               parameterLine = f"{indent}{columnAttributeName} = {columnAttributeName}"
               output = output + f"{parameterLine}, \n"
       output = output + f"{indent}{_capsule_utils.INIT_ENFORCE_NOT_NEW_OR_DIRTY_FLAG} = " + \
@@ -121,24 +136,45 @@ def __getObjectSetupCode(capsuleType: type[CT],
 
 def __addSetupMethod(controllerType: type[T],
                      capsuleType: type[CT],
-                     callingGlobals):
+                     callingGlobals,
+                     codeCache: code_cache.CodeCache):
   setupFncName = _controller_utils.getCapsuleSetupFncName(capsuleType=capsuleType)
-  setupCode = __getObjectSetupCode(capsuleType = capsuleType,
-                                   setupFncName = setupFncName,
-                                   callingGlobals = callingGlobals)
   # if capsuleType.__name__ == "MarketAndForwardTransactionCapsule":
   #   print(f"setupCode {capsuleType.__name__}: \n{setupCode}")
-  exec(setupCode, callingGlobals)
-  setupMethod = callingGlobals[setupFncName]
+  # source code is only generated and compiled if not available in the code cache
+  setupMethod = codeCache.execCode(
+                      fncName = setupFncName,
+                      getSourceCode = lambda: __getObjectSetupCode(capsuleType = capsuleType,
+                                                                   setupFncName = setupFncName,
+                                                                   callingGlobals = callingGlobals),
+                      namespace = callingGlobals)
   setupMethodDecorated = _controller_base.cleanAndCloseSession(func = setupMethod)  
   setattr(controllerType, setupFncName, setupMethodDecorated)
 
+def getCodeCacheFingerprint(controllerTypeNames: typing.List[str],
+                            callingGlobals) -> str:
+  # the setup code depends on the capsule types (and their tables) of each controller
+  sqlalchemyTableTypes = []
+  contentItems = []
+  for controllerTypeName in controllerTypeNames:
+    capsuleTypes = callingGlobals[controllerTypeName]._content
+    contentItems.append(f"controller:{controllerTypeName}:" + \
+                        ",".join(capsuleType.__name__ for capsuleType in capsuleTypes))
+    for capsuleType in capsuleTypes:
+      if not capsuleType.sqlalchemyTableType in sqlalchemyTableTypes:
+        sqlalchemyTableTypes.append(capsuleType.sqlalchemyTableType)
+  return code_cache.getMetadataFingerprint(sqlalchemyTableTypes = sqlalchemyTableTypes,
+                                           furtherKeyItems = contentItems)
+
 def addSetupMethods(controllerTypeNames: typing.List[type[T]],
-                    callingGlobals):
+                    callingGlobals,
+                    codeCache: code_cache.CodeCache = None):
+  if codeCache is None: codeCache = code_cache.CodeCache()
   for controllerTypeName in controllerTypeNames:
     controllerType = callingGlobals[controllerTypeName]
     capsuleTypes = controllerType._content
     for capsuleType in capsuleTypes:
       __addSetupMethod(controllerType = controllerType,
                        capsuleType = capsuleType,
-                       callingGlobals = callingGlobals)
+                       callingGlobals = callingGlobals,
+                       codeCache = codeCache)
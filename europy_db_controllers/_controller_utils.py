@@ -1,55 +1,40 @@
 from __future__ import annotations
 
-import sys, typing
+import sys, typing, json, base64, uuid, datetime, decimal
 from sqlalchemy.ext import declarative as sqlalchemy_decl
 from sqlalchemy import orm as sqlalchemy_orm
 import sqlalchemy
 
 
-from europy_db_controllers.entity_capsules import _capsule_base 
-from europy_db_controllers import _controller_base
+from europy_db_controllers.entity_capsules import _capsule_base, capsule_type_index
+from europy_db_controllers import _controller_base, _controller_filter
 
 T = typing.TypeVar("T", bound=_controller_base.ControllerBase)
 CT = typing.TypeVar("CT", bound=_capsule_base.CapsuleBase)
 
 CONTROLLER_KEYS_ATTR_NAME = "_keys"
 CONTROLLER_KEY_ATTR_PREFIX = "_key_"
+# maximum number of ids of new or dirty objects excluded by the db query ('NOT IN') -
+#   above the ids are excluded when merging the query result
+MAX_NOT_IN_IDS = 1000
+# number of rows fetched per batch by the streaming iterators of the STORED_ON_DB scope
+STREAM_YIELD_PER = 1000
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # functions retrieving sqlalchemy tables from the session
-def __getFilterFunction(filterConditions: typing.Dict[str, any]
+def __getFilterFunction(sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+                        filterConditions: typing.Dict[str, any]
                         ) -> typing.Callable[[sqlalchemy_decl.DeclarativeMeta], bool]:
-  def innerFilterFunction(sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta) -> bool:
-    for filterAttributeName, filterAttributeValue in filterConditions.items():
-      # Split attribute path by dots
-      attributePath = filterAttributeName.split('.')
-      
-      # Start with the sqlalchemy table
-      currentObj = sqlalchemyTable
-      
-      # Follow the attribute path except for last element
-      for attr in attributePath[:-1]:
-        if not hasattr(currentObj, attr):
-            path = '.'.join(attributePath[:attributePath.index(attr)])
-            raise AttributeError(f"Cannot find attribute '{attr}' in filter path '{filterAttributeName}'. "
-                               f"Search failed at '{path}' on object of type {type(currentObj).__name__}. "
-                               f"Original sqlalchemy table type: {type(sqlalchemyTable).__name__}")
-        currentObj = getattr(currentObj, attr)
-        if currentObj is None:
-          return False
-          
-      # Compare final attribute value
-      finalAttr = attributePath[-1]
-      if getattr(currentObj, finalAttr) != filterAttributeValue:
-        return False
-      if getattr(sqlalchemyTable, filterAttributeName) != filterAttributeValue: return False
-    return True
-  return innerFilterFunction
-def __getFilteredSqlalchemyTables(sqlalchemyTables: typing.List[sqlalchemy_decl.DeclarativeMeta],
+  # filter paths compiled once per sqlalchemyTableType (see _controller_filter)
+  return _controller_filter.getFilterFunction(sqlalchemyTableType = sqlalchemyTableType,
+                                              filterConditions = filterConditions)
+def __getFilteredSqlalchemyTables(sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+                                  sqlalchemyTables: typing.List[sqlalchemy_decl.DeclarativeMeta],
                                   filterConditions: typing.Dict[str, any]
                                   ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
-  filterFnc = __getFilterFunction(filterConditions=filterConditions)
+  filterFnc = __getFilterFunction(sqlalchemyTableType = sqlalchemyTableType,
+                                  filterConditions = filterConditions)
   return list(filter(filterFnc, sqlalchemyTables))
   
 def getNewSqlalchemyTables(
@@ -59,11 +44,15 @@ def getNewSqlalchemyTables(
                       ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
   sqlalchemyTableType = capsuleType.sqlalchemyTableType
   result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
-  for newObject in session.new:
-    if isinstance(newObject, sqlalchemyTableType):
-      result.append(newObject)
+  typeIndex = capsule_type_index.getTypeIndex(session = session)
+  if typeIndex is not None:
+    result = typeIndex.getNewSqlalchemyTables(sqlalchemyTableType = sqlalchemyTableType)
+  else:
+    for newObject in session.new:
+      if isinstance(newObject, sqlalchemyTableType):
+        result.append(newObject)
   if not filterConditions is None:
-    result = __getFilteredSqlalchemyTables(result, filterConditions)
+    result = __getFilteredSqlalchemyTables(sqlalchemyTableType, result, filterConditions)
   return result
 def getDirtySqlalchemyTables(
                       capsuleType: type[CT], 
@@ -72,11 +61,15 @@ def getDirtySqlalchemyTables(
                       ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
   sqlalchemyTableType = capsuleType.sqlalchemyTableType
   result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
-  for dirtyObject in session.dirty:
-    if isinstance(dirtyObject, sqlalchemyTableType):
-      result.append(dirtyObject)
+  typeIndex = capsule_type_index.getTypeIndex(session = session)
+  if typeIndex is not None:
+    result = typeIndex.getDirtySqlalchemyTables(sqlalchemyTableType = sqlalchemyTableType)
+  else:
+    for dirtyObject in session.dirty:
+      if isinstance(dirtyObject, sqlalchemyTableType):
+        result.append(dirtyObject)
   if not filterConditions is None:
-    result = __getFilteredSqlalchemyTables(result, filterConditions)
+    result = __getFilteredSqlalchemyTables(sqlalchemyTableType, result, filterConditions)
   return result
 def getNewDirtySqlalchemyTables(
                       capsuleType: type[CT], 
@@ -95,17 +88,28 @@ def hasNewAndDirtySqlalchemyTables(
 def getMapSqlalchemyTables(
                       capsuleType: type[CT], 
                       session: sqlalchemy_orm.Session,
-                      newOrDirty: typing.List[sqlalchemy_decl.DeclarativeMeta] = [],
+                      newOrDirty: typing.List[sqlalchemy_decl.DeclarativeMeta] = None,
                       filterConditions: typing.Dict[str, any] = None
                       ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
   sqlalchemyTableType = capsuleType.sqlalchemyTableType
-  filterFnc = __getFilterFunction(filterConditions=filterConditions)
-  result = newOrDirty
-  for mapObject in session.identity_map.items():
-    if isinstance(mapObject, sqlalchemyTableType):
-      if not filterFnc(mapObject): continue
-      if not mapObject in result:
-        result.append(mapObject)
+  newOrDirty = [] if newOrDirty is None else newOrDirty
+  filterFnc = None if filterConditions is None else \
+                __getFilterFunction(sqlalchemyTableType = sqlalchemyTableType,
+                                    filterConditions = filterConditions)
+  result = list(newOrDirty)
+  # objects are identified by identity (not by '==') - set based de-duplication
+  resultIds = set(map(id, result))
+  typeIndex = capsule_type_index.getTypeIndex(session = session)
+  if typeIndex is not None:
+    mapObjects = typeIndex.getPersistentSqlalchemyTables(sqlalchemyTableType = sqlalchemyTableType)
+  else:
+    mapObjects = [mapObject for mapObject in session.identity_map.values() \
+                      if isinstance(mapObject, sqlalchemyTableType)]
+  for mapObject in mapObjects:
+    if id(mapObject) in resultIds: continue
+    if not filterFnc is None and not filterFnc(mapObject): continue
+    result.append(mapObject)
+    resultIds.add(id(mapObject))
   return result
 def getAllInSessionSqlalchemyTables(
                       capsuleType: type[CT], 
@@ -114,53 +118,312 @@ def getAllInSessionSqlalchemyTables(
                       ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
   newOrDirty = getNewDirtySqlalchemyTables(capsuleType, session, filterConditions)
   return getMapSqlalchemyTables(capsuleType, session, newOrDirty, filterConditions)
+def __addDbQueryFilterConditions(sqlalchemyTableType: type[sqlalchemy_decl.DeclarativeMeta],
+                                 dbQuery: typing.Union[sqlalchemy_orm.Query, sqlalchemy.Select],
+                                 filterConditions: typing.Dict[str, any] = None
+                                 ) -> typing.Union[sqlalchemy_orm.Query, sqlalchemy.Select]:
+  # dotted filter paths are joined (see _controller_filter)
+  return _controller_filter.addDbFilterConditions(sqlalchemyTableType = sqlalchemyTableType,
+                                                  dbQuery = dbQuery,
+                                                  filterConditions = filterConditions)
 def getDbSqlalchemyTables(
                       capsuleType: type[CT], 
                       session: sqlalchemy_orm.Session,
-                      newOrDirty: typing.List[sqlalchemy_decl.DeclarativeMeta] = [],
-                      filterConditions: typing.Dict[str, any] = None
+                      newOrDirty: typing.List[sqlalchemy_decl.DeclarativeMeta] = None,
+                      filterConditions: typing.Dict[str, any] = None,
+                      excludedIds: typing.Iterable[any] = None,
+                      loaderOptions: typing.Iterable[any] = None
                       ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
-  result = newOrDirty
-  newOrDirtyIds = [obj.id for obj in result if (not obj.id is None)] 
+  # excludedIds: further ids not to be returned (e.g. of objects deleted during the session)
+  # loaderOptions: eager loading options of the query (e.g. _capsule_json.getToDictLoaderOptions)
+  result = [] if newOrDirty is None else list(newOrDirty)
+  newOrDirtyIds = set(obj.id for obj in result if (not obj.id is None))
+  if not excludedIds is None:
+    newOrDirtyIds.update(excludedIds)
   sqlalchemyTableType = capsuleType.sqlalchemyTableType
   dbQuery = None
   dbQuery = session.query(sqlalchemyTableType)
-  if not filterConditions is None:
-    for filterAttributeName, filterAttributeValue in filterConditions.items():
-      # Split attribute path by dots
-      attributePath = filterAttributeName.split('.')
-      currentType = sqlalchemyTableType
-      currentAttr = None
-      
-      # Navigate through the attribute path
-      for attrName in attributePath:
-        currentAttr = getattr(currentType, attrName)
-        # Get the type of the next level if not at end
-        if hasattr(currentAttr, 'property') and hasattr(currentAttr.property, 'mapper'):
-          currentType = currentAttr.property.mapper.class_
-      
-      dbQuery = dbQuery.filter(currentAttr == filterAttributeValue)
+  # new or dirty objects are excluded on the db side (their session state is returned)
+  excludedOnDb = 0 < len(newOrDirtyIds) <= MAX_NOT_IN_IDS
+  if excludedOnDb:
+    dbQuery = dbQuery.filter(sqlalchemyTableType.id.not_in(newOrDirtyIds))
+  dbQuery = __addDbQueryFilterConditions(sqlalchemyTableType = sqlalchemyTableType,
+                                         dbQuery = dbQuery,
+                                         filterConditions = filterConditions)
+  if loaderOptions:
+    dbQuery = dbQuery.options(*loaderOptions)
   with session.no_autoflush:
     dbSqlalchemyTables = dbQuery.all()
-  for dbSqlalchemyTable in dbSqlalchemyTables:
-    if not dbSqlalchemyTable.id in newOrDirtyIds:
-      result.append(dbSqlalchemyTable)
+  if excludedOnDb or len(newOrDirtyIds) == 0:
+    result.extend(dbSqlalchemyTables)
+  else:
+    for dbSqlalchemyTable in dbSqlalchemyTables:
+      if not dbSqlalchemyTable.id in newOrDirtyIds:
+        result.append(dbSqlalchemyTable)
   return result
 def getAllSqlalchemyTables(
                       capsuleType: type[CT], 
                       session: sqlalchemy_orm.Session,
-                      filterConditions: typing.Dict[str, any] = None
+                      filterConditions: typing.Dict[str, any] = None,
+                      loaderOptions: typing.Iterable[any] = None
                       ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
   newOrDirty = getNewDirtySqlalchemyTables(capsuleType, session, filterConditions)
-  return getDbSqlalchemyTables(capsuleType, session, newOrDirty, filterConditions)
+  return getDbSqlalchemyTables(capsuleType, session, newOrDirty, filterConditions,
+                               excludedIds = getDeletedSqlalchemyTableIds(capsuleType, session),
+                               loaderOptions = loaderOptions)
+def getDeletedSqlalchemyTableIds(
+                      capsuleType: type[CT], 
+                      session: sqlalchemy_orm.Session) -> typing.Set[any]:
+  # ids of the objects marked for deletion (not yet flushed)
+  sqlalchemyTableType = capsuleType.sqlalchemyTableType
+  return set(deletedObject.id for deletedObject in session.deleted \
+                if isinstance(deletedObject, sqlalchemyTableType) and not deletedObject.id is None)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Number of rows on the db ('SELECT COUNT(*)' - no objects loaded)
+#   - excludedIds: ids not counted (excluded by 'NOT IN' or, for more than 
+#                  MAX_NOT_IN_IDS ids, by subtracting the count of the excluded ids 
+#                  matching the filter conditions)
+def countDbSqlalchemyTables(
+                      capsuleType: type[CT], 
+                      session: sqlalchemy_orm.Session,
+                      filterConditions: typing.Dict[str, any] = None,
+                      excludedIds: typing.Iterable[any] = None) -> int:
+  sqlalchemyTableType = capsuleType.sqlalchemyTableType
+  excludedIds = [] if excludedIds is None else list(excludedIds)
+  def getCountQuery() -> sqlalchemy.Select:
+    countQuery = sqlalchemy.select(sqlalchemy.func.count()).select_from(sqlalchemyTableType)
+    return __addDbQueryFilterConditions(sqlalchemyTableType = sqlalchemyTableType,
+                                        dbQuery = countQuery,
+                                        filterConditions = filterConditions)
+  with session.no_autoflush:
+    if len(excludedIds) <= MAX_NOT_IN_IDS:
+      countQuery = getCountQuery()
+      if len(excludedIds) > 0:
+        countQuery = countQuery.filter(sqlalchemyTableType.id.not_in(excludedIds))
+      return session.scalar(countQuery)
+    result = session.scalar(getCountQuery())
+    for pos in range(0, len(excludedIds), MAX_NOT_IN_IDS):
+      countQuery = getCountQuery().filter(sqlalchemyTableType.id.in_(excludedIds[pos:pos + MAX_NOT_IN_IDS]))
+      result -= session.scalar(countQuery)
+    return result
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Sort order of the capsule iterators ('sortedBy' as of the iterators):
+#   - None: not sorted / "": the standard sorting of the table ('_sorted_by') /
+#     otherwise: the name of the attribute to sort by
+def getSortAttributeNames(capsuleType: type[CT],
+                          sortedBy: str = "") -> typing.List[str]:
+  if sortedBy is None: return []
+  if len(sortedBy) > 0: return [sortedBy]
+  sortedByAttributeNames = capsuleType.sqlalchemyTableType._sorted_by
+  return [] if sortedByAttributeNames is None else list(sortedByAttributeNames)
+def getDbOrderByClauses(capsuleType: type[CT],
+                        sortedBy: str = "") -> typing.List[any]:
+  # 'None' if the sort order can not be expressed in sql (e.g. plain python properties)
+  sqlalchemyTableType = capsuleType.sqlalchemyTableType
+  result = []
+  for attributeName in getSortAttributeNames(capsuleType = capsuleType,
+                                             sortedBy = sortedBy):
+    orderByClause = getattr(sqlalchemyTableType, attributeName, None)
+    if not isinstance(orderByClause, (sqlalchemy_orm.QueryableAttribute, sqlalchemy.ColumnElement)):
+      return None
+    result.append(orderByClause)
+  # unique order of rows of equal sort attributes
+  if len(result) > 0:
+    result.append(sqlalchemyTableType.id)
+  return result
+def iterDbSqlalchemyTables(
+                      capsuleType: type[CT], 
+                      session: sqlalchemy_orm.Session,
+                      orderByClauses: typing.List[any] = None,
+                      filterConditions: typing.Dict[str, any] = None,
+                      loaderOptions: typing.Iterable[any] = None
+                      ) -> typing.Iterator[sqlalchemy_decl.DeclarativeMeta]:
+  # rows streamed from the db in batches of STREAM_YIELD_PER rows (sorted by sql)
+  sqlalchemyTableType = capsuleType.sqlalchemyTableType
+  dbQuery = sqlalchemy.select(sqlalchemyTableType)
+  dbQuery = __addDbQueryFilterConditions(sqlalchemyTableType = sqlalchemyTableType,
+                                         dbQuery = dbQuery,
+                                         filterConditions = filterConditions)
+  if orderByClauses:
+    dbQuery = dbQuery.order_by(*orderByClauses)
+  if loaderOptions:
+    # eager loads are issued per batch of rows
+    dbQuery = dbQuery.options(*loaderOptions)
+  dbQuery = dbQuery.execution_options(yield_per = STREAM_YIELD_PER)
+  # no autoflush on the execution of the query and on the fetch (and eager loads) of
+  #   each batch - the session's autoflush is restored before each row is yielded
+  with session.no_autoflush:
+    dbResult = session.scalars(dbQuery)
+  try:
+    dbPartitions = dbResult.partitions()
+    while True:
+      with session.no_autoflush:
+        dbPartition = next(dbPartitions, None)
+      if dbPartition is None: return
+      yield from dbPartition
+  finally:
+    dbResult.close()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Keyset pagination of the db rows (sorted by the sort attributes and the id)
+#   - the cursor is an opaque string carrying the sort attribute names and the sort 
+#     values of the last row of the previous page
+#   - 'None' values of the sort attributes are sorted last
+#   - each page is one query seeking past the last row (no offset)
+_CURSOR_VALUE_ENCODERS = {
+  type(None): ('none', lambda value: None, lambda value: None),
+  bool: ('bool', lambda value: value, lambda value: value),
+  int: ('int', lambda value: value, lambda value: value),
+  float: ('float', lambda value: value, lambda value: value),
+  str: ('str', lambda value: value, lambda value: value),
+  decimal.Decimal: ('decimal', str, decimal.Decimal),
+  uuid.UUID: ('uuid', str, uuid.UUID),
+  datetime.datetime: ('datetime', lambda value: value.isoformat(), datetime.datetime.fromisoformat),
+  datetime.date: ('date', lambda value: value.isoformat(), datetime.date.fromisoformat),
+  datetime.time: ('time', lambda value: value.isoformat(), datetime.time.fromisoformat),
+}
+_CURSOR_VALUE_DECODERS = {typeName: decoder for typeName, _, decoder in _CURSOR_VALUE_ENCODERS.values()}
+
+def encodePageCursor(sortAttributeNames: typing.List[str],
+                     sortValues: typing.List[any]) -> str:
+  encodedValues = []
+  for sortValue in sortValues:
+    if not type(sortValue) in _CURSOR_VALUE_ENCODERS:
+      raise TypeError(f"[Page cursor] Values of type {type(sortValue).__name__} not supported as sort values.")
+    typeName, encoder, _ = _CURSOR_VALUE_ENCODERS[type(sortValue)]
+    encodedValues.append([typeName, encoder(sortValue)])
+  cursorJson = json.dumps({'sortedBy': sortAttributeNames, 'values': encodedValues})
+  return base64.urlsafe_b64encode(cursorJson.encode('utf-8')).decode('ascii')
+def decodePageCursor(cursor: str,
+                     sortAttributeNames: typing.List[str]) -> typing.List[any]:
+  try:
+    cursorDict = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    sortValues = [_CURSOR_VALUE_DECODERS[typeName](value) for typeName, value in cursorDict['values']]
+  except Exception as e:
+    raise ValueError(f"[Page cursor] Invalid cursor: '{cursor}'") from e
+  if cursorDict['sortedBy'] != sortAttributeNames or len(sortValues) != len(sortAttributeNames) + 1:
+    raise ValueError(f"[Page cursor] Cursor of sort order {cursorDict['sortedBy']} used for a page " + \
+                     f"sorted by {sortAttributeNames}.")
+  return sortValues
+
+def __getKeysetCriterion(sortColumns: typing.List[any],
+                         sortValues: typing.List[any]) -> sqlalchemy.ColumnElement:
+  # rows after the row of the sortValues ('None' sorted last - the id is never 'None'):
+  #   OR over i of (equal on the columns before i AND after on column i)
+  criteria = []
+  equalCriteria = []
+  for sortColumn, sortValue in zip(sortColumns, sortValues):
+    if sortValue is None:
+      # no rows after 'None' on this column
+      equalCriteria.append(sortColumn.is_(None))
+      continue
+    afterCriterion = sqlalchemy.or_(sortColumn > sortValue, sortColumn.is_(None))
+    criteria.append(sqlalchemy.and_(*equalCriteria, afterCriterion))
+    equalCriteria.append(sortColumn == sortValue)
+  return sqlalchemy.or_(*criteria)
+def getDbSqlalchemyTablesPage(
+                      capsuleType: type[CT], 
+                      session: sqlalchemy_orm.Session,
+                      pageSize: int,
+                      cursor: str = None,
+                      sortedBy: str = "",
+                      filterConditions: typing.Dict[str, any] = None
+                      ) -> typing.Tuple[typing.List[sqlalchemy_decl.DeclarativeMeta], str]:
+  # -> (<rows of the page>, <cursor of the next page - 'None' if last page>)
+  if pageSize < 1:
+    raise ValueError(f"[Page size] Page size must be positive - provided: {pageSize}")
+  sqlalchemyTableType = capsuleType.sqlalchemyTableType
+  sortAttributeNames = getSortAttributeNames(capsuleType = capsuleType,
+                                             sortedBy = sortedBy)
+  sortColumns = []
+  for sortAttributeName in sortAttributeNames:
+    sortColumn = getattr(sqlalchemyTableType, sortAttributeName, None)
+    if not isinstance(sortColumn, (sqlalchemy_orm.QueryableAttribute, sqlalchemy.ColumnElement)):
+      raise ValueError(f"[Page sort order] '{sortAttributeName}' of {sqlalchemyTableType.__name__} " + \
+                       f"is not a db column or sql expression.")
+    sortColumns.append(sortColumn)
+  sortColumns.append(sqlalchemyTableType.id)
+  dbQuery = sqlalchemy.select(sqlalchemyTableType)
+  dbQuery = __addDbQueryFilterConditions(sqlalchemyTableType = sqlalchemyTableType,
+                                         dbQuery = dbQuery,
+                                         filterConditions = filterConditions)
+  if not cursor is None:
+    sortValues = decodePageCursor(cursor = cursor,
+                                  sortAttributeNames = sortAttributeNames)
+    dbQuery = dbQuery.filter(__getKeysetCriterion(sortColumns = sortColumns,
+                                                  sortValues = sortValues))
+  dbQuery = dbQuery.order_by(*[sortColumn.asc().nulls_last() for sortColumn in sortColumns]) \
+                   .limit(pageSize + 1)
+  with session.no_autoflush:
+    sqlalchemyTables = session.scalars(dbQuery).unique().all()
+  if len(sqlalchemyTables) <= pageSize:
+    return sqlalchemyTables, None
+  sqlalchemyTables = sqlalchemyTables[:pageSize]
+  lastSqlalchemyTable = sqlalchemyTables[-1]
+  nextCursor = encodePageCursor(sortAttributeNames = sortAttributeNames,
+                                sortValues = [getattr(lastSqlalchemyTable, sortAttributeName) \
+                                                  for sortAttributeName in sortAttributeNames] + \
+                                             [lastSqlalchemyTable.id])
+  return sqlalchemyTables, nextCursor
+
+def checkNoNewOrDirtySqlalchemyTables(capsuleType: type[CT], 
+                                      controllerType: type[T],
+                                      self: T, 
+                                      scope: _controller_base.ControllerDataScopes,
+                                      filterConditions: typing.Dict[str, any] = None):
+  newAndDirty = getNewDirtySqlalchemyTables(capsuleType, self.session, filterConditions)
+  if len(newAndDirty) > 0: 
+    fncName = getCapsuleTypeIterFncName(capsuleType)
+    errMsg = f"[Non committed changes in session] - {fncName} on \n" + \
+            f"{controllerType.__name__}" + \
+            f"No new or modified objects of type {capsuleType.__name__} allowed in session if\n" + \
+            f"the date to be sourced is specified as {scope.name}.\n" + \
+            f"Please commit all changes before calling {fncName}."
+    self._raiseException(errMsg)
+
+def getLenOfScope(capsuleType: type[CT], 
+                  controllerType: type[T],
+                  self: T, 
+                  scope: _controller_base.ControllerDataScopes = 
+                         _controller_base.ControllerDataScopes.NEW_AND_DIRTY,
+                  filterConditions: typing.Dict[str, any] = None) -> int:
+  # db rows are counted by the db - only the new and dirty objects are loaded
+  match scope:
+    case _controller_base.ControllerDataScopes.STORED_ON_DB:
+      checkNoNewOrDirtySqlalchemyTables(capsuleType = capsuleType,
+                                        controllerType = controllerType,
+                                        self = self,
+                                        scope = scope,
+                                        filterConditions = filterConditions)
+      return countDbSqlalchemyTables(capsuleType = capsuleType,
+                                     session = self.session,
+                                     filterConditions = filterConditions)
+    case _controller_base.ControllerDataScopes.ALL:
+      # new and dirty (session state) + db rows not dirty and not deleted
+      newOrDirty = getNewDirtySqlalchemyTables(capsuleType, self.session, filterConditions)
+      excludedIds = set(obj.id for obj in newOrDirty if (not obj.id is None))
+      excludedIds.update(getDeletedSqlalchemyTableIds(capsuleType, self.session))
+      return len(newOrDirty) + countDbSqlalchemyTables(capsuleType = capsuleType,
+                                                       session = self.session,
+                                                       filterConditions = filterConditions,
+                                                       excludedIds = excludedIds)
+  return len(getSqlAlchemyTablesOfScope(capsuleType = capsuleType,
+                                        controllerType = controllerType,
+                                        self = self,
+                                        scope = scope,
+                                        filterConditions = filterConditions))
 
 def getSqlAlchemyTablesOfScope(capsuleType: type[CT], 
                                controllerType: type[T],
                                self: T, 
                                scope: _controller_base.ControllerDataScopes = 
                                       _controller_base.ControllerDataScopes.NEW_AND_DIRTY,
-                               filterConditions: typing.Dict[str, any] = None
+                               filterConditions: typing.Dict[str, any] = None,
+                               loaderOptions: typing.Iterable[any] = None
                                ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+  # loaderOptions: eager loading options of the db queries (ALL and STORED_ON_DB scopes)
   sqlalchemyTables: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
   match scope:
     case _controller_base.ControllerDataScopes.ALL_IN_SESSION:
@@ -168,21 +431,19 @@ def getSqlAlchemyTablesOfScope(capsuleType: type[CT],
     case _controller_base.ControllerDataScopes.NEW_AND_DIRTY:
       sqlalchemyTables = getNewDirtySqlalchemyTables(capsuleType, self.session, filterConditions)
     case _controller_base.ControllerDataScopes.STORED_ON_DB:
-      newAndDirty = getNewDirtySqlalchemyTables(capsuleType, self.session, filterConditions)
-      if len(newAndDirty) > 0: 
-        fncName = getCapsuleTypeIterFncName(capsuleType)
-        errMsg = f"[Non committed changes in session] - {fncName} on \n" + \
-                f"{controllerType.__name__}" + \
-                f"No new or modified objects of type {capsuleType.__name__} allowed in session if\n" + \
-                f"the date to be sourced is specified as {scope.name}.\n" + \
-                f"Please commit all changes before calling {fncName}."
-        self._raiseException(errMsg)
+      checkNoNewOrDirtySqlalchemyTables(capsuleType = capsuleType,
+                                        controllerType = controllerType,
+                                        self = self,
+                                        scope = scope,
+                                        filterConditions = filterConditions)
       sqlalchemyTables = getDbSqlalchemyTables(capsuleType = capsuleType, 
                                                session = self.session, 
                                                newOrDirty = [],
-                                               filterConditions = filterConditions)
+                                               filterConditions = filterConditions,
+                                               loaderOptions = loaderOptions)
     case _controller_base.ControllerDataScopes.ALL:
-      sqlalchemyTables = getAllSqlalchemyTables(capsuleType, self.session, filterConditions)
+      sqlalchemyTables = getAllSqlalchemyTables(capsuleType, self.session, filterConditions,
+                                                loaderOptions = loaderOptions)
     case _:
         fncName = getCapsuleTypeIterFncName(capsuleType)
         errMsg = f"[Unable to identify data scope] - {fncName} on \n" + \
@@ -227,6 +488,10 @@ def getControllerIterByKeyFncName() -> str:
 def getCapsuleTypeLenOfFncName(capsuleType: type[CT]) -> str:
   baseName = getBasePluralNameOfCapsuleType(capsuleType)
   return f"lenOf{baseName}"
+# pages of capsules
+def getCapsuleTypePageOfFncName(capsuleType: type[CT]) -> str:
+  baseName = getBasePluralNameOfCapsuleType(capsuleType)
+  return f"pageOf{baseName}"
 def getControllerLenOfByKeyFncName() -> str:
   return f"lenOfCapsulesByKey"
 # the json key of the capsule type
@@ -6,6 +6,8 @@ import typing
 from europy_db_controllers.entity_capsules import _capsule_base
 from europy_db_controllers import _controller_base, _controller_attr, \
                             _controller_obj_setup, _controller_json
+from europy_db_controllers.entity_capsules import _capsule_utils
+from europy_db_controllers.utils import code_cache
 
 ######################################################################################
 ######################################################################################
@@ -23,11 +25,16 @@ CT = typing.TypeVar("CT", bound=_capsule_base.CapsuleBase)
 
 CE = typing.TypeVar('CE', bound = _controller_base.BaseControllerKeyEnum)
 
+CONTROLLER_CODE_CACHE_NAME = "controllers"
+# modules generating source code stored in the code cache
+CONTROLLER_CODE_GENERATOR_MODULES = [_controller_obj_setup, _capsule_utils]
+
 #FIXME: please think of a better name for this fnc :) 
 def setupControllerClass(
             callingGlobals: typing.Dict[str, any],
             controllerTypeNames: typing.List[str],
             controllerTypeEnumType: typing.Type,
+            codeCacheDir: str = None,
             ) -> typing.Type[C]:
     # Merge callingGlobals with the current file's globals
     merged_globals = globals().copy()
@@ -37,9 +44,19 @@ def setupControllerClass(
     _controller_attr.addAttributes(controllerTypeNames=controllerTypeNames,
                                    callingGlobals=merged_globals)
 
-    # Add setup methods
+    # Add setup methods (generated code optionally cached on disk - see utils.code_cache)
+    codeCache = code_cache.CodeCache(
+                    cacheDir=codeCacheDir,
+                    cacheName=CONTROLLER_CODE_CACHE_NAME,
+                    fingerprint=_controller_obj_setup.getCodeCacheFingerprint(
+                                                controllerTypeNames=controllerTypeNames,
+                                                callingGlobals=merged_globals),
+                    generatorModules=CONTROLLER_CODE_GENERATOR_MODULES) \
+                if codeCacheDir is not None else code_cache.CodeCache()
     _controller_obj_setup.addSetupMethods(controllerTypeNames=controllerTypeNames,
-                                          callingGlobals=merged_globals)
+                                          callingGlobals=merged_globals,
+                                          codeCache=codeCache)
+    codeCache.save()
 
     # Add dictionary functions
     _controller_json.addDictFunctions(controllerTypeNames=controllerTypeNames,
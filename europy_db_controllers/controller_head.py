@@ -1,16 +1,29 @@
 from __future__ import annotations
 
-import sys, typing, datetime, enum, os, re
+import sys, typing, datetime, enum, os, re, importlib
 from sqlalchemy import orm as sqlalchemy_orm
 import sqlalchemy
 
 
 from europy_db_controllers.entity_capsules import  _capsule_utils
 from europy_db_controllers import _controller_base, _controller_attr
-from europy_db_controllers.xl import io_wkb 
+
+if typing.TYPE_CHECKING:
+  from europy_db_controllers.xl import io_wkb
 
 CE = typing.TypeVar('CE', bound = _controller_base.BaseControllerKeyEnum)
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# The Excel stack (io_wkb -> openpyxl, sheets, validations) is imported on first access
+#    of 'controller_head.io_wkb' only - workers serving json never load it
+_LAZY_MODULES = {'io_wkb': 'europy_db_controllers.xl.io_wkb'}
+def __getattr__(name: str):
+  if name in _LAZY_MODULES:
+    module = importlib.import_module(_LAZY_MODULES[name])
+    globals()[name] = module
+    return module
+  raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
 
 #{'upload': {'type': 'asset', 'data': transaction_type}}
 class Actions(enum.Enum):
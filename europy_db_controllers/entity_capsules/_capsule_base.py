@@ -1,13 +1,23 @@
 from __future__ import annotations
 
-import sys, uuid, typing, datetime
+import sys, uuid, typing, datetime, threading
 from sqlalchemy import orm as sqlalchemy_orm
 import sqlalchemy 
 from sqlalchemy.ext import declarative as sqlalchemy_decl
 
+from europy_db_controllers.entity_capsules import capsule_name_index, capsule_type_index, \
+                                                  capsule_deferred_consistency
+
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Cleaning and closing the session in case of an Exception
+#   (not closed while the deferred consistency checks are validated - the violations
+#   are collected, see capsule_deferred_consistency)
+def _cleanAndCloseSession(session: sqlalchemy_orm.Session):
+  if capsule_deferred_consistency.isValidating(session = session): return
+  session.expunge_all()
+  session.close()
 # Decorator ensuring the session to be properly closed in case of an Exception
 def cleanAndCloseSession(func):
   def wrapper(*args, **kwargs):
@@ -19,16 +29,66 @@ def cleanAndCloseSession(func):
     try:
       result = func(*args, **kwargs)
     except Exception as e:
-      session.expunge_all()
-      session.close()
+      _cleanAndCloseSession(session = session)
       raise e
     return result
   return wrapper 
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Metaclass of capsule types set up in lazy mode (see capsule_main.setupCapsules)
+#   - the capsule type is registered as stub carrying a '_materializer' 
+#   - the generated attributes and methods are added (materialized) on the first 
+#     instantiation or the first access of an attribute not defined on the stub
+#   - the lock is re-entrant: setting up a capsule type might materialize related 
+#     capsule types (or refer to the capsule type being set up)
+#   - the '_materializer' is cleared once all setup phases succeeded: instantiations
+#     and lookups of other threads wait on the lock until then (the thread setting up
+#     the capsule type sees it as 'isMaterializing')
+_materializeLock = threading.RLock()
+
+class LazyCapsuleType(type):
+  def __call__(cls, *args, **kwargs):
+    if not cls.isMaterialized:
+      cls.materialize()
+    return super().__call__(*args, **kwargs)
+  def __getattr__(cls, name: str):
+    # only called if 'name' is not found by the regular attribute lookup
+    if name.startswith('__') or cls.isMaterialized:
+      raise AttributeError(f"type object '{cls.__name__}' has no attribute '{name}'")
+    cls.materialize()
+    if not cls.isMaterialized:
+      # looked up by the setup phases of the capsule type (not added yet)
+      raise AttributeError(f"type object '{cls.__name__}' has no attribute '{name}'")
+    return getattr(cls, name)
+
+  @property
+  def isMaterialized(cls) -> bool:
+    return cls.__dict__.get('_materializer') is None
+  @property
+  def isMaterializing(cls) -> bool:
+    return cls.__dict__.get('_isMaterializing', False)
+  def materialize(cls) -> None:
+    with _materializeLock:
+      materializer = cls.__dict__.get('_materializer')
+      if materializer is None or cls.isMaterializing: return
+      cls._isMaterializing = True
+      try:
+        materializer(cls)
+        # the stub is kept on failure to permit a retry
+        cls._materializer = None
+      finally:
+        cls._isMaterializing = False
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # basic capsule
 class CapsuleBase():
+  # instance attributes - capsule types add the internal name fields of their 
+  #   relationships (see _capsule_schema.getInstanceSlots)
+  __slots__ = ('session', 'sqlalchemyTable', 'controllersLinkingTo', 'controllersLinkedTo', 
+               '_hasValueInput', '_consistentRelationshipStates', '__weakref__')
   _capsule_object = True
 
   _nonJsonProperties = ["sqlAState", "isTransient", "isPending", \
@@ -42,13 +102,26 @@ class CapsuleBase():
   #   are referred to by 'name' within the json of the current capsule
   #   Required for the validation of inputs (lists to select from)
   _referred_by_name_capsules = []  
+  # the immutable schema of the capsule type (see _capsule_schema)
+  _schema = None
+  # lookups by id: 'False' - entities of the identity map of the session are taken 
+  #   as is (db queried on a miss only) / 'True' - always re-read from the db
+  #   (overwriting the state of the entities in the session)
+  _refresh_on_query_by_id = False
+  # relationship consistency checks: 'True' - skipped as long as the relationship 
+  #   attributes are unchanged since the last successful check / 'False' - always run
+  #   (see _capsule_consistency)
+  _incremental_consistency_checks = True
 
   sqlalchemyTableType: any
 
   def _raiseException(self, errMsg: str): 
-    self.session.expunge_all()
-    self.session.close()
+    _cleanAndCloseSession(session = self.session)
     raise Exception(errMsg)
+  # failed relationship consistency checks (see _capsule_consistency)
+  def _raiseConsistencyException(self, errMsg: str): 
+    _cleanAndCloseSession(session = self.session)
+    raise capsule_deferred_consistency.ConsistencyError(errMsg)
 
   @cleanAndCloseSession
   def __init__(self,
@@ -60,6 +133,8 @@ class CapsuleBase():
     self.controllersLinkingTo: typing.List[CapsuleBase] = []
     self.controllersLinkedTo: typing.List[CapsuleBase] = []
     self._hasValueInput = False # controls for any values set
+    # {<name of check function>: <state of the relationship attributes checked>}
+    self._consistentRelationshipStates: typing.Dict[str, tuple] = {}
 
   # def __del__(self):
   #   self.session.expire(self.sqlalchemyTable)
@@ -111,37 +186,111 @@ class CapsuleBase():
   @cleanAndCloseSession
   def _queryTableById(self,
                       session: sqlalchemy_orm.Session,
-                      id: uuid.UUID):
-    query = sqlalchemy.select(self.sqlalchemyTableType).where(self.sqlalchemyTableType.id == id)
+                      id: uuid.UUID,
+                      refresh: bool = None,
+                      raiseIfMissing: bool = True):
+    # refresh: 'None' - as of '_refresh_on_query_by_id'
+    # raiseIfMissing: 'False' - 'None' if not found
+    if refresh is None: refresh = self._refresh_on_query_by_id
     with session.no_autoflush:
-      tableEntity = session.execute(query).scalar()
-    if tableEntity is None:
+      tableEntity = session.get(self.sqlalchemyTableType, id,
+                                populate_existing = refresh)
+    if tableEntity is None and raiseIfMissing:
       errMsg = f"Could not find any db entry with id '{id}' on table {str(self.sqlalchemyTableType.__table__)}."
-      session.expunge_all()
-      session.close()
+      _cleanAndCloseSession(session = session)
       raise Exception(errMsg)
     return tableEntity
+  @classmethod
   def queryById(self,
                 session: sqlalchemy_orm.Session,
-                id: uuid.UUID):
-    sqlalchemyTableEntity = self._queryTableById(session=session, id=id)
+                id: uuid.UUID,
+                refresh: bool = None):
+    sqlalchemyTableEntity = self._queryTableById(session=session, id=id, refresh=refresh)
     output = self.defineBySqlalchemyTable(session=session, 
                                         sqlalchemyTableEntity = sqlalchemyTableEntity)
     output._hasValueInput = True
     return output
+  # Multiple ids resolved at once
+  #   - entities of the identity map of the session are taken as is (unless refreshed - 
+  #     see '_refresh_on_query_by_id'), the others are queried by chunks of 
+  #     '_ids_query_chunk_size' ids ('IN')
+  #   - all ids not found are reported by a single exception (or omitted from the 
+  #     result if not 'raiseIfMissing')
+  #   -> {<id>: <sqlalchemyTable>}
+  _ids_query_chunk_size = 1000
+  @classmethod
+  @cleanAndCloseSession
+  def _queryTablesByIds(self,
+                        session: sqlalchemy_orm.Session,
+                        ids: typing.Iterable[uuid.UUID],
+                        refresh: bool = None,
+                        raiseIfMissing: bool = True) -> typing.Dict[uuid.UUID, sqlalchemy_decl.DeclarativeMeta]:
+    if refresh is None: refresh = self._refresh_on_query_by_id
+    result: typing.Dict[uuid.UUID, sqlalchemy_decl.DeclarativeMeta] = {}
+    queryIds = []
+    mapper = sqlalchemy.inspect(self.sqlalchemyTableType)
+    for id in dict.fromkeys(ids):
+      identityKey = mapper.identity_key_from_primary_key([id])
+      sqlalchemyTable = None if refresh else session.identity_map.get(identityKey)
+      if sqlalchemyTable is None:
+        queryIds.append(id)
+      else:
+        result[id] = sqlalchemyTable
+    for pos in range(0, len(queryIds), self._ids_query_chunk_size):
+      query = sqlalchemy.select(self.sqlalchemyTableType) \
+                        .where(self.sqlalchemyTableType.id.in_(queryIds[pos:pos + self._ids_query_chunk_size])) \
+                        .execution_options(populate_existing = refresh)
+      with session.no_autoflush:
+        sqlalchemyTables = session.scalars(query).unique().all()
+      for sqlalchemyTable in sqlalchemyTables:
+        result[sqlalchemyTable.id] = sqlalchemyTable
+    missingIds = [id for id in queryIds if not id in result]
+    if len(missingIds) > 0 and raiseIfMissing:
+      errMsg = f"Could not find any db entry with ids {', '.join(repr(str(id)) for id in missingIds)} " + \
+               f"on table {str(self.sqlalchemyTableType.__table__)} (exactly '{len(missingIds)}' ids missing)."
+      _cleanAndCloseSession(session = session)
+      raise Exception(errMsg)
+    return result
+  @classmethod
+  def queryByIds(self,
+                 session: sqlalchemy_orm.Session,
+                 ids: typing.Iterable[uuid.UUID],
+                 refresh: bool = None) -> typing.List[CapsuleBase]:
+    # capsules in the order of the ids provided
+    ids = list(ids)
+    sqlalchemyTableEntities = self._queryTablesByIds(session = session, ids = ids, refresh = refresh)
+    result = []
+    for id in ids:
+      output = self.defineBySqlalchemyTable(session = session, 
+                                            sqlalchemyTableEntity = sqlalchemyTableEntities[id])
+      output._hasValueInput = True
+      result.append(output)
+    return result
+
+  # new and dirty sqlalchemyTables of the type in the session
+  #   (read from the type index of the session if enabled - see capsule_type_index)
+  @classmethod
+  def _getNewSqlalchemyTables(self,
+                              session: sqlalchemy_orm.Session) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    typeIndex = capsule_type_index.getTypeIndex(session = session)
+    if typeIndex is not None:
+      return typeIndex.getNewSqlalchemyTables(sqlalchemyTableType = self.sqlalchemyTableType)
+    return [newObject for newObject in session.new if isinstance(newObject, self.sqlalchemyTableType)]
+  @classmethod
+  def _getDirtySqlalchemyTables(self,
+                                session: sqlalchemy_orm.Session) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    typeIndex = capsule_type_index.getTypeIndex(session = session)
+    if typeIndex is not None:
+      return typeIndex.getDirtySqlalchemyTables(sqlalchemyTableType = self.sqlalchemyTableType)
+    return [modifiedObject for modifiedObject in session.dirty if isinstance(modifiedObject, self.sqlalchemyTableType)]
 
   @classmethod
   @cleanAndCloseSession
   def _queryTablesAll(self,
                 session: sqlalchemy_orm.Session) -> typing.List[sqlalchemy_decl.DeclarativeMeta]: 
     query = sqlalchemy.select(self.sqlalchemyTableType).where(self.sqlalchemyTableType.id == id)
-    result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
-    for newObject in session.new:
-      if isinstance(newObject, self.sqlalchemyTableType):
-        result.append(newObject)
-    for modifiedObject in session.dirty:
-      if isinstance(modifiedObject, self.sqlalchemyTableType):
-        result.append(modifiedObject)
+    result: typing.List[sqlalchemy_decl.DeclarativeMeta] = self._getNewSqlalchemyTables(session) + \
+                                                           self._getDirtySqlalchemyTables(session)
     query = sqlalchemy.select(self.sqlalchemyTableType)
     with session.no_autoflush:
       return result + session.scalars(query).unique().all()
@@ -241,6 +390,8 @@ class CapsuleBase():
 
 
 class CapsuleBaseWithName(CapsuleBase):
+  __slots__ = ('enforceNotNewOrDirty',)
+
   @cleanAndCloseSession
   def __init__(self,
                session: sqlalchemy_orm.Session,
@@ -257,14 +408,12 @@ class CapsuleBaseWithName(CapsuleBase):
                               session: sqlalchemy_orm.Session,
                               namePrefix: str) -> typing.List[sqlalchemy_decl.DeclarativeMeta]: 
     result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
-    for newObject in session.new:
-      if isinstance(newObject, self.sqlalchemyTableType):
-        if newObject.name.startswith(namePrefix):
-          result.append(newObject)
-    for modifiedObject in session.dirty:
-      if isinstance(modifiedObject, self.sqlalchemyTableType):
-        if modifiedObject.name.startswith(namePrefix):
-          result.append(modifiedObject)
+    for newObject in self._getNewSqlalchemyTables(session):
+      if newObject.name.startswith(namePrefix):
+        result.append(newObject)
+    for modifiedObject in self._getDirtySqlalchemyTables(session):
+      if modifiedObject.name.startswith(namePrefix):
+        result.append(modifiedObject)
     query = sqlalchemy.select(self.sqlalchemyTableType).where(self.sqlalchemyTableType.name.startswith(namePrefix))
     with session.no_autoflush:
       return result + session.scalars(query).unique().all()
@@ -286,11 +435,16 @@ class CapsuleBaseWithName(CapsuleBase):
   def getNewSqlalchemyTablesOfName(self,
                                    session: sqlalchemy_orm.Session,
                                    name: str) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    nameIndex = capsule_name_index.getNameIndex(session = session)
+    if nameIndex is not None:
+      return [sqlalchemyTable for sqlalchemyTable in \
+                  nameIndex.getSqlalchemyTablesOfName(sqlalchemyTableType = self.sqlalchemyTableType,
+                                                      name = name) \
+                if sqlalchemy.inspect(sqlalchemyTable).pending]
     result = []
-    for newObject in session.new:
-      if isinstance(newObject, self.sqlalchemyTableType):
-        if newObject.name == name:
-          result.append(newObject)
+    for newObject in self._getNewSqlalchemyTables(session):
+      if newObject.name == name:
+        result.append(newObject)
     return result
   @classmethod
   def hasNewSqlalchemyTablesOfName(self,
@@ -301,11 +455,19 @@ class CapsuleBaseWithName(CapsuleBase):
   def getDirtySqlalchemyTablesOfName(self,
                                      session: sqlalchemy_orm.Session,
                                      name: str) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    nameIndex = capsule_name_index.getNameIndex(session = session)
+    if nameIndex is not None:
+      result = []
+      for sqlalchemyTable in nameIndex.getSqlalchemyTablesOfName(sqlalchemyTableType = self.sqlalchemyTableType,
+                                                                 name = name):
+        sqlalchemyTableState = sqlalchemy.inspect(sqlalchemyTable)
+        if sqlalchemyTableState.persistent and sqlalchemyTableState.modified:
+          result.append(sqlalchemyTable)
+      return result
     result = []
-    for modifiedObject in session.dirty:
-      if isinstance(modifiedObject, self.sqlalchemyTableType):
-        if modifiedObject.name == name:
-          result.append(modifiedObject)
+    for modifiedObject in self._getDirtySqlalchemyTables(session):
+      if modifiedObject.name == name:
+        result.append(modifiedObject)
     return result
   @classmethod
   def hasDirtySqlalchemyTablesOfName(self,
@@ -334,10 +496,64 @@ class CapsuleBaseWithName(CapsuleBase):
     newOrDirty = self.getNewOrDirtySqlalchemyTablesOfName(session, name)
     if len(newOrDirty) > 0:
       return newOrDirty
+    # entities loaded (unchanged) into the session if the session has a name index
+    nameIndex = capsule_name_index.getNameIndex(session = session)
+    if nameIndex is not None:
+      sqlalchemyTables = nameIndex.getSqlalchemyTablesOfName(sqlalchemyTableType = self.sqlalchemyTableType,
+                                                             name = name)
+      if len(sqlalchemyTables) > 0:
+        return sqlalchemyTables
     # if not in new objects search database
     query = sqlalchemy.select(self.sqlalchemyTableType).where(self.sqlalchemyTableType.name == name)
     with session.no_autoflush:
       return session.scalars(query).unique().all()
+  # Entities of several names resolved at once (one 'IN' query per chunk of names)
+  #   - names of new or dirty entities of the session are omitted as these take
+  #     precedence over the entities on the db (see _queryTableByName)
+  #   - names identifying more than one entity are omitted
+  #   -> {<name>: <sqlalchemyTable>} of the names found on the db (or in the name 
+  #      index of the session - see capsule_name_index)
+  _names_query_chunk_size = 1000
+  @classmethod
+  @cleanAndCloseSession
+  def _queryTablesByNames(self,
+                          session: sqlalchemy_orm.Session,
+                          names: typing.Iterable[str]) -> typing.Dict[str, sqlalchemy_decl.DeclarativeMeta]:
+    result: typing.Dict[str, sqlalchemy_decl.DeclarativeMeta] = {}
+    duplicateNames = set()
+    newOrDirtyNames = set()
+    nameIndex = capsule_name_index.getNameIndex(session = session)
+    if nameIndex is not None:
+      # names of entities of the session resolved by the name index
+      for name in set(names):
+        if self.hasNewOrDirtySqlalchemyTablesOfName(session, name):
+          newOrDirtyNames.add(name)
+          continue
+        sqlalchemyTables = nameIndex.getSqlalchemyTablesOfName(sqlalchemyTableType = self.sqlalchemyTableType,
+                                                               name = name)
+        if len(sqlalchemyTables) == 1:
+          result[name] = sqlalchemyTables[0]
+        elif len(sqlalchemyTables) > 1:
+          duplicateNames.add(name)
+    else:
+      for sessionObject in self._getNewSqlalchemyTables(session) + self._getDirtySqlalchemyTables(session):
+        newOrDirtyNames.add(sessionObject.name)
+    requestedNames = set(names) - newOrDirtyNames - result.keys() - duplicateNames
+    queryNames = list(requestedNames)
+    for pos in range(0, len(queryNames), self._names_query_chunk_size):
+      query = sqlalchemy.select(self.sqlalchemyTableType) \
+                        .where(self.sqlalchemyTableType.name.in_(queryNames[pos:pos + self._names_query_chunk_size]))
+      with session.no_autoflush:
+        sqlalchemyTables = session.scalars(query).unique().all()
+      for sqlalchemyTable in sqlalchemyTables:
+        # the name of an entity changed during the session differs from the name on the db
+        if not sqlalchemyTable.name in requestedNames: continue
+        if sqlalchemyTable.name in result:
+          duplicateNames.add(sqlalchemyTable.name)
+        result[sqlalchemyTable.name] = sqlalchemyTable
+    for duplicateName in duplicateNames:
+      result.pop(duplicateName, None)
+    return result
   @classmethod
   @cleanAndCloseSession
   def nameExists(self,
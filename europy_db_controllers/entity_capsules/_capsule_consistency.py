@@ -3,7 +3,8 @@ import typing, datetime, sys, uuid, enum, sqlalchemy, json
 from sqlalchemy.ext import declarative as sqlalchemy_decl
 
 
-from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils, _capsule_shared
+from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils, _capsule_shared, _capsule_schema, \
+                                                  capsule_deferred_consistency
 
 T = typing.TypeVar("T", bound=_capsule_base.CapsuleBase)
 U = typing.TypeVar("U", bound=_capsule_base.CapsuleBase)
@@ -21,15 +22,15 @@ U = typing.TypeVar("U", bound=_capsule_base.CapsuleBase)
 #         the relationship's entity 
 #         (<capsule>.sqlalchemyTable.<relationshipName>.name)
 def __ensureConsistentRelationshipName(capsule: T,
-                                       dictAttributeNamingConventions: dict[str, str]):
-  relationshipNameCapsuleInternalAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_INTERNAL_NAME]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+                                       relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
+  relationshipNameCapsuleInternalAttr = relationshipDescriptor.internalNameAttr
+  relationshipName = relationshipDescriptor.relationshipName
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Do nothing if the capsule has no attribute for the relationships name
   #    (no <capsule>.<relationshipNameCapsuleInternalAttr>), 
   #    i.e. the sqlalchemyTable of the relationship does not have a 'name'
   #    attribute.
-  if hasattr(capsule, relationshipNameCapsuleInternalAttr):
+  if relationshipDescriptor.hasName:
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # Identify the sqlalchemyTable of the relationship's entity
     with capsule.session.no_autoflush:
@@ -65,9 +66,9 @@ def __ensureConsistentRelationshipName(capsule: T,
                 f"Value of '{relationshipNameCapsuleInternalAttr}': {relationshipNameOnCapsule}\n" + \
                 f"Value of 'name' of {relationshipName}: {relationshipNameStoredSqla}\n"
       if relationshipNameStoredSqla is None:
-        capsule._raiseException(errMsg)
+        capsule._raiseConsistencyException(errMsg)
       if relationshipNameOnCapsule != relationshipNameStoredSqla:
-        capsule._raiseException(errMsg)
+        capsule._raiseConsistencyException(errMsg)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # b. Function ensuring the id of the relationship's entity being consistent between
@@ -78,14 +79,14 @@ def __ensureConsistentRelationshipName(capsule: T,
 #         the relationship's entity 
 #         (<capsule>.sqlalchemyTable.<relationshipName>.id)
 def __ensureConsistentRelationshipId(capsule: T,
-                                     dictAttributeNamingConventions: dict[str, str]):
-  relationshipIdAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_ID]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+                                     relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
+  relationshipIdAttr = relationshipDescriptor.idAttr
+  relationshipName = relationshipDescriptor.relationshipName
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Raise Exception if the sqlalchemyTable of the capsule does not have
   #    an attribute providing the relationship's id (see above #b)
   _capsule_shared._raiseExceptionIfNoRelationshipIdOnCapsuleSqlaTable(capsule = capsule,
-                                                       dictAttributeNamingConventions = dictAttributeNamingConventions) 
+                                                       dictAttributeNamingConventions = relationshipDescriptor.namingConventions) 
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Identify the sqlalchemyTable of the relationship's entity
   with capsule.session.no_autoflush:
@@ -135,37 +136,36 @@ def __ensureConsistentRelationshipId(capsule: T,
               f"Value of '{relationshipIdAttr}': {relationshipIdOnCapsule}\n" + \
               f"Value of 'id' of {relationshipName}: {relationshipIdStoredSqla}\n"
     if relationshipIdStoredSqla is None:
-      capsule._raiseException(errMsg)
+      capsule._raiseConsistencyException(errMsg)
     if relationshipIdOnCapsule != relationshipIdStoredSqla:
       # print("\n\ntype(relationshipIdOnCapsule): ", type(relationshipIdOnCapsule), " -  type(relationshipIdStoredSqla): ", type(relationshipIdStoredSqla))
-      capsule._raiseException(errMsg)
+      capsule._raiseConsistencyException(errMsg)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # c. Function ensuring both 'name' and 'id' consistency:
 def __ensureConsistentRelationship(capsule: T,
-                                   dictAttributeNamingConventions: dict[str, str]):
-  relationshipNameCapsuleInternalAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_INTERNAL_NAME]
+                                   relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
+  relationshipNameCapsuleInternalAttr = relationshipDescriptor.internalNameAttr
   __ensureConsistentRelationshipId(capsule = capsule,
-                                    dictAttributeNamingConventions = dictAttributeNamingConventions)
-  if hasattr(capsule, relationshipNameCapsuleInternalAttr):
+                                    relationshipDescriptor = relationshipDescriptor)
+  if relationshipDescriptor.hasName:
     __ensureConsistentRelationshipName(capsule = capsule,
-                                        dictAttributeNamingConventions = dictAttributeNamingConventions)
+                                        relationshipDescriptor = relationshipDescriptor)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # d. Function sourcing the relationship entity's sqlalchemyTable from db based
 #       upon the relationship entity's id
 def __sourceRelationshipSqlalchemyTableBasedOnId(capsule: T,
-                                                 dictAttributeNamingConventions: dict[str, str],
-                                                 relationshipType: type[U]):
-  relationshipIdAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_ID]
+                                                 relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
+  relationshipIdAttr = relationshipDescriptor.idAttr
   # NOT REQUIRED, SEE BELOW:
-  # relationshipNameCapsuleInternalAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_INTERNAL_NAME]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+  # relationshipNameCapsuleInternalAttr = relationshipDescriptor.internalNameAttr
+  relationshipName = relationshipDescriptor.relationshipName
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Raise Exception if the sqlalchemyTable of the capsule does not have
   #    an attribute providing the relationship's id (see above #b)
   _capsule_shared._raiseExceptionIfNoRelationshipIdOnCapsuleSqlaTable(capsule = capsule,
-                                                       dictAttributeNamingConventions = dictAttributeNamingConventions)
+                                                       dictAttributeNamingConventions = relationshipDescriptor.namingConventions)
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Identify the relationship entity's id as defined on the capsule's sqlalchemyTable 
   #      (as per <capsule>.sqlalchemyTable.<relationshipIdAttr>)
@@ -176,10 +176,14 @@ def __sourceRelationshipSqlalchemyTableBasedOnId(capsule: T,
     #      (as per <capsule>.sqlalchemyTable.<relationshipIdAttr>) has some
     #      value assigned, source it from the db
     # Comment: If no such relationship entity is found on the db, this raises an 
-    #          Exception (see module _capsule_base)
-    sqlalchemyTable = relationshipType._queryTableById(
+    #          Exception
+    sqlalchemyTable = relationshipDescriptor.capsuleType._queryTableById(
                                 session = capsule.session, 
-                                id = relationshipIdOnCapsule)
+                                id = relationshipIdOnCapsule,
+                                raiseIfMissing = False)
+    if sqlalchemyTable is None:
+      capsule._raiseConsistencyException(f"Could not find any db entry with id '{relationshipIdOnCapsule}' on table " + \
+                      f"{str(relationshipDescriptor.sqlalchemyTableType.__table__)}.")
     # Set the attribute <relationshipName> of the capsule's sqlalchemyTable
     #    equal to the relationship entity's sqlalchemyTable sourced
     setattr(capsule.sqlalchemyTable, relationshipName, sqlalchemyTable)
@@ -203,22 +207,21 @@ def __sourceRelationshipSqlalchemyTableBasedOnId(capsule: T,
     #         (<capsule>.sqlalchemyTable.<relationshipName>.name)
     # see above #c
     __ensureConsistentRelationshipName(capsule = capsule,
-                                       dictAttributeNamingConventions = dictAttributeNamingConventions)    
+                                       relationshipDescriptor = relationshipDescriptor)    
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # e. Function sourcing the relationship entity's sqlalchemyTable from db based
 #       upon the relationship entity's name
 def __sourceRelationshipSqlalchemyTableBasedOnName(capsule: T,
-                                                   dictAttributeNamingConventions: dict[str, str],
-                                                   relationshipType: type[U]):
-  relationshipNameCapsuleInternalAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_INTERNAL_NAME]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+                                                   relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
+  relationshipNameCapsuleInternalAttr = relationshipDescriptor.internalNameAttr
+  relationshipName = relationshipDescriptor.relationshipName
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Do nothing if the capsule has no attribute for the relationships name
   #    (no <capsule>.<relationshipNameCapsuleInternalAttr>), 
   #    i.e. the sqlalchemyTable of the relationship does not have a 'name'
   #    attribute.
-  if hasattr(capsule, relationshipNameCapsuleInternalAttr):
+  if relationshipDescriptor.hasName:
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # Identify the relationship entity's name as defined on the capsule 
     #      (as per <capsule>.<relationshipNameCapsuleInternalAttr>)
@@ -230,16 +233,16 @@ def __sourceRelationshipSqlalchemyTableBasedOnName(capsule: T,
       #      value assigned, source it from the db
       # Comment: If no such relationship entity is found on the db, no Exception is  
       #          raised (see module _capsule_base)
-      sqlalchemyTables = relationshipType._queryTableByName(
+      sqlalchemyTables = relationshipDescriptor.capsuleType._queryTableByName(
                                   session = capsule.session,
                                   name =  relationshipNameOnCapsule)
       # Raise an Exception if no such relationship entity has been identified or 
       #    the name of the relationship's entity provided is not unique
       if len(sqlalchemyTables) == 0:
-        capsule._raiseException(f"No entities of '{relationshipName}' on object " + \
+        capsule._raiseConsistencyException(f"No entities of '{relationshipName}' on object " + \
                         f"of type '{type(capsule)}' with name: {relationshipNameOnCapsule}")
       elif len(sqlalchemyTables) > 1:
-        capsule._raiseException(f"Multiple entities of '{relationshipName}' on object " + \
+        capsule._raiseConsistencyException(f"Multiple entities of '{relationshipName}' on object " + \
                         f"of type '{type(capsule)}' with identical name: {relationshipNameOnCapsule}")
       # Set the attribute <relationshipName> of the capsule's sqlalchemyTable
       #    equal to the relationship entity's sqlalchemyTable sourced
@@ -253,16 +256,15 @@ def __sourceRelationshipSqlalchemyTableBasedOnName(capsule: T,
       #         (<capsule>.sqlalchemyTable.<relationshipName>.id)
       # see above #d
       __ensureConsistentRelationshipId(capsule = capsule,
-                                       dictAttributeNamingConventions = dictAttributeNamingConventions)
+                                       relationshipDescriptor = relationshipDescriptor)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # f. Function ensuring the relationship entity's sqlalchemy is consistent with
 #       the capsule's relationship entity's id and name definitions AND
 #       present if such relationship entity is defined on db
 def __ensureConsistentRelationshipSqlalchemyTable(capsule: T,
-                                                dictAttributeNamingConventions: dict[str, str],
-                                                relationshipType: type[U]):
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+                                                relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
+  relationshipName = relationshipDescriptor.relationshipName
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Identify the sqlalchemyTable of the relationship's entity
   relationshipSqlaTable = getattr(capsule.sqlalchemyTable, relationshipName)
@@ -273,8 +275,7 @@ def __ensureConsistentRelationshipSqlalchemyTable(capsule: T,
     # Comment: This does nothing if the capsule sqlalchemyTable's relationship id  
     #          (<capsule>.sqlalchemyTable.<relationshipIdAttr>) is 'None'
     __sourceRelationshipSqlalchemyTableBasedOnId(capsule = capsule,
-                                                 dictAttributeNamingConventions = dictAttributeNamingConventions,
-                                                 relationshipType = relationshipType)
+                                                 relationshipDescriptor = relationshipDescriptor)
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # If the relationship entity's sqlalchemyTable has not been identified
     #    based on id (see above), 
@@ -283,61 +284,127 @@ def __ensureConsistentRelationshipSqlalchemyTable(capsule: T,
     #          (<capsule>.<relationshipNameCapsuleInternalAttr>) is 'None'
     if getattr(capsule.sqlalchemyTable, relationshipName) is None:
       __sourceRelationshipSqlalchemyTableBasedOnName(capsule = capsule,
-                                                     dictAttributeNamingConventions = dictAttributeNamingConventions,
-                                                     relationshipType = relationshipType)
+                                                     relationshipDescriptor = relationshipDescriptor)
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # Ensure name and id consistency between definitions on the capsule and the 
     #    relationship entity's sqlalchemyTable (if the latter is defined),
     #    see above #c & #b
     # Comment: This does nothing if the sqlalchemyTable of the relationship's entity
     #          (<capsule>.sqlalchemyTable.<relationshipName>) is 'None'
-    nameOfConsistencyFnc = _capsule_utils.getConsistencyCheckFncName(
-                                    relationshipName = relationshipName)
-    getattr(capsule, nameOfConsistencyFnc)()
+    getattr(capsule, relationshipDescriptor.consistencyCheckFncName)()
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# g. Incremental checks: the state of the relationship attributes of a capsule is
+#       recorded per check function once the check succeeded 
+#       (<capsule>._consistentRelationshipStates) - a check is skipped as long as
+#       the state is unchanged
+#    - the state comprises the capsule's sqlalchemyTable, its relationship id and
+#      relationship entity, the latter's name and the relationship name on the capsule
+#    - read from the sqlalchemy instance states (no loading): unloaded or expired 
+#      attributes never match a recorded state (attributes not set on objects without
+#      db identity are 'None')
+#    - the setters of the relationship attributes discard the recorded states
+#      (see _generic_capsule_attr)
+#    - checks are recorded instead of run on sessions deferring the consistency
+#      checks (see capsule_deferred_consistency)
+_NOT_LOADED = object()
+
+def __getRelationshipState(capsule: T,
+                           relationshipDescriptor: _capsule_schema.RelationshipDescriptor) -> tuple:
+  sqlalchemyTable = capsule.sqlalchemyTable
+  if sqlalchemyTable is None: return None
+  instanceState = sqlalchemy.inspect(sqlalchemyTable)
+  stateDict = instanceState.dict
+  notLoaded = None if instanceState.key is None else _NOT_LOADED
+  relationshipSqlaTable = stateDict.get(relationshipDescriptor.relationshipName, notLoaded)
+  relationshipId = stateDict.get(relationshipDescriptor.idAttr, notLoaded)
+  if _NOT_LOADED in (relationshipSqlaTable, relationshipId): return None
+  relationshipNameOnCapsule = None
+  relationshipNameStoredSqla = None
+  if relationshipDescriptor.hasName:
+    relationshipNameOnCapsule = getattr(capsule, relationshipDescriptor.internalNameAttr)
+    if relationshipSqlaTable is not None:
+      relationshipNameStoredSqla = sqlalchemy.inspect(relationshipSqlaTable).dict.get('name', _NOT_LOADED)
+      if relationshipNameStoredSqla is _NOT_LOADED: return None
+  return (sqlalchemyTable, relationshipId, relationshipSqlaTable, 
+          relationshipNameStoredSqla, relationshipNameOnCapsule)
+
+def __runIncrementally(capsule: T,
+                       relationshipDescriptor: _capsule_schema.RelationshipDescriptor,
+                       checkFncName: str,
+                       checkFnc: typing.Callable[[], None]):
+  deferredConsistency = capsule_deferred_consistency.getDeferredConsistency(session = capsule.session)
+  if deferredConsistency is not None and \
+     deferredConsistency.defer(capsule = capsule,
+                               relationshipDescriptor = relationshipDescriptor):
+    return
+  if not capsule._incremental_consistency_checks:
+    checkFnc()
+    return
+  consistentStates = capsule._consistentRelationshipStates
+  recordedState = consistentStates.get(checkFncName)
+  if recordedState is not None and \
+     recordedState == __getRelationshipState(capsule = capsule,
+                                             relationshipDescriptor = relationshipDescriptor):
+    return
+  consistentStates.pop(checkFncName, None)
+  checkFnc()
+  state = __getRelationshipState(capsule = capsule,
+                                 relationshipDescriptor = relationshipDescriptor)
+  if state is not None:
+    consistentStates[checkFncName] = state
+
+def discardConsistentStates(capsule: T,
+                            relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
+  consistentStates = capsule._consistentRelationshipStates
+  consistentStates.pop(relationshipDescriptor.consistencyCheckFncName, None)
+  consistentStates.pop(relationshipDescriptor.sourceAndConsistencyCheckFncName, None)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # Definition of class attributes:
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # 1. Adding the consistency test of the relationship
 def __addConsistencyCheck(capsuleType: type[T],
-                        dictAttributeNamingConventions: dict[str, str]):
+                        relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
   def fncConsistencyCheck(self: T):
     
     # if type(self).__name__ == "AssetClassCapsule":
     #   print(f"__addConsistencyCheck on capsule {type(self)}")
     #   print(f"    capsule.sqlalchemyTable: \n{self.sqlalchemyTable}                ")
     
-    __ensureConsistentRelationship(capsule = self,
-                                   dictAttributeNamingConventions = dictAttributeNamingConventions)
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]  
-  nameOfFnc = _capsule_utils.getConsistencyCheckFncName(
-                                   relationshipName = relationshipName)
+    __runIncrementally(capsule = self,
+                       relationshipDescriptor = relationshipDescriptor,
+                       checkFncName = nameOfFnc,
+                       checkFnc = lambda: __ensureConsistentRelationship(
+                                              capsule = self,
+                                              relationshipDescriptor = relationshipDescriptor))
+  nameOfFnc = relationshipDescriptor.consistencyCheckFncName
   fncConsistencyCheckDecorated = _capsule_base.cleanAndCloseSession(
                                     func = fncConsistencyCheck)
   setattr(capsuleType, nameOfFnc, fncConsistencyCheckDecorated)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # 2. Adding the conditional sourcing with consistency test of the relationship
 def __addConditionalSourcingWithConsistency(capsuleType: type[T],
-                                          dictAttributeNamingConventions: dict[str, str],
-                                          relationshipType: type[U]):
+                                          relationshipDescriptor: _capsule_schema.RelationshipDescriptor):
   def fncSourceAndTestForConsistency(self: T):
-    __ensureConsistentRelationshipSqlalchemyTable(capsule = self,
-                                                  dictAttributeNamingConventions = dictAttributeNamingConventions,
-                                                  relationshipType = relationshipType)
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]  
-  nameOfFnc = _capsule_utils.getSourceAndConsistencyCheckFncName(
-                                  relationshipName = relationshipName)
+    __runIncrementally(capsule = self,
+                       relationshipDescriptor = relationshipDescriptor,
+                       checkFncName = nameOfFnc,
+                       checkFnc = lambda: __ensureConsistentRelationshipSqlalchemyTable(
+                                              capsule = self,
+                                              relationshipDescriptor = relationshipDescriptor))
+  nameOfFnc = relationshipDescriptor.sourceAndConsistencyCheckFncName
   fncSourceAndTestForConsistencyDecorated = _capsule_base.cleanAndCloseSession(
                                     func = fncSourceAndTestForConsistency)
   setattr(capsuleType, nameOfFnc, fncSourceAndTestForConsistencyDecorated)
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # 3. Adding the consistency test over all relationships
 def __addOverAllConsistencyCheck(capsuleType: type[T],
-                               relationshipNames: typing.List[str]):
+                               relationshipDescriptors: typing.Tuple[_capsule_schema.RelationshipDescriptor, ...]):
+  fncNames = tuple(relationshipDescriptor.consistencyCheckFncName \
+                      for relationshipDescriptor in relationshipDescriptors)
   def fncConsistencyCheck(self: T):
-    for relationshipName in relationshipNames:
-      nameOfFnc = _capsule_utils.getConsistencyCheckFncName(
-                                   relationshipName = relationshipName)
+    for nameOfFnc in fncNames:
       getattr(self, nameOfFnc)()
   nameOfFnc = _capsule_utils.getConsistencyCheckOverAllFncName()
   fncConsistencyCheckDecorated = _capsule_base.cleanAndCloseSession(
@@ -346,11 +413,11 @@ def __addOverAllConsistencyCheck(capsuleType: type[T],
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # 4. Adding the conditional sourcing with consistency test over all relationships
 def __addOverAllConditionalSourcingWithConsistency(capsuleType: type[T],
-                                                   relationshipNames: typing.List[str]):
+                                                   relationshipDescriptors: typing.Tuple[_capsule_schema.RelationshipDescriptor, ...]):
+  fncNames = tuple(relationshipDescriptor.sourceAndConsistencyCheckFncName \
+                      for relationshipDescriptor in relationshipDescriptors)
   def fncSourceAndTestForConsistency(self: T):
-    for relationshipName in relationshipNames:
-      nameOfFnc = _capsule_utils.getSourceAndConsistencyCheckFncName(
-                                   relationshipName = relationshipName)
+    for nameOfFnc in fncNames:
       getattr(self, nameOfFnc)()
   nameOfFnc = _capsule_utils.getSourceAndConsistencyCheckOverAllFncName()
   fncSourceAndTestForConsistencyDecorated = _capsule_base.cleanAndCloseSession(
@@ -361,24 +428,14 @@ def __addOverAllConditionalSourcingWithConsistency(capsuleType: type[T],
 def addRelationshipConsistencyChecks(capsuleList: typing.List[T],
                                      callingGlobals):
   for capsuleType in capsuleList:
-    sqlalchemyTableType = capsuleType.sqlalchemyTableType
-    relationshipNames: typing.List[str] = []
-    for column in sqlalchemyTableType.__table__.columns:
-      if _capsule_utils.isRelationshipIdColumn(column=column):
-        relationshipName = _capsule_utils.getRelationshipNameOfColumn(column = column)
-        dictAttributeNamingConventions = _capsule_utils.getDictOfAttributeNamingConventionsFromRelationshipName(
-                        relationshipName = relationshipName)
-        relationshipType = _capsule_utils.getRelationshipCapsuleTypeOfName(
-                        relationshipName = relationshipName,
-                        sqlalchemyTableType = sqlalchemyTableType,
-                        callingGlobals = callingGlobals)
-        relationshipNames.append(relationshipName)
-        __addConsistencyCheck(capsuleType = capsuleType,
-                            dictAttributeNamingConventions = dictAttributeNamingConventions) 
-        __addConditionalSourcingWithConsistency(capsuleType = capsuleType,
-                                              dictAttributeNamingConventions = dictAttributeNamingConventions,
-                                              relationshipType = relationshipType)
+    # the relationships defined by the '_id' columns of the capsule's table
+    relationshipDescriptors = _capsule_schema.getSchema(capsuleType = capsuleType).columnRelationships
+    for relationshipDescriptor in relationshipDescriptors:
+      __addConsistencyCheck(capsuleType = capsuleType,
+                          relationshipDescriptor = relationshipDescriptor) 
+      __addConditionalSourcingWithConsistency(capsuleType = capsuleType,
+                                            relationshipDescriptor = relationshipDescriptor)
     __addOverAllConsistencyCheck(capsuleType = capsuleType,
-                               relationshipNames = relationshipNames)      
+                               relationshipDescriptors = relationshipDescriptors)      
     __addOverAllConditionalSourcingWithConsistency(capsuleType = capsuleType,
-                                                 relationshipNames = relationshipNames)      
+                                                 relationshipDescriptors = relationshipDescriptors)      
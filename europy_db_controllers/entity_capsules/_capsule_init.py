@@ -4,14 +4,15 @@ import typing, sys
 from sqlalchemy.ext import declarative as sqlalchemy_decl
 
 
-from europy_db_controllers.entity_capsules import _capsule_utils, _capsule_base
+from europy_db_controllers.entity_capsules import _capsule_utils, _capsule_base, _capsule_schema
+from europy_db_controllers.utils import code_cache
 
 
 T = typing.TypeVar("T", bound=_capsule_base.CapsuleBase)
 
 
-def __getInitCode(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta],
-                  callingGlobals) -> str:
+def __getInitCode(schema: _capsule_schema.CapsuleSchema) -> str:
+  sqlalchemyTableType = schema.sqlalchemyTableType
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # Def head and input parameter definition
@@ -57,19 +58,15 @@ def __getInitCode(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMe
     #         sqlalchemyTableType has a 'name')
     #    - the object of the relationship
     if _capsule_utils.isRelationshipIdColumn(column=column):
-      relSqlaObjectTypeName = _capsule_utils.getRelationshipTypeName(sqlalchemyTableType=sqlalchemyTableType, 
-                                                                     column=column)
-      relSqlaObjectType = callingGlobals[relSqlaObjectTypeName]
-      if hasattr(relSqlaObjectType, 'name'):
-        relNameColumnName = _capsule_utils.getRelationshipNameFieldOfColumn(column=column)
-        output = output + getBasicInputLine(varName=relNameColumnName,
+      relationshipDescriptor = schema.getRelationship(
+                      relationshipName = _capsule_utils.getRelationshipNameOfColumn(column=column))
+      if relationshipDescriptor.hasName:
+        output = output + getBasicInputLine(varName=relationshipDescriptor.nameAttr,
                                 typeName="str",
                                 default="None",
                                 isEnd=cntrIsEnd)
-      relColumnName = _capsule_utils.getRelationshipNameOfColumn(column=column)
-      relCapsuleObjectType = _capsule_utils.getSqlaToCapsuleName(relSqlaObjectTypeName)
-      output = output + getBasicInputLine(varName=relColumnName,
-                              typeName=relCapsuleObjectType,
+      output = output + getBasicInputLine(varName=relationshipDescriptor.relationshipName,
+                              typeName=relationshipDescriptor.capsuleType.__name__,
                               default="None",
                               isEnd=isEnd)
     return output
@@ -103,6 +100,9 @@ def __getInitCode(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMe
     output = ""
     output = output + f"{' ' * 2}super({capsuleClassName}, self).__init__(session = session,\n"
     output = output + f"{' ' * 2}                                         {notNewOrDirty} = {notNewOrDirty})\n"
+    # internal name fields of the relationships (slots - see _capsule_schema.getInstanceSlots)
+    for internalNameAttr in schema.capsuleType.__slots__:
+      output = output + f"{' ' * 2}self.{internalNameAttr} = None\n"
     return output
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # The code lines handling the input parameters of each column      
@@ -111,13 +111,12 @@ def __getInitCode(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMe
     for column in columns:
       output = output + f"{' ' * 2}self._omit_none_{column.name}({column.name})\n"    
       if _capsule_utils.isRelationshipIdColumn(column=column):
-        relSqlaObjectTypeName = _capsule_utils.getRelationshipTypeName(sqlalchemyTableType=sqlalchemyTableType, 
-                                                                       column=column)
-        relSqlaObjectType = callingGlobals[relSqlaObjectTypeName]
-        if hasattr(relSqlaObjectType, 'name'):
-          relationshipName = _capsule_utils.getRelationshipNameFieldOfColumn(column=column)
+        relationshipDescriptor = schema.getRelationship(
+                        relationshipName = _capsule_utils.getRelationshipNameOfColumn(column=column))
+        if relationshipDescriptor.hasName:
+          relationshipName = relationshipDescriptor.nameAttr
           output = output + f"{' ' * 2}self._omit_none_{relationshipName}({relationshipName})\n"
-        relColumnName = _capsule_utils.getRelationshipNameOfColumn(column=column)
+        relColumnName = relationshipDescriptor.relationshipName
         output = output + f"{' ' * 2}if {relColumnName} is not None:\n"
         output = output + f"{' ' * 4}self.sqlalchemyTable.{relColumnName} = {relColumnName}.sqlalchemyTable\n"
     return output 
@@ -136,7 +135,7 @@ def __getInitCode(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMe
 
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # identification of the column not hidden to the outside
-  nonChangeTrackColumns = _capsule_utils.getNonChangeTrackColumns(sqlalchemyTableType = sqlalchemyTableType)   
+  nonChangeTrackColumns = schema.columns
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
   # The complete function definition:
   return getInitDef(sqlalchemyTableType = sqlalchemyTableType, 
@@ -145,17 +144,21 @@ def __getInitCode(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMe
 
 
 def addInitMethods(capsuleList: typing.List[T],
-                   callingGlobals):
+                   callingGlobals,
+                   codeCache: code_cache.CodeCache = None):
+  if codeCache is None: codeCache = code_cache.CodeCache()
   for capsuleType in capsuleList:
     sqlalchemyTableType = capsuleType.sqlalchemyTableType
-    initCodeString = __getInitCode(sqlalchemyTableType = sqlalchemyTableType, 
-                                   callingGlobals = callingGlobals)
-    
-    if capsuleType.__name__ == "MarketAndForwardTransactionCapsule":
-      print(f"setupCode {capsuleType.__name__}: \n{initCodeString}")
-      
-    exec(initCodeString , callingGlobals)
-    initMethod = callingGlobals[_capsule_utils.getInitFncName(sqlalchemyTableType=sqlalchemyTableType)]
+    def getInitCodeString() -> str:
+      initCodeString = __getInitCode(schema = _capsule_schema.getSchema(capsuleType = capsuleType))
+      if capsuleType.__name__ == "MarketAndForwardTransactionCapsule":
+        print(f"setupCode {capsuleType.__name__}: \n{initCodeString}")
+      return initCodeString
+    # source code is only generated and compiled if not available in the code cache
+    initMethod = codeCache.execCode(
+                        fncName = _capsule_utils.getInitFncName(sqlalchemyTableType=sqlalchemyTableType),
+                        getSourceCode = getInitCodeString,
+                        namespace = callingGlobals)
     initMethodDecorated = _capsule_base.cleanAndCloseSession(
                                       func = initMethod)
     setattr(capsuleType, "__init__", initMethodDecorated)
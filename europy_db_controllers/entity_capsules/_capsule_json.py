@@ -1,4 +1,4 @@
-import json, typing, uuid, datetime
+import json, typing, uuid, datetime, keyword, collections
 
 import sqlalchemy as sqla
 from sqlalchemy import orm as sqlalchemy_orm
@@ -6,6 +6,8 @@ from sqlalchemy.ext import declarative as sqlalchemy_decl
 
 from . import _capsule_base
 from . import _capsule_utils
+from . import _capsule_schema
+from europy_db_controllers.utils import code_cache
 
 T = typing.TypeVar("T", bound=_capsule_base.CapsuleBase)
 
@@ -21,77 +23,179 @@ class UUIDEncoder(json.JSONEncoder):
           return str(obj)
         return json.JSONEncoder.default(self, obj)
 
-def __addToJsonFunction(capsuleType: type[T],
-                        callingGlobals):
-  def fncToDict(self: T,
-                omitIds: bool = False) -> dict[str, any]:
-    result = {}
-    sqlalchemyTableType = self.sqlalchemyTableType
-    noJsonFields = sqlalchemyTableType._exclude_from_json
-    noChangeTrackColumns = _capsule_utils.getNonChangeTrackColumns(sqlalchemyTableType = sqlalchemyTableType)
-    for column in noChangeTrackColumns:
-      columnName = column.name 
-      if columnName in noJsonFields:
-        pass # Exclude unwanted fields from JSON
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Source code of the specialized toDict function of a capsule type
+#   - all decisions depending on the schema (excluded from json, relationship columns,
+#     relationship entities' names, display lists, ...) are taken when generating the code
+#   - example (capsule of a table with a 'name', a 'client' relationship (client with name) 
+#     and a manipulation list 'positions'):
+#       def toDictPortfolio(self, omitIds = False):
+#         sqlalchemyTable = self.sqlalchemyTable
+#         result = {
+#           'name': sqlalchemyTable.name,
+#           'client_name': self.client_name,
+#           'client_id': None if omitIds else sqlalchemyTable.client_id,
+#           'id': None if omitIds else sqlalchemyTable.id,
+#           }
+#         result['positions'] = {pos: relationshipEntity.toDict(omitIds = omitIds) \
+#                                   for pos, relationshipEntity in enumerate(self.positions)}
+#         relationshipEntity = self.client
+#         result['client'] = None if relationshipEntity is None else relationshipEntity.toDict(omitIds = omitIds)
+#         return result
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def __getAttributeCode(objName: str, attributeName: str) -> str:
+  if attributeName.isidentifier() and not keyword.iskeyword(attributeName):
+    return f"{objName}.{attributeName}"
+  return f"getattr({objName}, {attributeName!r})"
+
+def __getToDictCode(schema: _capsule_schema.CapsuleSchema) -> str:
+  nameOfDictFnc = _capsule_utils.getToDictFncName()
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Function head
+  def getDef() -> str:
+    output = f"def {_capsule_utils.getGeneratedToDictFncName(sqlalchemyTableType = schema.sqlalchemyTableType)}" + \
+             f"(self, omitIds = False):\n"
+    output = output + f"{' ' * 2}sqlalchemyTable = self.sqlalchemyTable\n"
+    return output
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Columns (and names of relationship entities) not excluded from json
+  def getColumnCodeLines() -> str:
+    output = f"{' ' * 2}result = {{\n"
+    for column in schema.columns:
+      columnName = column.name
+      if columnName in schema.excludedFromJson: continue
+      columnValueCode = __getAttributeCode("sqlalchemyTable", columnName)
+      isRelationshipColumn = _capsule_utils.isRelationshipIdColumnName(columnName = columnName)
+      if isRelationshipColumn:
+        relationshipDescriptor = schema.getRelationship(
+                        relationshipName = _capsule_utils.getColumnToRelationshipName(columnName = columnName))
+        if relationshipDescriptor.hasName:
+          nameAttr = relationshipDescriptor.nameAttr
+          output = output + f"{' ' * 4}{nameAttr!r}: {__getAttributeCode('self', nameAttr)},\n"
+      if isRelationshipColumn or columnName == 'id':
+        columnValueCode = f"None if omitIds else {columnValueCode}"
+      output = output + f"{' ' * 4}{columnName!r}: {columnValueCode},\n"
+    output = output + f"{' ' * 4}}}\n"
+    return output
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Relationships not excluded from json (display lists are never part of the json)
+  def getRelationshipCodeLines() -> str:
+    output = ""
+    for relationshipDescriptor in schema.relationships:
+      if relationshipDescriptor.isExcludedFromJson: continue
+      relationshipName = relationshipDescriptor.relationshipName
+      relationshipCode = __getAttributeCode("self", relationshipName)
+      if relationshipDescriptor.isList:
+        if relationshipDescriptor.isDisplayList: continue
+        output = output + f"{' ' * 2}result[{relationshipName!r}] = " + \
+                          f"{{pos: relationshipEntity.{nameOfDictFnc}(omitIds = omitIds) " + \
+                          f"for pos, relationshipEntity in enumerate({relationshipCode})}}\n"
       else:
-        isRelationshipColumn = _capsule_utils.isRelationshipIdColumnName(columnName = columnName)
-        isIdColumn = columnName == 'id'
-        if isRelationshipColumn:
-          relationship = _capsule_utils.getRelationship(sqlalchemyTableType = sqlalchemyTableType,
-                                                        column = column,
-                                                        callingGlobals = callingGlobals)
-          relationshipCapsuleType = _capsule_utils.getRelationshipCapsuleTypeOfName( 
-                                                        relationshipName = relationship.key, 
-                                                        sqlalchemyTableType = sqlalchemyTableType, 
-                                                        callingGlobals = callingGlobals)
-          if hasattr(relationshipCapsuleType, 'name'):
-            relationshipEntityNameAttributeName = _capsule_utils.convertRelationshipNameToNameField(
-                                    relationshipName=relationship.key)
-            result[relationshipEntityNameAttributeName] = getattr(self, relationshipEntityNameAttributeName)
-        columnVal = getattr(self.sqlalchemyTable, columnName)
-        if columnVal is None: columnVal = None
-        if type(columnVal) is uuid.UUID: columnVal = columnVal
-        if type(columnVal) is datetime.datetime: columnVal = columnVal #f'{columnVal.strftime(DATETIME_FORMAT)}'
-        if (isRelationshipColumn or isIdColumn) and omitIds:
-          result[columnName] = None
-        else:
-          result[columnName] = columnVal
-    # ********** relationship **********
-    # **
-    rel_dict = {}
-    nameOfDictFnc = _capsule_utils.getToDictFncName()
-    for relationship in sqlalchemyTableType.__mapper__.relationships:
-      relationshipName = relationship.key
-      if not relationshipName in noJsonFields:
-        if relationship.uselist:
-          sqlalchemyTableType = capsuleType.sqlalchemyTableType
-          isDisplayList = _capsule_utils.isDisplayList(sqlalchemyTableType = sqlalchemyTableType,
-                                                       relationship = relationship)
-          if not isDisplayList:
-            relationshipDict: dict[int, any] = {}
-            countOfRelationshipEntities: int = 0
-            for relationshipEntity in getattr(self, relationshipName):
-              relationshipDict[countOfRelationshipEntities] = \
-                      getattr(relationshipEntity, nameOfDictFnc)(omitIds = omitIds)
-              countOfRelationshipEntities += 1
-            result[relationshipName] = relationshipDict
-        else:
-          relationshipEntity = getattr(self, relationshipName)
-          if not relationshipEntity is None: 
-            rel_dict = relationshipEntity.toDict(omitIds = omitIds)
-            result[relationshipName] = rel_dict
-          else: 
-            result[relationshipName] = None
-    # **
-    # ****************************************
+        output = output + f"{' ' * 2}relationshipEntity = {relationshipCode}\n"
+        output = output + f"{' ' * 2}result[{relationshipName!r}] = None if relationshipEntity is None else " + \
+                          f"relationshipEntity.{nameOfDictFnc}(omitIds = omitIds)\n"
+    return output
+  return getDef() + \
+         getColumnCodeLines() + \
+         getRelationshipCodeLines() + \
+         f"{' ' * 2}return result\n"
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Loader plan of the toDict function of a capsule type
+#   - sqlalchemy loader options mirroring the relationships read by the generated code:
+#       - single relationships exported or referred to by name: 'joinedload'
+#       - exported lists (not excluded from json, no display lists): 'selectinload'
+#     recursing into the exported related capsule types
+#   - applied to the queries of an export, the number of queries depends on the depth 
+#     of the relationship graph - not on the number of rows
+#   - each capsule type is expanded once in the whole tree, at its shallowest level 
+#     (breadth first) - deeper occurrences (incl. cycles) are loaded without sub options, 
+#     so the number of options is linear in the number of relationships of the schema;
+#     hybrid properties are not eagerly loadable
+#   - computed once per capsule type and stored on the capsule type ('_to_dict_loader_options')
+TO_DICT_LOADER_OPTIONS_ATTR_NAME = "_to_dict_loader_options"
+
+def __getToDictLoaderPlan(capsuleType: type[T],
+                          expandedCapsuleTypes: typing.Set[type]) -> typing.List[typing.Tuple[any, any, type]]:
+  # [(<loader option fnc>, <relationship attribute>, <related capsule type to expand or None>)]
+  #   - related capsule types to expand are added to 'expandedCapsuleTypes'
+  schema = _capsule_schema.getSchema(capsuleType = capsuleType)
+  # relationships of the '_id' columns whose related entity's name is exported
+  namedRelationshipNames = set()
+  for column in schema.columns:
+    if column.name in schema.excludedFromJson: continue
+    if not _capsule_utils.isRelationshipIdColumnName(columnName = column.name): continue
+    relationshipDescriptor = schema.getRelationship(
+                    relationshipName = _capsule_utils.getColumnToRelationshipName(columnName = column.name))
+    if relationshipDescriptor.hasName:
+      namedRelationshipNames.add(relationshipDescriptor.relationshipName)
+  result = []
+  for relationshipDescriptor in schema.relationships:
+    if relationshipDescriptor.relationship is None: continue # hybrid property
+    relationshipName = relationshipDescriptor.relationshipName
+    relationshipAttr = getattr(schema.sqlalchemyTableType, relationshipName)
+    isExported = not relationshipDescriptor.isExcludedFromJson and \
+                 not (relationshipDescriptor.isList and relationshipDescriptor.isDisplayList)
+    if not (isExported or relationshipName in namedRelationshipNames): continue
+    loaderOptionFnc = sqlalchemy_orm.selectinload if relationshipDescriptor.isList \
+                      else sqlalchemy_orm.joinedload
+    relatedCapsuleType = relationshipDescriptor.capsuleType
+    if isExported and not relatedCapsuleType is None and \
+       not relatedCapsuleType in expandedCapsuleTypes:
+      expandedCapsuleTypes.add(relatedCapsuleType)
+    else:
+      relatedCapsuleType = None
+    result.append((loaderOptionFnc, relationshipAttr, relatedCapsuleType))
+  return result
+
+def __getToDictLoaderOptions(capsuleType: type[T]) -> typing.List[any]:
+  # loader plans of the expanded capsule types - breadth first
+  loaderPlans = {}
+  expandedCapsuleTypes = {capsuleType}
+  capsuleTypesToExpand = collections.deque([capsuleType])
+  while capsuleTypesToExpand:
+    expandedCapsuleType = capsuleTypesToExpand.popleft()
+    loaderPlan = __getToDictLoaderPlan(capsuleType = expandedCapsuleType,
+                                       expandedCapsuleTypes = expandedCapsuleTypes)
+    loaderPlans[expandedCapsuleType] = loaderPlan
+    capsuleTypesToExpand.extend(relatedCapsuleType for _, _, relatedCapsuleType in loaderPlan
+                                                   if not relatedCapsuleType is None)
+  def getLoaderOptions(capsuleType: type[T]) -> typing.List[any]:
+    result = []
+    for loaderOptionFnc, relationshipAttr, relatedCapsuleType in loaderPlans[capsuleType]:
+      loaderOption = loaderOptionFnc(relationshipAttr)
+      if not relatedCapsuleType is None:
+        subOptions = getLoaderOptions(capsuleType = relatedCapsuleType)
+        if len(subOptions) > 0:
+          loaderOption = loaderOption.options(*subOptions)
+      result.append(loaderOption)
     return result
+  return getLoaderOptions(capsuleType = capsuleType)
+
+def getToDictLoaderOptions(capsuleType: type[T]) -> typing.Tuple[any, ...]:
+  result = capsuleType.__dict__.get(TO_DICT_LOADER_OPTIONS_ATTR_NAME)
+  if result is None:
+    result = tuple(__getToDictLoaderOptions(capsuleType = capsuleType))
+    setattr(capsuleType, TO_DICT_LOADER_OPTIONS_ATTR_NAME, result)
+  return result
+
+def __addToJsonFunction(capsuleType: type[T],
+                        codeCache: code_cache.CodeCache):
+  schema = _capsule_schema.getSchema(capsuleType = capsuleType)
+  nameOfDictFnc = _capsule_utils.getToDictFncName()
+  # source code is only generated and compiled if not available in the code cache
+  fncToDict = codeCache.execCode(
+                    fncName = _capsule_utils.getGeneratedToDictFncName(
+                                    sqlalchemyTableType = schema.sqlalchemyTableType),
+                    getSourceCode = lambda: __getToDictCode(schema = schema),
+                    namespace = {})
   def fncToJson(self: T) -> json.decoder: # ????
     objDict: dict[str, any] = {}
     objDict = fncToDict(self)
     return json.dumps(objDict, cls=UUIDEncoder, indent=2) # json derived form dict
   
 
-  nameOfDictFnc = _capsule_utils.getToDictFncName() # define in _capsule_utils
   nameOfJsonFnc = _capsule_utils.getToJsonFncName() # define in _capsule_utils
   fncToDictDecorated =  _capsule_base.cleanAndCloseSession(
                       func = fncToDict)
@@ -103,312 +207,320 @@ def __addToJsonFunction(capsuleType: type[T],
 
   
   
-def __addFromJsonFunction(capsuleType: type[T],
-                          callingGlobals):
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# fromDict: functions called by the generated code
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def _raiseMissingKeysException(capsuleType: type[T],
+                               capsuleDict: dict[str, any],
+                               requiredKeys: typing.FrozenSet[str]):
+  missingKeys = [key for key in sorted(requiredKeys) if not key in capsuleDict]
+  raise Exception(f"Missing key in dictionary provided to {_capsule_utils.getFromDictFncName()} of " + \
+                  f"class {capsuleType.__name__}. \n" + \
+                  f"Key missing: {', '.join(missingKeys)}.\n" + \
+                  "Dictionary:\n" + str(capsuleDict))
+def _raiseExistingEntityException(capsuleDict: dict[str, any],
+                                  resultEntity: T):
+  jsonSpec = json.dumps(capsuleDict, cls=UUIDEncoder, indent = 4)
+  entityName = resultEntity.name if hasattr(resultEntity, 'name') else resultEntity.id.hex
+  raise Exception(f"Trying to upload an existing entity to the database: {entityName}\n" + \
+                  f"Id found in the database:  {resultEntity.id.hex}\n" + \
+                  f"json spec: \n" + \
+                    jsonSpec)
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Methods covering relationships on the 1-side of (1 to n) relationships
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Relationship is not available on the dict as as sub-dict
+#   but is identified by it's name
+#   Such name must be identifiable on the db (or as new/dirty)
+#   (only called for relationships whose capsule has a 'name')
+#   - the catalog of the relationship entities is keyed by relationship name and
+#     related capsule type: relationships of the same name of different capsule types
+#     (e.g. the content types of a controller) might refer to different tables
+def getRelationshipEntitiesCatalogKey(
+              relationshipDescriptor: _capsule_schema.RelationshipDescriptor
+              ) -> typing.Tuple[str, type]:
+  return (relationshipDescriptor.relationshipName, relationshipDescriptor.capsuleType)
+def _getExcludedFromJsonSingleRelatedEntity(
+              capsuleType: type[T],
+              session: sqlalchemy_orm.Session,
+              capsuleDict: dict[str, any],
+              relationshipEntitiesCatalog: typing.Dict[typing.Tuple[str, type], dict],
+              relationshipDescriptor: _capsule_schema.RelationshipDescriptor
+              ) -> any:
+  relationshipName = relationshipDescriptor.relationshipName
+  relationshipNameAttributeName = relationshipDescriptor.nameAttr
+  relationshipCapsuleClass = relationshipDescriptor.capsuleType
+  thisRelationshipEntitiesCatalog = relationshipEntitiesCatalog.setdefault(
+                  getRelationshipEntitiesCatalogKey(relationshipDescriptor = relationshipDescriptor), {})
+  relationshipEntityName = capsuleDict[relationshipNameAttributeName]
+  # relationshipEntityName might not be defined -> do nothing
+  if relationshipEntityName is None: return None
+  if relationshipEntityName in thisRelationshipEntitiesCatalog:
+    return thisRelationshipEntitiesCatalog[relationshipEntityName]
+  # check if an entity with the relationship's name exists on db
+  #     if yes: include the the relationshipEntity in the catalog of relationship entities
+  #     if  no: do not include as it will cause and error
+  if not relationshipCapsuleClass.nameExists(
+                    session=session, 
+                    name=relationshipEntityName):
+    jsonSpec = json.dumps(capsuleDict, cls=UUIDEncoder, indent = 4)
+    raise Exception(f"Badly specified relationship name on {capsuleType.__name__}:\n" + \
+                    f"No relationship with such name identified on db or session.\n" + \
+                    f"Relationship           : {relationshipName}\n" + \
+                    f"Name provided          : {relationshipEntityName}\n" + \
+                    f"Provided on attribute  : {relationshipNameAttributeName}\n" + \
+                    f"json spec: \n" + \
+                      jsonSpec)
+  result = relationshipCapsuleClass(
+                  session = session, 
+                  name = relationshipEntityName)
+  thisRelationshipEntitiesCatalog[relationshipEntityName] = result
+  return result
+# Relationship is available as a sub-dict within the capsuleDict provided
+def _getIncludedInJsonSingleRelatedEntity(
+              capsuleType: type[T],
+              session: sqlalchemy_orm.Session,
+              capsuleDict: dict[str, any],
+              relationshipDescriptor: _capsule_schema.RelationshipDescriptor,
+              resultEntity: T
+              ) -> any:
+  relationshipName = relationshipDescriptor.relationshipName
+  relationshipNameAttributeName = relationshipDescriptor.nameAttr
+  relationshipCapsuleClass = relationshipDescriptor.capsuleType
   nameOfDictFnc = _capsule_utils.getFromDictFncName()
-  nameOfJsonFnc = _capsule_utils.getFromJsonFncName()
-  def fncFromDict(self, 
-                  session: sqlalchemy_orm.Session,
-                  capsuleDict: dict[str, any],
-                  persistentMustHaveId: bool = False,
-                  relationshipEntitiesCatalog: typing.Dict[str, dict] = None) -> T:
-    def ensureKeyInDict(key: str):
-      if not key in capsuleDict:
-        raise Exception(f"Missing key in dictionary provided to {nameOfDictFnc} of " + \
-                        f"class {self.__name__}. \n" + \
-                        f"Key missing: {key}.\n" + \
-                        "Dictionary:\n" + str(capsuleDict))
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    # Methods covering relationships on the 1-side of (1 to n) relationships
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    def getExcludedFromJsonSingleRelatedEntity(
-                  session: sqlalchemy_orm.Session,
-                  relationshipEntitiesCatalog: typing.Dict[str, dict],
-                  relationshipName: str,
-                  relationshipNameAttributeName: str,
-                  relationshipCapsuleClass: typing.Type
-                  ) -> any:
-      thisRelationshipEntitiesCatalog = relationshipEntitiesCatalog[relationshipName]
-      # Relationship is not available on the dict as as sub-dict
-      #   but is identified by it's name
-      #   Such name must be identifiable on the db (or as new/dirty)
-      if hasattr(relationshipCapsuleClass, 'name'):
-        ensureKeyInDict(key = relationshipNameAttributeName)
-        relationshipEntityName = capsuleDict[relationshipNameAttributeName]
-        # relationshipEntityName might not be defined -> do nothing
-        if relationshipEntityName is None: return None
-        if not relationshipEntityName in thisRelationshipEntitiesCatalog:
-          # check if an entity with the relationship's name exists on db
-          #     if yes: include the the relationshipEntity in the catalog of relationship entities
-          #     if  no: do not include as it will cause and error
-          if not relationshipCapsuleClass.nameExists(
-                            session=session, 
-                            name=relationshipEntityName):
-            jsonSpec = json.dumps(capsuleDict, cls=UUIDEncoder, indent = 4)
-            raise Exception(f"Badly specified relationship name on {capsuleType.__name__}:\n" + \
-                            f"No relationship with such name identified on db or session.\n" + \
-                            f"Relationship           : {relationshipName}\n" + \
-                            f"Name provided          : {relationshipEntityName}\n" + \
-                            f"Provided on attribute  : {relationshipNameAttributeName}\n" + \
-                            f"json spec: \n" + \
-                              jsonSpec)
-          else:
-            result = relationshipCapsuleClass(
-                            session = session, 
-                            name = relationshipEntityName)
-            thisRelationshipEntitiesCatalog[relationshipEntityName] = result
-            return result
-        else:
-          return thisRelationshipEntitiesCatalog[relationshipEntityName]
-    def getIncludedInJsonSingleRelatedEntity(
-                  session: sqlalchemy_orm.Session,
-                  capsuleDict: dict[str, any],
-                  relationshipName: str,
-                  relationshipNameAttributeName: str,
-                  relationshipCapsuleClass: typing.Type,
-                  resultEntity: capsuleType
-                  ) -> any:
-      # Relationship is available as a sub-dict within the capsuleDict provided
-      ensureKeyInDict(key = relationshipName)
-      relationshipDict = capsuleDict[relationshipName]
-      # print(f"   relationshipDict: {relationshipDict}")      
-      # if no relationship defined on capsuleDict -> do nothing
-      if relationshipDict is None or len(relationshipDict) == 0: return None 
-      # identify if relationship has been identified in previous initialization of 
-      #   the capsule, see above [result = capsuleType(**initParameters)]
-      isIdentifiedRelationship = not getattr(resultEntity, relationshipName) is None
-      if isIdentifiedRelationship:
-        idOnRelationshipDict = relationshipDict['id']
-        relationshipIdOnMainCapsule = getattr(resultEntity, columnName)
-        # if relationship is not identified by name but by id check id consistency
-        if not idOnRelationshipDict is None:
-          if type(idOnRelationshipDict) is uuid.UUID:
-            idOnRelationshipDict = str(idOnRelationshipDict)
-          if idOnRelationshipDict != str(relationshipIdOnMainCapsule):
-            # raise exception if the id of the relationship in dict is different from the 
-            #   id in the relationship's id on the identified entity
-            jsonSpec = json.dumps(capsuleDict, cls=UUIDEncoder, indent = 4)
-            raise Exception(f"Badly specified relationship id on {capsuleType.__name__}:\n" + \
-                            f"Id on capsule: {relationshipIdOnMainCapsule} - type: {type(relationshipIdOnMainCapsule)}\n" + \
-                            f"Id on relationship dict: {idOnRelationshipDict} - type: {type(idOnRelationshipDict)}\n" + \
-                            f"Name of relationship: {relationshipName}\n" + \
-                            f"json spec: \n" + \
-                              jsonSpec)
-            # FIXME: spec test for this error
-        # if relationship has a name: check if name is not consistent with the relationships 
-        #    name on db.
-        #    Changing names of relationships is not permissible when creating the parent 
-        #    entity form a dict.  
-        if hasattr(relationshipCapsuleClass, 'name'):
-          nameOnRelationshipDict = relationshipDict['name']
-          relationshipNameOnMainCapsule = getattr(result, relationshipNameAttributeName)
-          if nameOnRelationshipDict != relationshipNameOnMainCapsule:
-            # raise exception if the name of the relationship in dict is different from the 
-            #   name in the relationship's id on the identified entity
-            jsonSpec = json.dumps(capsuleDict, cls=UUIDEncoder, indent = 4)
-            raise Exception(f"Badly specified relationship name on {capsuleType.__name__}:\n" + \
-                            f"Name on capsule: {relationshipNameOnMainCapsule}\n" + \
-                            f"Name on relationship dict: {nameOnRelationshipDict}\n" + \
-                            f"json spec: \n" + \
-                              jsonSpec)
-            # FIXME: spec test for this error
-        else:
-          # set the id parameter of the relationship (if none) as provided in the dict
-          #     equal to the one identified on DB
-          relationshipDict['id'] = relationshipIdOnMainCapsule
-        result = getattr(relationshipCapsuleClass, nameOfDictFnc)(
-                        session = session, 
-                        capsuleDict = relationshipDict)
-        result.addToSession()
-      else:
-        # print('     relationship dict: ', relationshipDict)
-        result = getattr(relationshipCapsuleClass, nameOfDictFnc)(
-                        session = session,
-                        capsuleDict = relationshipDict)
-        result.addToSession()
-      return result  
-    def addSingleRelatedEntity(
-                  session: sqlalchemy_orm.Session,
-                  capsuleDict: dict[str, any],
-                  relationshipEntitiesCatalog: typing.Dict[str, dict],
-                  sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta],
-                  column: sqla.Column,
-                  resultEntity: capsuleType
-                  ) -> None :
-      relationshipName = _capsule_utils.getRelationshipNameOfColumn(column = column)
-      dictAttributeNamingConventions = _capsule_utils.getDictOfAttributeNamingConventionsFromRelationshipName(
-                      relationshipName = relationshipName)
-      ## 
-      ## add relationshipName to relationshipEntitiesCatalog:
-      if not relationshipName in relationshipEntitiesCatalog:
-        relationshipEntitiesCatalog[relationshipName] = {}
-      ##
-      relationshipCapsuleClass = _capsule_utils.getRelationshipCapsuleTypeOfName(
-                       relationshipName = relationshipName,
-                      sqlalchemyTableType = sqlalchemyTableType,
-                      callingGlobals = callingGlobals)
-      relationshipNameAttributeName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_NAME]
-      if relationshipName in capsuleType.sqlalchemyTableType._exclude_from_json:
-        relationshipEntity = getExcludedFromJsonSingleRelatedEntity(
-                              session = session,
-                              relationshipEntitiesCatalog = relationshipEntitiesCatalog,
-                              relationshipName = relationshipName,
-                              relationshipNameAttributeName = relationshipNameAttributeName,
-                              relationshipCapsuleClass = relationshipCapsuleClass)
-      else:
-        relationshipEntity = getIncludedInJsonSingleRelatedEntity(
-                              session = session,
-                              capsuleDict = capsuleDict,
-                              relationshipName = relationshipName,
-                              relationshipNameAttributeName = relationshipNameAttributeName,
-                              relationshipCapsuleClass = relationshipCapsuleClass,
-                              resultEntity = resultEntity)
-      if not relationshipEntity is None:
-        setattr(resultEntity, relationshipName, relationshipEntity)
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    # Methods covering relationships on the n-side of (1 to n) relationships
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    def getIncludedInJsonMultipleRelatedEntities(
-                  session: sqlalchemy_orm.Session,
-                  capsuleDict: dict[str, any],
-                  relationshipName: str,
-                  relationshipCapsuleClass: any) -> typing.List[any]:
-      ensureKeyInDict(key = relationshipName)
-      result: typing.List[any] = []
-      listDictionary = capsuleDict[relationshipName]
-      if len(listDictionary) == 0:
-        pass
-      else:
-        for pos in range(0, len(capsuleDict[relationshipName])):
-          capsuleDictEntity = capsuleDict[relationshipName][pos]
-          relationshipEntity = getattr(relationshipCapsuleClass, nameOfDictFnc)(
-                    session = session,
-                    capsuleDict = capsuleDictEntity)
-          result.append(relationshipEntity)
-      return result 
-    def addIncludedInJsonMultipleRelatedEntities(
-                  session: sqlalchemy_orm.Session,
-                  capsuleDict: dict[str, any],
-                  relationship: sqlalchemy_orm.relationship,
-                  resultEntity: capsuleType) -> None:
-      relationshipName = relationship.key
-      sqlalchemyTableType = capsuleType.sqlalchemyTableType
-      relationshipCapsuleClass = _capsule_utils.getRelationshipCapsuleTypeOfName(
-                      relationshipName = relationshipName,
-                      sqlalchemyTableType = sqlalchemyTableType,
-                      callingGlobals = callingGlobals)
-      appendToListFncName = _capsule_utils.getAppendToListOfPropertyFncName(
-                relationshipName = relationshipName)
-      if relationship.uselist:
-        sqlalchemyTableType = capsuleType.sqlalchemyTableType
-        isDisplayList = _capsule_utils.isDisplayList(sqlalchemyTableType = sqlalchemyTableType,
-                                                    relationship = relationship)
-        if not isDisplayList:
-          relationshipEntitiesList = getIncludedInJsonMultipleRelatedEntities(
-                                        session = session,
-                                        capsuleDict = capsuleDict,
-                                        relationshipName = relationshipName,
-                                        relationshipCapsuleClass = relationshipCapsuleClass)
-          for relationshipEntity in relationshipEntitiesList:
-            getattr(resultEntity, appendToListFncName)(relationshipEntity) 
-    ##
-    ## Initiate if relationshipEntitiesCatalog is provided:
-    if relationshipEntitiesCatalog is None:
-      relationshipEntitiesCatalog: typing.Dict[str, dict] = {}
-    ## Identify the object class of the sqlalchemyTableType
-    sqlalchemyTableType = self.sqlalchemyTableType
-    ## Identify the fields that are excluded from json
-    noJsonFields = sqlalchemyTableType._exclude_from_json
-    ## Identify the columns that are not merely used for change tracking
-    noChangeTrackColumns = _capsule_utils.getNonChangeTrackColumns(sqlalchemyTableType = sqlalchemyTableType)
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    # Define inputs to __init__
-    #     - this does NOT include any relationships 
-    #     Attention: 
-    #       - in case of validations that are made upon relationships, this will cause
-    #         the validation to fail, as the relationships are not yet initialized
-    # [2027-10-04] - decision taken on CoreAccountTable: 
-    #       - include another column in the sqlalchemyTableType (level_depth)
-    #       - condition the is_bookable validation on the level_depth value
-    #       
-    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    initParameters = {"session": session}
-    for column in noChangeTrackColumns:
-      isRelationshipColumn = _capsule_utils.isRelationshipIdColumnName(columnName = column.name)
-      # all non-relationship informational items are defined first and the capsule gets 
-      # initialized.
-      # This leaves out all relationships within the first step of capsule initialization.
-      # Please note the following: This might lead to conflicts with possible validations on 
-      #                            some of these non-relationship values that recur onto either 
-      #                            the existence and/or certain features of such relationships.
-      if not isRelationshipColumn:
-        # print(f"[_capsule_json.fncFromDict]")
-        columnName = column.name
-        initParameters[columnName] = capsuleDict[columnName]
-        
-        if columnName == 'name':
-          column_name_name = capsuleDict[columnName]
-          if column_name_name == 'asset > static':
-            parent_name = capsuleDict['parent_name']
-        #     print(f"    parent_name for asset > static on capsule.fromDict: {parent_name}")
-        # print(f"  initParameters: {initParameters}")
-    # initialize the capsule here (before handling the [possibly] provided 
-    #     dict definitions of the capsule's relationships
-    #     Justification: In case of reading a dict without Ids -
-    #                    If the name of a relationship is provided in the
-    #                    main capsule's dict, the relationship's capsule must 
-    #                    be identified. 
-    #                    Otherwise, the relationship's capsule will go without
-    #                    id and violate consistency constraints. 
-    result = capsuleType(**initParameters)
-    initParameters = None # not used anymore
-    result.addToSession()
-    # Test if entity has an id that is not provided by the input dict
-    if persistentMustHaveId:
-      resultId = result.id
-      capsuleDictId = capsuleDict['id']
-      if not resultId is None and capsuleDictId is None:
+  relationshipDict = capsuleDict[relationshipName]
+  # if no relationship defined on capsuleDict -> do nothing
+  if relationshipDict is None or len(relationshipDict) == 0: return None 
+  # identify if relationship has been identified in previous initialization of 
+  #   the capsule (see generated fromDict: result = capsuleType(**initParameters))
+  isIdentifiedRelationship = not getattr(resultEntity, relationshipName) is None
+  if isIdentifiedRelationship:
+    idOnRelationshipDict = relationshipDict['id']
+    relationshipIdOnMainCapsule = getattr(resultEntity, relationshipDescriptor.idAttr)
+    # if relationship is not identified by name but by id check id consistency
+    if not idOnRelationshipDict is None:
+      if type(idOnRelationshipDict) is uuid.UUID:
+        idOnRelationshipDict = str(idOnRelationshipDict)
+      if idOnRelationshipDict != str(relationshipIdOnMainCapsule):
+        # raise exception if the id of the relationship in dict is different from the 
+        #   id in the relationship's id on the identified entity
         jsonSpec = json.dumps(capsuleDict, cls=UUIDEncoder, indent = 4)
-        raise Exception(f"Trying to upload an existing entity to the database: {result.name}\n" + \
-                        f"Id found in the database:  {resultId.hex}\n" + \
+        raise Exception(f"Badly specified relationship id on {capsuleType.__name__}:\n" + \
+                        f"Id on capsule: {relationshipIdOnMainCapsule} - type: {type(relationshipIdOnMainCapsule)}\n" + \
+                        f"Id on relationship dict: {idOnRelationshipDict} - type: {type(idOnRelationshipDict)}\n" + \
+                        f"Name of relationship: {relationshipName}\n" + \
                         f"json spec: \n" + \
                           jsonSpec)
-      # Comment: if capsuleDictId is not none, the id of the result is necessarily equal
-      #          to resultId - no test or error needed. 
+        # FIXME: spec test for this error
+    # if relationship has a name: check if name is not consistent with the relationships 
+    #    name on db.
+    #    Changing names of relationships is not permissible when creating the parent 
+    #    entity form a dict.  
+    if relationshipDescriptor.hasName:
+      nameOnRelationshipDict = relationshipDict['name']
+      relationshipNameOnMainCapsule = getattr(resultEntity, relationshipNameAttributeName)
+      if nameOnRelationshipDict != relationshipNameOnMainCapsule:
+        # raise exception if the name of the relationship in dict is different from the 
+        #   name in the relationship's id on the identified entity
+        jsonSpec = json.dumps(capsuleDict, cls=UUIDEncoder, indent = 4)
+        raise Exception(f"Badly specified relationship name on {capsuleType.__name__}:\n" + \
+                        f"Name on capsule: {relationshipNameOnMainCapsule}\n" + \
+                        f"Name on relationship dict: {nameOnRelationshipDict}\n" + \
+                        f"json spec: \n" + \
+                          jsonSpec)
+        # FIXME: spec test for this error
+    else:
+      # set the id parameter of the relationship (if none) as provided in the dict
+      #     equal to the one identified on DB
+      relationshipDict['id'] = relationshipIdOnMainCapsule
+  result = getattr(relationshipCapsuleClass, nameOfDictFnc)(
+                  session = session, 
+                  capsuleDict = relationshipDict)
+  result.addToSession()
+  return result  
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Methods covering relationships on the n-side of (1 to n) relationships
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def _addIncludedInJsonMultipleRelatedEntities(
+              session: sqlalchemy_orm.Session,
+              capsuleDict: dict[str, any],
+              relationshipDescriptor: _capsule_schema.RelationshipDescriptor,
+              appendToListFncName: str,
+              resultEntity: T) -> None:
+  nameOfDictFnc = _capsule_utils.getFromDictFncName()
+  relationshipCapsuleClass = relationshipDescriptor.capsuleType
+  appendToList = getattr(resultEntity, appendToListFncName)
+  listDictionary = capsuleDict[relationshipDescriptor.relationshipName]
+  # positions are keys of the dict (int from toDict, str if read from json)
+  for listElementDict in listDictionary.values():
+    appendToList(getattr(relationshipCapsuleClass, nameOfDictFnc)(
+                    session = session,
+                    capsuleDict = listElementDict))
 
-    # if the relationships' json has been provided, 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Source code of the specialized fromDict function of a capsule type
+#   - all keys required are validated at once before any capsule is created
+#   - relationships are resolved with the precomputed relationship descriptors
+#     (namespace of the generated code: see __addFromJsonFunction)
+#   - example (capsule of a table with a 'name', a 'client' relationship (client with name,
+#     excluded from json) and a manipulation list 'positions'):
+#       def fromDictPortfolio(cls, session, capsuleDict, persistentMustHaveId = False, 
+#                             relationshipEntitiesCatalog = None):
+#         if not capsuleDict.keys() >= requiredKeys:
+#           _raiseMissingKeysException(capsuleType, capsuleDict, requiredKeys)
+#         if relationshipEntitiesCatalog is None:
+#           relationshipEntitiesCatalog = {}
+#         result = capsuleType(session = session,
+#                              name = capsuleDict['name'],
+#                              id = capsuleDict['id'])
+#         result.addToSession()
+#         if persistentMustHaveId:
+#           if not result.id is None and capsuleDict['id'] is None:
+#             _raiseExistingEntityException(capsuleDict, result)
+#         relationshipEntity = _getExcludedFromJsonSingleRelatedEntity(capsuleType, session, 
+#                                  capsuleDict, relationshipEntitiesCatalog, relationship_client)
+#         if not relationshipEntity is None:
+#           result.client = relationshipEntity
+#         _addIncludedInJsonMultipleRelatedEntities(session, capsuleDict, relationship_positions, 
+#                                                   'appendPosition', result)
+#         result.addToSession()
+#         return result
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+RELATIONSHIP_DESCRIPTOR_VAR_PREFIX = "relationship_"
 
+def __getFromDictRelationships(schema: _capsule_schema.CapsuleSchema
+                               ) -> typing.Tuple[typing.Tuple[_capsule_schema.RelationshipDescriptor, ...],
+                                                 typing.Tuple[_capsule_schema.RelationshipDescriptor, ...]]:
+  # single relationships defined by '_id' columns included in the json
+  singleRelationships = tuple(schema.getRelationship(_capsule_utils.getColumnToRelationshipName(columnName)) \
+                                  for columnName in schema.columnNames \
+                                    if _capsule_utils.isRelationshipIdColumnName(columnName = columnName) and \
+                                       not columnName in schema.excludedFromJson)
+  # manipulation lists (the json of display lists is not read)
+  manipulationLists = tuple(relationshipDescriptor for relationshipDescriptor in schema.listRelationships \
+                                if not relationshipDescriptor.isDisplayList)
+  return singleRelationships, manipulationLists
 
-    for column in noChangeTrackColumns:
-      columnName = column.name
+def __getFromDictRequiredKeys(schema: _capsule_schema.CapsuleSchema) -> typing.FrozenSet[str]:
+  singleRelationships, manipulationLists = __getFromDictRelationships(schema = schema)
+  result = set(columnName for columnName in schema.columnNames \
+                   if not _capsule_utils.isRelationshipIdColumnName(columnName = columnName))
+  for relationshipDescriptor in singleRelationships:
+    if relationshipDescriptor.isExcludedFromJson:
+      if relationshipDescriptor.hasName:
+        result.add(relationshipDescriptor.nameAttr)
+    else:
+      result.add(relationshipDescriptor.relationshipName)
+  for relationshipDescriptor in manipulationLists:
+    result.add(relationshipDescriptor.relationshipName)
+  return frozenset(result)
 
-      if not columnName in noJsonFields:
-        # print(f"\ncolumnName: {columnName}")
-        isRelationshipColumn = _capsule_utils.isRelationshipIdColumnName(columnName = columnName)
-        if isRelationshipColumn:
-          addSingleRelatedEntity(
-                        session = session,
-                        capsuleDict = capsuleDict,
-                        relationshipEntitiesCatalog = relationshipEntitiesCatalog,
-                        sqlalchemyTableType = sqlalchemyTableType,
-                        column = column,
-                        resultEntity = result)
+def __getFromDictCode(schema: _capsule_schema.CapsuleSchema) -> str:
+  singleRelationships, manipulationLists = __getFromDictRelationships(schema = schema)
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Function head and validation of the keys of the dict
+  def getDef() -> str:
+    output = f"def {_capsule_utils.getGeneratedFromDictFncName(sqlalchemyTableType = schema.sqlalchemyTableType)}" + \
+             f"(cls, session, capsuleDict, persistentMustHaveId = False, relationshipEntitiesCatalog = None):\n"
+    output = output + f"{' ' * 2}if not capsuleDict.keys() >= requiredKeys:\n"
+    output = output + f"{' ' * 4}_raiseMissingKeysException(capsuleType, capsuleDict, requiredKeys)\n"
+    output = output + f"{' ' * 2}if relationshipEntitiesCatalog is None:\n"
+    output = output + f"{' ' * 4}relationshipEntitiesCatalog = {{}}\n"
+    return output
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Initialization of the capsule
+  #     - this does NOT include any relationships 
+  #     Attention: 
+  #       - in case of validations that are made upon relationships, this will cause
+  #         the validation to fail, as the relationships are not yet initialized
+  # [2027-10-04] - decision taken on CoreAccountTable: 
+  #       - include another column in the sqlalchemyTableType (level_depth)
+  #       - condition the is_bookable validation on the level_depth value
+  #     Justification of initializing before handling the [possibly] provided dict 
+  #       definitions of the capsule's relationships: 
+  #                    In case of reading a dict without Ids -
+  #                    If the name of a relationship is provided in the
+  #                    main capsule's dict, the relationship's capsule must 
+  #                    be identified. 
+  #                    Otherwise, the relationship's capsule will go without
+  #                    id and violate consistency constraints. 
+  def getInitCodeLines() -> str:
+    output = f"{' ' * 2}result = capsuleType(session = session"
+    for columnName in schema.columnNames:
+      if _capsule_utils.isRelationshipIdColumnName(columnName = columnName): continue
+      output = output + f",\n{' ' * 23}{columnName} = capsuleDict[{columnName!r}]"
+    output = output + ")\n"
+    output = output + f"{' ' * 2}result.addToSession()\n"
+    # Test if entity has an id that is not provided by the input dict
+    # Comment: if capsuleDictId is not none, the id of the result is necessarily equal
+    #          to resultId - no test or error needed. 
+    output = output + f"{' ' * 2}if persistentMustHaveId:\n"
+    output = output + f"{' ' * 4}if not result.id is None and capsuleDict['id'] is None:\n"
+    output = output + f"{' ' * 6}_raiseExistingEntityException(capsuleDict, result)\n"
+    return output
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Single relationships (identified by name or provided as sub-dict)
+  def getSingleRelationshipCodeLines() -> str:
+    output = ""
+    for relationshipDescriptor in singleRelationships:
+      relationshipVar = f"{RELATIONSHIP_DESCRIPTOR_VAR_PREFIX}{relationshipDescriptor.relationshipName}"
+      if relationshipDescriptor.isExcludedFromJson:
+        # relationships without name can't be identified if excluded from json
+        if not relationshipDescriptor.hasName: continue
+        output = output + f"{' ' * 2}relationshipEntity = _getExcludedFromJsonSingleRelatedEntity(" + \
+                          f"capsuleType, session, capsuleDict, relationshipEntitiesCatalog, {relationshipVar})\n"
+      else:
+        output = output + f"{' ' * 2}relationshipEntity = _getIncludedInJsonSingleRelatedEntity(" + \
+                          f"capsuleType, session, capsuleDict, {relationshipVar}, result)\n"
+      output = output + f"{' ' * 2}if not relationshipEntity is None:\n"
+      output = output + f"{' ' * 4}setattr(result, {relationshipDescriptor.relationshipName!r}, relationshipEntity)\n"
+    return output
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Append values to manipulation lists
+  def getManipulationListCodeLines() -> str:
+    output = ""
+    for relationshipDescriptor in manipulationLists:
+      relationshipVar = f"{RELATIONSHIP_DESCRIPTOR_VAR_PREFIX}{relationshipDescriptor.relationshipName}"
+      appendToListFncName = _capsule_utils.getAppendToListOfPropertyFncName(
+                                  relationshipName = relationshipDescriptor.relationshipName)
+      output = output + f"{' ' * 2}_addIncludedInJsonMultipleRelatedEntities(" + \
+                        f"session, capsuleDict, {relationshipVar}, {appendToListFncName!r}, result)\n"
+    return output
+  return getDef() + \
+         getInitCodeLines() + \
+         getSingleRelationshipCodeLines() + \
+         getManipulationListCodeLines() + \
+         f"{' ' * 2}result.addToSession()\n" + \
+         f"{' ' * 2}return result\n"
 
-    # append values to manipulation lists
-    for relationship in sqlalchemyTableType.__mapper__.relationships:
-      addIncludedInJsonMultipleRelatedEntities(
-                                session = session,
-                                capsuleDict = capsuleDict,
-                                relationship = relationship,
-                                resultEntity = result)           
-    result.addToSession()
-    return result
-    
+def __addFromJsonFunction(capsuleType: type[T],
+                          codeCache: code_cache.CodeCache):
+  nameOfDictFnc = _capsule_utils.getFromDictFncName()
+  nameOfJsonFnc = _capsule_utils.getFromJsonFncName()
+  schema = _capsule_schema.getSchema(capsuleType = capsuleType)
+  # namespace of the generated code
+  namespace = {"capsuleType": capsuleType,
+               "requiredKeys": __getFromDictRequiredKeys(schema = schema),
+               "_raiseMissingKeysException": _raiseMissingKeysException,
+               "_raiseExistingEntityException": _raiseExistingEntityException,
+               "_getExcludedFromJsonSingleRelatedEntity": _getExcludedFromJsonSingleRelatedEntity,
+               "_getIncludedInJsonSingleRelatedEntity": _getIncludedInJsonSingleRelatedEntity,
+               "_addIncludedInJsonMultipleRelatedEntities": _addIncludedInJsonMultipleRelatedEntities}
+  for relationshipDescriptor in schema.relationships:
+    namespace[f"{RELATIONSHIP_DESCRIPTOR_VAR_PREFIX}{relationshipDescriptor.relationshipName}"] = relationshipDescriptor
+  # source code is only generated and compiled if not available in the code cache
+  fncFromDict = codeCache.execCode(
+                    fncName = _capsule_utils.getGeneratedFromDictFncName(
+                                    sqlalchemyTableType = schema.sqlalchemyTableType),
+                    getSourceCode = lambda: __getFromDictCode(schema = schema),
+                    namespace = namespace)
   def fncFromJson(self: type[T], 
                   session: sqlalchemy_orm.Session,
                   capsuleJson: json.decoder) -> T:
     dictFromJson = json.loads(capsuleJson)
-    obj = getattr(self, fncFromDict)(
+    obj = getattr(self, nameOfDictFnc)(
                         session = session, 
                         capsuleDict = dictFromJson)
     return obj 
@@ -423,10 +535,64 @@ def __addFromJsonFunction(capsuleType: type[T],
 
 
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Pre-seeded catalog of relationship entities referred to by name 
+#   (relationshipEntitiesCatalog of fromDict: 
+#      {(<relationshipName>, <related capsule type>): {<name>: <capsule>}})
+#   - the names of all relationships excluded from json are collected over all capsule 
+#     dicts and resolved with one 'IN' query per related table
+#   - names not identified (e.g. entities created by the same upload or new or dirty 
+#     entities of the session) are left to fromDict
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def getRelationshipEntitiesCatalog(
+              session: sqlalchemy_orm.Session,
+              capsuleDictsOfTypes: typing.List[typing.Tuple[type[T], typing.Iterable[dict[str, any]]]]
+              ) -> typing.Dict[typing.Tuple[str, type], dict]:
+  # a. names per relationship and per related capsule type
+  namesOfRelationships: typing.Dict[typing.Tuple[str, type], 
+                                    typing.Tuple[_capsule_schema.RelationshipDescriptor, set]] = {}
+  for capsuleType, capsuleDicts in capsuleDictsOfTypes:
+    schema = _capsule_schema.getSchema(capsuleType = capsuleType)
+    singleRelationships, _ = __getFromDictRelationships(schema = schema)
+    relationshipDescriptors = [relationshipDescriptor for relationshipDescriptor in singleRelationships \
+                                  if relationshipDescriptor.isExcludedFromJson and relationshipDescriptor.hasName]
+    if len(relationshipDescriptors) == 0: continue
+    for capsuleDict in capsuleDicts:
+      for relationshipDescriptor in relationshipDescriptors:
+        relationshipEntityName = capsuleDict.get(relationshipDescriptor.nameAttr)
+        if relationshipEntityName is None: continue
+        _, names = namesOfRelationships.setdefault(
+                          getRelationshipEntitiesCatalogKey(relationshipDescriptor = relationshipDescriptor),
+                          (relationshipDescriptor, set()))
+        names.add(relationshipEntityName)
+  namesOfCapsuleTypes: typing.Dict[type, set] = {}
+  for relationshipDescriptor, names in namesOfRelationships.values():
+    namesOfCapsuleTypes.setdefault(relationshipDescriptor.capsuleType, set()).update(names)
+  # b. one query per related table
+  capsulesOfCapsuleTypes: typing.Dict[type, typing.Dict[str, T]] = {}
+  for relationshipCapsuleType, names in namesOfCapsuleTypes.items():
+    capsules = capsulesOfCapsuleTypes[relationshipCapsuleType] = {}
+    sqlalchemyTables = relationshipCapsuleType._queryTablesByNames(session = session,
+                                                                   names = names)
+    for name, sqlalchemyTable in sqlalchemyTables.items():
+      capsule = relationshipCapsuleType.defineBySqlalchemyTable(session = session,
+                                                                sqlalchemyTableEntity = sqlalchemyTable)
+      capsule._hasValueInput = True
+      capsules[name] = capsule
+  # c. the catalog
+  result: typing.Dict[typing.Tuple[str, type], dict] = {}
+  for catalogKey, (relationshipDescriptor, names) in namesOfRelationships.items():
+    capsules = capsulesOfCapsuleTypes[relationshipDescriptor.capsuleType]
+    result[catalogKey] = {name: capsules[name] for name in names if name in capsules}
+  return result
+
 def addJsonFunctions(capsuleList: typing.List[T],
-                       callingGlobals):
+                       callingGlobals,
+                       codeCache: code_cache.CodeCache = None):
+  if codeCache is None: codeCache = code_cache.CodeCache()
   for capsuleType in capsuleList:
     __addToJsonFunction(capsuleType = capsuleType,
-                        callingGlobals = callingGlobals)
+                        codeCache = codeCache)
     __addFromJsonFunction(capsuleType = capsuleType,
-                          callingGlobals = callingGlobals)
+                          codeCache = codeCache)
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import typing, types, dataclasses
+import sqlalchemy
+from sqlalchemy.ext import declarative as sqlalchemy_decl
+from sqlalchemy.ext import hybrid as sqlalchemy_hyb
+
+
+from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils
+
+T = typing.TypeVar("T", bound=_capsule_base.CapsuleBase)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Immutable description of a capsule type
+#    - computed once per capsule type within 'capsule_main.setupCapsules'
+#    - the generated methods read from it instead of walking the sqlalchemy mapper
+#      metadata (and rebuilding attribute names) on every call
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+SCHEMA_ATTR_NAME = "_schema"
+VALIDATION_ITEMS_ATTR_NAME = "_validation_items"
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# A relationship of the capsule's sqlalchemyTableType
+#    - single relationships: defined by a '<relationshipName>_id' column (or hybrid
+#      property)
+#    - list relationships: the 'many' side of 'one'-to-'many' relationships
+@dataclasses.dataclass(frozen = True)
+class RelationshipDescriptor():
+  relationshipName: str
+  # attribute names according to the naming conventions (see _capsule_utils):
+  idAttr: str
+  nameAttr: str
+  internalNameAttr: str
+  namingConventions: typing.Mapping[str, str]
+  # names of the functions added to the capsule type:
+  consistencyCheckFncName: str
+  sourceAndConsistencyCheckFncName: str
+  # related types:
+  sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+  capsuleType: type
+  relationship: sqlalchemy.Relationship # 'None' for hybrid properties
+  # properties:
+  hasName: bool # the related sqlalchemyTableType has a 'name'
+  isList: bool
+  isDisplayList: bool
+  isExcludedFromJson: bool
+  isHybridProperty: bool
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# The schema of a capsule type
+@dataclasses.dataclass(frozen = True)
+class CapsuleSchema():
+  capsuleType: type
+  sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+  hasName: bool
+  # all columns of the table and the columns less those used to track changes
+  #   (see _capsule_utils.getNonChangeTrackColumns)
+  allColumns: typing.Tuple[sqlalchemy.Column, ...]
+  columns: typing.Tuple[sqlalchemy.Column, ...]
+  columnNames: typing.Tuple[str, ...]
+  # {<nameOfItem>: (<nameOfItem>, <isHybridProperty>, <hasSetter>)}
+  #   (see _capsule_utils.getSqlalchemyColumnsAndColumnLikeProperties)
+  columnsAndColumnLikeProperties: typing.Mapping[str, typing.Tuple[str, bool, bool]]
+  excludedFromJson: typing.FrozenSet[str]
+  # single relationships keyed by the name of their id column / hybrid property
+  singleRelationshipsByIdAttr: typing.Mapping[str, RelationshipDescriptor]
+  # relationships of the '_id' columns of the table (incl. change track columns)
+  columnRelationships: typing.Tuple[RelationshipDescriptor, ...]
+  # relationships of the '_id' columns and hybrid properties
+  singleRelationships: typing.Tuple[RelationshipDescriptor, ...]
+  # all relationships of the sqlalchemy mapper
+  relationships: typing.Tuple[RelationshipDescriptor, ...]
+  listRelationships: typing.Tuple[RelationshipDescriptor, ...]
+  relationshipsByName: typing.Mapping[str, RelationshipDescriptor]
+  relatedCapsuleTypes: typing.Tuple[type, ...]
+  # related capsule types referred to by 'name' (single relationships only)
+  referredByNameCapsuleTypes: typing.Tuple[type, ...]
+
+  def getRelationship(self, relationshipName: str) -> RelationshipDescriptor:
+    return self.relationshipsByName[relationshipName]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Building the schema
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# The capsule type of a hybrid property mimicking a relationship
+#    Ensure that the return type is properly defined. As an example refer to:
+#       module: EStG36a.src.model.transaction.py
+#       class: MarketAndForwardTransaction
+#       (code below has been changed - example only)
+#    @sqlalchemy_hyb.hybrid_property
+#    def asset(self) -> "asset.AssetTable":
+#        RETURN_TYPE_PROPERTY_NAME = "_hyb_prop_asset_return_type"
+#        def specify_return_type(class_type_definition):
+#          if not hasattr(class_type_definition, RETURN_TYPE_PROPERTY_NAME):
+#              mkt_tx_table_class = class_type_definition.market_transaction.property.mapper.class_
+#              setattr(class_type_definition, RETURN_TYPE_PROPERTY_NAME, mkt_tx_table_class.asset.property.mapper.class_)
+#              class_type_definition.asset.fget.__annotations__['return'] = getattr(class_type_definition, RETURN_TYPE_PROPERTY_NAME)
+#        if isinstance(self, MarketAndForwardTransactionTable):
+#            specify_return_type(self.__class__)
+#            if self.market_transaction is not None:
+#                return self.market_transaction.asset
+#            else:
+#                return None
+#        else:
+#            specify_return_type(self)
+#            pass
+#    @asset.setter
+#    def asset(self, value):
+#        self.market_transaction.asset = value
+def __getHybridRelationshipTypes(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta],
+                                 relationshipName: str,
+                                 callingGlobals) -> typing.Tuple[type, bool]:
+  relationshipType = getattr(sqlalchemyTableType, relationshipName).fget.__annotations__['return']
+  # Define list prefixes and check if any match
+  relationShipTypeClassName = relationshipType.__name__
+  list_prefixes = ['list', 'List', 'typing.List']
+  prefix_index = next((i for i, prefix in enumerate(list_prefixes)
+                      if relationShipTypeClassName.startswith(prefix)), -1)
+  isList = prefix_index >= 0
+  # If it's a list type, get the actual table class name without the list prefix
+  if isList:
+    # Remove the list prefix
+    prefix = list_prefixes[prefix_index]
+    relationShipTypeClassName = relationShipTypeClassName[len(prefix):]
+    # Remove brackets if present
+    if relationShipTypeClassName.startswith('[') and relationShipTypeClassName.endswith(']'):
+      relationShipTypeClassName = relationShipTypeClassName[1:-1]
+  hybridPropertyCapsuleClassName = _capsule_utils.getSqlaToCapsuleName(
+                                      sqlaTableName = relationShipTypeClassName)
+  return callingGlobals[hybridPropertyCapsuleClassName], isList
+
+def __getRelationshipDescriptor(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta],
+                                relationshipName: str,
+                                relationshipCapsuleType: type,
+                                relationship: sqlalchemy.Relationship,
+                                isList: bool,
+                                isHybridProperty: bool) -> RelationshipDescriptor:
+  namingConventions = _capsule_utils.getDictOfAttributeNamingConventionsFromRelationshipName(
+                                      relationshipName = relationshipName)
+  relationshipSqlalchemyTableType = relationshipCapsuleType.sqlalchemyTableType
+  return RelationshipDescriptor(
+            relationshipName = relationshipName,
+            idAttr = namingConventions[_capsule_utils.REL_ATTR_DICT_KEY_ID],
+            nameAttr = namingConventions[_capsule_utils.REL_ATTR_DICT_KEY_NAME],
+            internalNameAttr = namingConventions[_capsule_utils.REL_ATTR_DICT_KEY_INTERNAL_NAME],
+            namingConventions = types.MappingProxyType(namingConventions),
+            consistencyCheckFncName = _capsule_utils.getConsistencyCheckFncName(
+                                      relationshipName = relationshipName),
+            sourceAndConsistencyCheckFncName = _capsule_utils.getSourceAndConsistencyCheckFncName(
+                                      relationshipName = relationshipName),
+            sqlalchemyTableType = relationshipSqlalchemyTableType,
+            capsuleType = relationshipCapsuleType,
+            relationship = relationship,
+            hasName = hasattr(relationshipSqlalchemyTableType, 'name'),
+            isList = isList,
+            isDisplayList = False if relationship is None else \
+                            _capsule_utils.isDisplayList(sqlalchemyTableType = sqlalchemyTableType,
+                                                         relationship = relationship),
+            isExcludedFromJson = relationshipName in sqlalchemyTableType._exclude_from_json,
+            isHybridProperty = isHybridProperty)
+
+def buildSchema(capsuleType: type[T],
+                callingGlobals) -> CapsuleSchema:
+  sqlalchemyTableType = capsuleType.sqlalchemyTableType
+  mapperRelationships = sqlalchemyTableType.__mapper__.relationships
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # a. relationships of the mapper
+  relationshipsByName: typing.Dict[str, RelationshipDescriptor] = {}
+  for relationship in mapperRelationships:
+    relationshipsByName[relationship.key] = __getRelationshipDescriptor(
+                      sqlalchemyTableType = sqlalchemyTableType,
+                      relationshipName = relationship.key,
+                      relationshipCapsuleType = _capsule_utils.getRelationshipCapsuleTypeOfName(
+                                    relationshipName = relationship.key,
+                                    sqlalchemyTableType = sqlalchemyTableType,
+                                    callingGlobals = callingGlobals),
+                      relationship = relationship,
+                      isList = relationship.uselist,
+                      isHybridProperty = False)
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # b. single relationships defined by '_id' columns and hybrid properties
+  columnsAndColumnLikeProperties = _capsule_utils.getSqlalchemyColumnsAndColumnLikeProperties(
+                                              capsuleType = capsuleType)
+  singleRelationshipsByIdAttr: typing.Dict[str, RelationshipDescriptor] = {}
+  for attributeName, attributeInfo in columnsAndColumnLikeProperties.items():
+    if not _capsule_utils.isRelationshipIdColumnName(columnName = attributeName): continue
+    relationshipName = _capsule_utils.getColumnToRelationshipName(columnName = attributeName)
+    isHybridProperty = attributeInfo[1]
+    if isHybridProperty:
+      relationshipCapsuleType, isList = __getHybridRelationshipTypes(
+                                  sqlalchemyTableType = sqlalchemyTableType,
+                                  relationshipName = relationshipName,
+                                  callingGlobals = callingGlobals)
+      singleRelationshipsByIdAttr[attributeName] = __getRelationshipDescriptor(
+                                  sqlalchemyTableType = sqlalchemyTableType,
+                                  relationshipName = relationshipName,
+                                  relationshipCapsuleType = relationshipCapsuleType,
+                                  relationship = None,
+                                  isList = isList,
+                                  isHybridProperty = True)
+    else:
+      singleRelationshipsByIdAttr[attributeName] = relationshipsByName[relationshipName]
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # c. relationships of the '_id' columns of the table
+  columnRelationships: typing.List[RelationshipDescriptor] = []
+  for column in sqlalchemyTableType.__table__.columns:
+    if not _capsule_utils.isRelationshipIdColumn(column = column): continue
+    relationshipName = _capsule_utils.getRelationshipNameOfColumn(column = column)
+    if not relationshipName in relationshipsByName:
+      raise Exception(f"Could not identify relationship implicitly defined on {sqlalchemyTableType.__table__.name} by " + \
+                      f" column '{column.name}'.")
+    columnRelationships.append(relationshipsByName[relationshipName])
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # d. related capsule types
+  relatedCapsuleTypes: typing.List[type] = []
+  for descriptor in relationshipsByName.values():
+    if not descriptor.capsuleType in relatedCapsuleTypes:
+      relatedCapsuleTypes.append(descriptor.capsuleType)
+  # list relationships have the reverse selection - so they are not included
+  #     for both display and manipulation lists
+  referredByNameCapsuleTypes: typing.List[type] = []
+  for descriptor in singleRelationshipsByIdAttr.values():
+    if descriptor.hasName and not descriptor.isList and \
+        not descriptor.capsuleType in referredByNameCapsuleTypes:
+      referredByNameCapsuleTypes.append(descriptor.capsuleType)
+  columns = tuple(_capsule_utils.getNonChangeTrackColumns(sqlalchemyTableType = sqlalchemyTableType))
+  return CapsuleSchema(
+            capsuleType = capsuleType,
+            sqlalchemyTableType = sqlalchemyTableType,
+            hasName = _capsule_utils.hasName(sqlalchemyTableType),
+            allColumns = tuple(sqlalchemyTableType.__table__.columns),
+            columns = columns,
+            columnNames = tuple(column.name for column in columns),
+            columnsAndColumnLikeProperties = types.MappingProxyType(
+                      {key: tuple(value) for key, value in columnsAndColumnLikeProperties.items()}),
+            excludedFromJson = frozenset(sqlalchemyTableType._exclude_from_json),
+            singleRelationshipsByIdAttr = types.MappingProxyType(singleRelationshipsByIdAttr),
+            columnRelationships = tuple(columnRelationships),
+            singleRelationships = tuple(singleRelationshipsByIdAttr.values()),
+            relationships = tuple(relationshipsByName.values()),
+            listRelationships = tuple(descriptor for descriptor in relationshipsByName.values() \
+                                          if descriptor.isList),
+            relationshipsByName = types.MappingProxyType(relationshipsByName),
+            relatedCapsuleTypes = tuple(relatedCapsuleTypes),
+            referredByNameCapsuleTypes = tuple(referredByNameCapsuleTypes))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# The '__slots__' of a capsule type (see capsule_main.setupCapsules)
+#    - required on creation of the capsule class, i.e. before the schema is built
+#    - the internal name fields of all relationships (mapper relationships and 
+#      relationship like hybrid properties)
+#    - the further instance attributes are slots of the capsule base classes
+def getInstanceSlots(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+                     ) -> typing.Tuple[str, ...]:
+  relationshipNames = [relationship.key for relationship in sqlalchemyTableType.__mapper__.relationships]
+  for itemName, objType in vars(sqlalchemyTableType).items():
+    if not isinstance(objType, sqlalchemy_hyb.hybrid_property): continue
+    if not _capsule_utils.isRelationshipIdColumnName(columnName = itemName): continue
+    relationshipNames.append(_capsule_utils.getColumnToRelationshipName(columnName = itemName))
+  result: typing.List[str] = []
+  for relationshipName in relationshipNames:
+    internalNameAttr = _capsule_utils.convertRelationshipNameToInternalNameField(
+                                      relationshipName = relationshipName)
+    if not internalNameAttr in result:
+      result.append(internalNameAttr)
+  return tuple(result)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Setting the schema on all capsule types
+#    - requires all capsule types to be defined on 'callingGlobals' (related types)
+def addSchemas(capsuleList: typing.List[T],
+               callingGlobals):
+  for capsuleType in capsuleList:
+    setattr(capsuleType, SCHEMA_ATTR_NAME, buildSchema(capsuleType = capsuleType,
+                                                       callingGlobals = callingGlobals))
+
+def getSchema(capsuleType: type[T]) -> CapsuleSchema:
+  # the schema of a lazily set up capsule type is built on materialization
+  if isinstance(capsuleType, _capsule_base.LazyCapsuleType):
+    capsuleType.materialize()
+  return getattr(capsuleType, SCHEMA_ATTR_NAME)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Validation items of a capsule type: the closure of the capsule types referred to by 
+#    name over all relationships included in the json (transitively)
+#    - computed once for all capsule types reachable from the capsule type requested
+#      and stored as tuple on each capsule type ('_validation_items')
+#    - cycles of relationships (incl. self-referencing tables) are handled as strongly
+#      connected components (Tarjan) - all capsule types of a cycle share the closure
+#    - order: the capsule type's own referred by name capsule types first, followed by
+#      those of the related capsule types (in the order of the relationships)
+def __getValidationGraphSuccessors(capsuleType: type[T]) -> typing.List[type]:
+  result = []
+  for relationshipDescriptor in getSchema(capsuleType = capsuleType).relationships:
+    if relationshipDescriptor.isExcludedFromJson: continue
+    if not relationshipDescriptor.capsuleType in result:
+      result.append(relationshipDescriptor.capsuleType)
+  return result
+
+def __computeValidationItems(rootCapsuleType: type[T]) -> None:
+  indexOf: typing.Dict[type, int] = {}
+  lowLinkOf: typing.Dict[type, int] = {}
+  stack: typing.List[type] = []
+  onStack: typing.Set[type] = set()
+  def appendUnique(result: typing.List[type], items: typing.Iterable[type]):
+    for item in items:
+      if not item in result:
+        result.append(item)
+  def strongConnect(capsuleType: type[T]):
+    indexOf[capsuleType] = lowLinkOf[capsuleType] = len(indexOf)
+    stack.append(capsuleType)
+    onStack.add(capsuleType)
+    successors = __getValidationGraphSuccessors(capsuleType = capsuleType)
+    for successor in successors:
+      if not successor.__dict__.get(VALIDATION_ITEMS_ATTR_NAME) is None: continue # already computed
+      if not successor in indexOf:
+        strongConnect(successor)
+        lowLinkOf[capsuleType] = min(lowLinkOf[capsuleType], lowLinkOf[successor])
+      elif successor in onStack:
+        lowLinkOf[capsuleType] = min(lowLinkOf[capsuleType], indexOf[successor])
+    if lowLinkOf[capsuleType] != indexOf[capsuleType]: return
+    # capsuleType is the root of a strongly connected component
+    component: typing.List[type] = []
+    while True:
+      member = stack.pop()
+      onStack.discard(member)
+      component.append(member)
+      if member is capsuleType: break
+    component.reverse()
+    result: typing.List[type] = []
+    for member in component:
+      appendUnique(result, getSchema(capsuleType = member).referredByNameCapsuleTypes)
+    # successors outside the component are completed (reverse topological order)
+    for member in component:
+      for successor in __getValidationGraphSuccessors(capsuleType = member):
+        if successor in component: continue
+        appendUnique(result, successor.__dict__[VALIDATION_ITEMS_ATTR_NAME])
+    validationItems = tuple(result)
+    for member in component:
+      setattr(member, VALIDATION_ITEMS_ATTR_NAME, validationItems)
+  strongConnect(rootCapsuleType)
+
+def getValidationItems(capsuleType: type[T]) -> typing.Tuple[type, ...]:
+  result = capsuleType.__dict__.get(VALIDATION_ITEMS_ATTR_NAME)
+  if result is None:
+    __computeValidationItems(rootCapsuleType = capsuleType)
+    result = capsuleType.__dict__[VALIDATION_ITEMS_ATTR_NAME]
+  return result
@@ -393,6 +393,29 @@ def getFromJsonFncName() -> str:
         str: From JSON function name
     """
     return f"fromJson"
+# Naming conventions of the generated (specialized) json functions of a capsule class
+def getGeneratedToDictFncName(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]) -> str:
+    """
+    Returns the name of the generated toDict function for a SQLAlchemy Declarative type.
+
+    Args:
+        sqlalchemyTableType: SQLAlchemy Declarative Meta class
+
+    Returns:
+        str: Generated to dictionary function name
+    """
+    return f"toDict{getBaseName(sqlalchemyTableType=sqlalchemyTableType)}"
+def getGeneratedFromDictFncName(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]) -> str:
+    """
+    Returns the name of the generated fromDict function for a SQLAlchemy Declarative type.
+
+    Args:
+        sqlalchemyTableType: SQLAlchemy Declarative Meta class
+
+    Returns:
+        str: Generated from dictionary function name
+    """
+    return f"fromDict{getBaseName(sqlalchemyTableType=sqlalchemyTableType)}"
 
 def getValidationItemsFncName() -> str:
     """
@@ -4,7 +4,8 @@ from sqlalchemy.ext import declarative as sqlalchemy_decl
 from sqlalchemy.ext import hybrid as sqlalchemy_hyb
 
 
-from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils, _capsule_shared
+from europy_db_controllers.entity_capsules import _capsule_base, _capsule_utils, _capsule_shared, _capsule_schema, \
+                                                  _capsule_consistency
 
 T = typing.TypeVar("T", bound=_capsule_base.CapsuleBase)
 U = typing.TypeVar("U", bound=_capsule_base.CapsuleBase)
@@ -22,24 +23,21 @@ class __RelationshipPropertyEnum(enum.Enum):
 # Setting values to relationship attributes on a capsule (& resp. sqlalchemy bbles) general 
 #   function
 def __setRelationshipAttributeValuesMain(self: T,
-                                         dictAttributeNamingConventions: dict[str, str],
+                                         relationshipDescriptor: _capsule_schema.RelationshipDescriptor,
                                          sqlaId: uuid.UUID,
                                          sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta,
                                          name: str):
-  relationshipIdAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_ID]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
-  relationshipNameCapsuleInternalAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_INTERNAL_NAME]
   if sqlalchemyTable is not None:
     if hasattr(sqlalchemyTable, 'name'):
       name = getattr(sqlalchemyTable, 'name')
     sqlaId = getattr(sqlalchemyTable, 'id')
-  if hasattr(type(self), relationshipNameCapsuleInternalAttr):
-    setattr(self, relationshipNameCapsuleInternalAttr, name) 
-  setattr(self.sqlalchemyTable, relationshipName, sqlalchemyTable)
-  setattr(self.sqlalchemyTable, relationshipIdAttr, sqlaId)
-  fncNameSourceAndConsistency = _capsule_utils.getSourceAndConsistencyCheckFncName(
-                                relationshipName = relationshipName)
-  getattr(self, fncNameSourceAndConsistency)()
+  _capsule_consistency.discardConsistentStates(capsule = self,
+                                               relationshipDescriptor = relationshipDescriptor)
+  if relationshipDescriptor.hasName:
+    setattr(self, relationshipDescriptor.internalNameAttr, name) 
+  setattr(self.sqlalchemyTable, relationshipDescriptor.relationshipName, sqlalchemyTable)
+  setattr(self.sqlalchemyTable, relationshipDescriptor.idAttr, sqlaId)
+  getattr(self, relationshipDescriptor.sourceAndConsistencyCheckFncName)()
   self._hasValueInput = True    
   pass
 # Define the list of values according to enumeration of relationship attributes
@@ -55,30 +53,27 @@ def __getRelationshipAttributeValues(value: typing.Union[uuid.UUID, sqlalchemy_d
 # Setting values to relationship attributes on a capsule (& resp. sqlalchemy tables) based on 
 #    enumeration of relationship attributes
 def setRelationshipAttributeValues(self: T,
-                                   dictAttributeNamingConventions: dict[str, str],
+                                   relationshipDescriptor: _capsule_schema.RelationshipDescriptor,
                                    value: typing.Union[uuid.UUID, sqlalchemy_decl.DeclarativeMeta, str],
                                    valueType: __RelationshipPropertyEnum):
   valueList = __getRelationshipAttributeValues(value = value,
                                                valueType = valueType)
   __setRelationshipAttributeValuesMain(self = self,
-                                       dictAttributeNamingConventions = dictAttributeNamingConventions,
+                                       relationshipDescriptor = relationshipDescriptor,
                                        sqlaId = valueList[__RelationshipPropertyEnum.ID.value],
                                        sqlalchemyTable = valueList[__RelationshipPropertyEnum.SQLALCHEMY_TABLE.value],
                                        name = valueList[__RelationshipPropertyEnum.NAME_INTERNAL.value])
 # Check whether a relationship's sqlalchemyTable modified an object
 def isModifyingObject(parentObj: T, 
                       childObj: U, 
-                      relationshipName: str) -> bool:
-  relationshipIdAttr = f"{relationshipName}_id"
-  relationshipName_capsule_attr = f"{relationshipName}_name"
+                      relationshipDescriptor: _capsule_schema.RelationshipDescriptor) -> bool:
   def getParentPropertyNameAttr(parentObj: T):
-    try: return getattr(parentObj, relationshipName_capsule_attr)
+    try: return getattr(parentObj, relationshipDescriptor.nameAttr)
     except: return None
   def getChildPropertyNameAttr(childObj: U):
     try: return getattr(childObj, 'name')
     except: return None
-  relationshipIdAttr = f"{relationshipName}_id"
-  parentObjPropId = getattr(parentObj, relationshipIdAttr) 
+  parentObjPropId = getattr(parentObj, relationshipDescriptor.idAttr) 
   parentObjPropName = getParentPropertyNameAttr(parentObj=parentObj)
   parentPropsNone = (parentObjPropId is None) and (parentObjPropName is None)
   if (childObj is None) != parentPropsNone: return True
@@ -155,11 +150,10 @@ def addDataColumnAttributes(capsuleList: typing.List[T],
     if doPrint:
       print(f"addDataColumnAttributes {capsuleType.__name__}")
 
-    # getSqlalchemyColumnsAndColumnLikeProperties(capsuleType = capsuleType) 
-    #       -> dict{<nameOfItem>: [<nameOfItem>, <isHybridProperty>, <hasSetter]}
-    sqlalchemyColumnsAndColumnLikeProperties = _capsule_utils.getSqlalchemyColumnsAndColumnLikeProperties(
-                                                capsuleType = capsuleType)  
-    for attributeName, attributeInfo in sqlalchemyColumnsAndColumnLikeProperties.items():
+    # schema.columnsAndColumnLikeProperties 
+    #       -> dict{<nameOfItem>: (<nameOfItem>, <isHybridProperty>, <hasSetter)}
+    schema = _capsule_schema.getSchema(capsuleType = capsuleType)
+    for attributeName, attributeInfo in schema.columnsAndColumnLikeProperties.items():
       noHybridProperty = not attributeInfo[1]
       isRelationshipIdColumn = _capsule_utils.isRelationshipIdColumnName(columnName = attributeName)
 
@@ -207,13 +201,11 @@ def addDataColumnAttributes(capsuleList: typing.List[T],
 # Setter & getter properties related to the relationshipIdAttr
 # additional features if relationship_type has a (unique) id:
 def __setIdProperties(capsuleType: type[T],
-                      dictAttributeNamingConventions: dict[str, str]) -> str:
-  relationshipIdAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_ID]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+                      relationshipDescriptor: _capsule_schema.RelationshipDescriptor) -> str:
+  relationshipIdAttr = relationshipDescriptor.idAttr
+  fncNameConsistency = relationshipDescriptor.consistencyCheckFncName
   def getterFnc(self: capsuleType) -> uuid.UUID:
-    fncNameSourceAndConsistency = _capsule_utils.getConsistencyCheckFncName(
-                                  relationshipName = relationshipName)
-    getattr(self, fncNameSourceAndConsistency)()
+    getattr(self, fncNameConsistency)()
     return getattr(self.sqlalchemyTable, relationshipIdAttr)
   def setterFnc(self: capsuleType, 
                 id: uuid.UUID):
@@ -222,7 +214,7 @@ def __setIdProperties(capsuleType: type[T],
       if self.sqlalchemyTable.id is not None:
         self.sqlalchemyTable.modified_at = datetime.datetime.now()
       setRelationshipAttributeValues(self = self,
-                                    dictAttributeNamingConventions = dictAttributeNamingConventions,
+                                    relationshipDescriptor = relationshipDescriptor,
                                     value = id,
                                     valueType = __RelationshipPropertyEnum.ID)
   def omitNonFnc(self: capsuleType, id: uuid.UUID):
@@ -239,17 +231,14 @@ def __setIdProperties(capsuleType: type[T],
 # Setter & getter properties related to the relationshipName_capsule_attr
 # additional features if relationship_type has a (unique) name:
 def __setNameProperties(capsuleType: type[T],
-                        dictAttributeNamingConventions: dict[str, str],
-                        relationshipType: type[U]) -> str:
-  if not hasattr(relationshipType.sqlalchemyTableType, 'name'):
+                        relationshipDescriptor: _capsule_schema.RelationshipDescriptor) -> str:
+  if not relationshipDescriptor.hasName:
     return
-  relationshipNameCapsuleInternalAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_INTERNAL_NAME]
-  relationshipNameAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_NAME]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+  relationshipNameCapsuleInternalAttr = relationshipDescriptor.internalNameAttr
+  relationshipNameAttr = relationshipDescriptor.nameAttr
+  fncNameConsistency = relationshipDescriptor.consistencyCheckFncName
   def getterFnc(self: T) -> str:
-    fncNameSourceAndConsistency = _capsule_utils.getConsistencyCheckFncName(
-                                  relationshipName = relationshipName)
-    getattr(self, fncNameSourceAndConsistency)()
+    getattr(self, fncNameConsistency)()
     return getattr(self, relationshipNameCapsuleInternalAttr)
   def setterFnc(self: capsuleType, name: str):
     if getattr(self, relationshipNameCapsuleInternalAttr) != name:
@@ -257,14 +246,13 @@ def __setNameProperties(capsuleType: type[T],
       if self.sqlalchemyTable.id is not None:
         self.sqlalchemyTable.modified_at = datetime.datetime.now()
       setRelationshipAttributeValues(self = self,
-                                    dictAttributeNamingConventions = dictAttributeNamingConventions,
+                                    relationshipDescriptor = relationshipDescriptor,
                                     value = name,
                                     valueType = __RelationshipPropertyEnum.NAME_INTERNAL)
   def omitNonFnc(self: capsuleType, name: str):
     if name is None: return # do nothing if name is 'None'      
     setattr(self, relationshipNameCapsuleInternalAttr, name)
-  # set the internal relationship name attribute first
-  setattr(capsuleType, relationshipNameCapsuleInternalAttr, None)
+  # the internal relationship name attribute is a slot set to 'None' by the capsule's __init__
   propertyGetter = property(_capsule_base.cleanAndCloseSession(getterFnc))
   propertySetter = propertyGetter.setter(_capsule_base.cleanAndCloseSession(setterFnc))
   setattr(capsuleType, relationshipNameAttr, propertyGetter)
@@ -275,30 +263,21 @@ def __setNameProperties(capsuleType: type[T],
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # Setter & getter properties related to the object
 def __setRelationshipObjectProperties(capsuleType: type[T],
-                                      dictAttributeNamingConventions: dict[str, str],
-                                      relationshipType: type[U]) -> str:
-
-  doPrint = (capsuleType.__name__ == "MarketAndForwardTransactionCapsule")
-  if doPrint:
-    print(f"    __setRelationshipObjectProperties {capsuleType.__name__}")
-
-  relationshipIdAttr = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_ID]
-  relationshipName = dictAttributeNamingConventions[_capsule_utils.REL_ATTR_DICT_KEY_RELATIONSHIP]
+                                      relationshipDescriptor: _capsule_schema.RelationshipDescriptor) -> str:
+  relationshipIdAttr = relationshipDescriptor.idAttr
+  relationshipName = relationshipDescriptor.relationshipName
+  relationshipType = relationshipDescriptor.capsuleType
+  fncNameConsistency = relationshipDescriptor.consistencyCheckFncName
   def getterFnc(self) -> relationshipType:
     if not hasattr(self.sqlalchemyTable, relationshipIdAttr):
       self._raiseException(f"Illegal use of setter of property '{relationshipName}'" + \
                       f"on object {type(self)}.\n" +
                       f"Usage not permissible if '{relationshipIdAttr}' not defined on object.")
-    fncNameSourceAndConsistency = _capsule_utils.getConsistencyCheckFncName(
-                                  relationshipName = relationshipName)
-    getattr(self, fncNameSourceAndConsistency)()
+    getattr(self, fncNameConsistency)()
     relationshipSqlaTable = getattr(self.sqlalchemyTable, relationshipName) 
     if relationshipSqlaTable is None: 
       return None
     else: 
-      
-      if doPrint:
-        print(f"       calling getter function for '{relationshipName}' on {capsuleType.__name__}")
       return relationshipType.defineBySqlalchemyTable(
                   session = self.session,
                   sqlalchemyTableEntity = relationshipSqlaTable)  
@@ -308,11 +287,11 @@ def __setRelationshipObjectProperties(capsuleType: type[T],
                       f"on object {type(self)}.\n" +
                       f"Usage not permissible if '{relationshipIdAttr}' not defined on object.")
     sqlalchemyTable = None if obj is None else obj.sqlalchemyTable
-    if isModifyingObject(self, obj, relationshipName):
+    if isModifyingObject(self, obj, relationshipDescriptor):
       if self.sqlalchemyTable.id is not None:
         self.sqlalchemyTable.modified_at = datetime.datetime.now()
       setRelationshipAttributeValues(self = self,
-                                    dictAttributeNamingConventions = dictAttributeNamingConventions,
+                                    relationshipDescriptor = relationshipDescriptor,
                                     value = sqlalchemyTable,
                                     valueType = __RelationshipPropertyEnum.SQLALCHEMY_TABLE)
   def omitNonFnc(self: capsuleType, obj: relationshipType):
@@ -320,181 +299,41 @@ def __setRelationshipObjectProperties(capsuleType: type[T],
     setattr(self, relationshipName, obj)
   propertyGetter = property(_capsule_base.cleanAndCloseSession(getterFnc))
   propertySetter = propertyGetter.setter(_capsule_base.cleanAndCloseSession(setterFnc))
-  if doPrint:
-    print(f"       relationshipName: {relationshipName}")
   setattr(capsuleType, relationshipName, propertyGetter)
   setattr(capsuleType, relationshipName, propertySetter)
   omitNoneFncName = _capsule_utils.getOmitIfNoneFncName(
           attributeName = relationshipName)
   setattr(capsuleType, omitNoneFncName, _capsule_base.cleanAndCloseSession(omitNonFnc)) # No prop!!
 
-def __addGetValidationItemsAttribute(capsuleType: type[T],
-                                     callingGlobals):
-  sqlalchemyTableType = capsuleType.sqlalchemyTableType
-  relationships = capsuleType.sqlalchemyTableType.__mapper__.relationships
+# The capsule types whose names are required to validate the capsule's json
+#   (memoized closure over the relationship graph - see _capsule_schema.getValidationItems)
+def __addGetValidationItemsAttribute(capsuleType: type[T]):
   validationItemsFncName = _capsule_utils.getValidationItemsFncName()
-  def getterFnc(self, callingTableType: type[V] = None) -> typing.List[type[U]]:
-    result = capsuleType._referred_by_name_capsules
-    # if the calling sqlalchemyTableType is the same as the called sqlalchemyTableType, 
-    #    then no need to go through the relationships  
-    #    this avoids infinite recursion on self-referencing tables
-    if not callingTableType is None:
-      if callingTableType.__name__ == sqlalchemyTableType.__name__:
-        return result
-    for relationship in relationships:
-      if not relationship.key in capsuleType.sqlalchemyTableType._exclude_from_json:
-        relationshipType = _capsule_utils.getRelationshipCapsuleTypeOfName(
-                        relationshipName = relationship.key,
-                        sqlalchemyTableType = sqlalchemyTableType,
-                        callingGlobals = callingGlobals)
-        relationshipValidationItems = getattr(relationshipType, validationItemsFncName)(callingTableType = sqlalchemyTableType)
-        for relationshipValidationItem in relationshipValidationItems:
-          if not relationshipValidationItem in result:
-            result.append(relationshipValidationItem)
-    return result
+  def getterFnc(self) -> typing.Tuple[type[U], ...]:
+    return _capsule_schema.getValidationItems(capsuleType = capsuleType)
   propertyGetter = classmethod(getterFnc)
   setattr(capsuleType, validationItemsFncName, propertyGetter)
 
 # Adding single relationship attributes based on the above
+#   - the relationship types (incl. those of hybrid properties mimicking relationships)
+#     are identified when building the capsule schema (see _capsule_schema)
 def addRelationshipAttributes(capsuleList: typing.List[T],
                               callingGlobals):
   for capsuleType in capsuleList:
+    schema = _capsule_schema.getSchema(capsuleType = capsuleType)
     # reset the _referred_by_name_capsules to ensure independent list
     #   for each capsuleType
-
-    doPrint = (capsuleType.__name__ == "MarketAndForwardTransactionCapsule")
-    if doPrint:
-      print(f"addRelationshipAttributes {capsuleType.__name__}")
-
-    capsuleType._referred_by_name_capsules = []  
-    sqlalchemyTableType = capsuleType.sqlalchemyTableType
-    __addGetValidationItemsAttribute(capsuleType=capsuleType,
-                                      callingGlobals=callingGlobals)
-    sqlalchemyColumnsAndColumnLikeProperties = _capsule_utils.getSqlalchemyColumnsAndColumnLikeProperties(
-                                              capsuleType = capsuleType)  
-    for attributeName, attributeInfo in sqlalchemyColumnsAndColumnLikeProperties.items():
-      if not _capsule_utils.isRelationshipIdColumnName(columnName = attributeName): continue
-      relationshipName = _capsule_utils.getColumnToRelationshipName(columnName = attributeName)
-      isHybridProperty = attributeInfo[1]
-      if doPrint:
-        print(f"  relationship id column: {attributeName} - isHybridProperty: {isHybridProperty}")
-        print(f"  relationship name     : {relationshipName}")
-      dictAttributeNamingConventions = _capsule_utils.getDictOfAttributeNamingConventionsFromRelationshipName(
-                      relationshipName = relationshipName)
-      if isHybridProperty:
-        relationshipType = getattr(sqlalchemyTableType, relationshipName).fget.__annotations__['return']
-        # Ensure that the return type is properly defined. As an example refer to:
-        #    module: EStG36a.src.model.transaction.py
-        #    class: MarketAndForwardTransaction 
-        #    (code below has been changed - example only)
-        # @sqlalchemy_hyb.hybrid_property 
-        # def asset(self) -> "asset.AssetTable":
-        #     RETURN_TYPE_PROPERTY_NAME = "_hyb_prop_asset_return_type"
-        #     def specify_return_type(class_type_definition):
-        #       print(f"[specify_return_type running]")
-        #       if not hasattr(class_type_definition, RETURN_TYPE_PROPERTY_NAME):
-        #           print(f"  setting {RETURN_TYPE_PROPERTY_NAME}")
-        #           mkt_tx_table_class = class_type_definition.market_transaction.property.mapper.class_
-        #           setattr(class_type_definition, RETURN_TYPE_PROPERTY_NAME, mkt_tx_table_class.asset.property.mapper.class_)
-        #           class_type_definition.asset.fget.__annotations__['return'] = getattr(class_type_definition, RETURN_TYPE_PROPERTY_NAME)
-        #     if isinstance(self, MarketAndForwardTransactionTable):
-        #         specify_return_type(self.__class__)
-        #         if self.market_transaction is not None:
-        #             return self.market_transaction.asset
-        #         else:
-        #             return None
-        #     else:
-        #         specify_return_type(self)
-        #         pass
-        # @asset.setter
-        # def asset(self, value):
-        #     self.market_transaction.asset = value
-        # Define list prefixes and check if any match
-        relationShipTypeClassName = relationshipType.__name__
-        list_prefixes = ['list', 'List', 'typing.List']
-        prefix_index = next((i for i, prefix in enumerate(list_prefixes) 
-                           if relationShipTypeClassName.startswith(prefix)), -1)
-        isList = prefix_index >= 0
-        # If it's a list type, get the actual table class name without the list prefix
-        if isList:
-            # Remove the list prefix
-            if prefix_index >= 0:
-                prefix = list_prefixes[prefix_index]
-                relationShipTypeClassName = relationShipTypeClassName[len(prefix):]
-            # Remove brackets if present
-            starts_with_bracket = relationShipTypeClassName.startswith('[')
-            ends_with_bracket = relationShipTypeClassName.endswith(']')
-            if starts_with_bracket and ends_with_bracket:
-                relationShipTypeClassName = relationShipTypeClassName[1:-1]
-        hybridPropertyCapsuleClassName = _capsule_utils.getSqlaToCapsuleName(
-                                            sqlaTableName = relationShipTypeClassName)
-        relationshipType = callingGlobals[hybridPropertyCapsuleClassName]
-      else:
-        relationshipType = _capsule_utils.getRelationshipCapsuleTypeOfName(
-                      relationshipName = relationshipName,
-                      sqlalchemyTableType = sqlalchemyTableType,
-                      callingGlobals = callingGlobals)
-        relationship = capsuleType.sqlalchemyTableType.__mapper__.relationships[relationshipName]
-        isList = relationship.uselist
-
-      if doPrint:
-        print(f"  relationship type     : {relationshipType.__name__} isList: {isList}")
- 
+    #   (used to identify permissible values for selecting by user - list
+    #    relationships have the reverse selection and are not included)
+    capsuleType._referred_by_name_capsules = list(schema.referredByNameCapsuleTypes)
+    __addGetValidationItemsAttribute(capsuleType=capsuleType)
+    for relationshipDescriptor in schema.singleRelationships:
       __setIdProperties(capsuleType = capsuleType,
-                        dictAttributeNamingConventions = dictAttributeNamingConventions)
+                        relationshipDescriptor = relationshipDescriptor)
       __setNameProperties(capsuleType = capsuleType,
-                          dictAttributeNamingConventions = dictAttributeNamingConventions,
-                          relationshipType = relationshipType)
+                          relationshipDescriptor = relationshipDescriptor)
       __setRelationshipObjectProperties(capsuleType = capsuleType,
-                          dictAttributeNamingConventions = dictAttributeNamingConventions,
-                          relationshipType = relationshipType)
-      if hasattr(relationshipType, 'name'):
-        # append the relationship's capsule type to _referred_by_name_capsules
-        #   used to identify permissible values for selecting by user 
-        if not relationshipType in capsuleType._referred_by_name_capsules:
-          # List have the reverse selection - so they are not included
-          #     for both display and manipulation lists
-          if not isList:
-            #print(f"capsule type: {capsuleType.__name__}")
-            capsuleType._referred_by_name_capsules.append(relationshipType)
-      pass
-    # for column in sqlalchemyTableType.__table__.columns:
-    #   if _capsule_utils.isRelationshipIdColumn(column=column):
-    #     relationshipName = _capsule_utils.getRelationshipNameOfColumn(column = column)
-    #     dictAttributeNamingConventions = _capsule_utils.getDictOfAttributeNamingConventionsFromRelationshipName(
-    #                     relationshipName = relationshipName)
-    #     relationshipType = _capsule_utils.getRelationshipCapsuleTypeOfName(
-    #                     relationshipName = relationshipName,
-    #                     sqlalchemyTableType = sqlalchemyTableType,
-    #                     callingGlobals = callingGlobals)
-    #     relationship = capsuleType.sqlalchemyTableType.__mapper__.relationships[relationshipName]
-
-    #     if doPrint:
-    #       print(f"  relationship id column: {column.name}")
-    #       print(f"  relationship name     : {relationshipName}")
-    #       print(f"  relationship type     : {relationshipType.__name__}")
-    #       print(f"  relationship          : {relationship.key}")
-
-    #     __setIdProperties(capsuleType = capsuleType,
-    #                       dictAttributeNamingConventions = dictAttributeNamingConventions)
-    #     __setNameProperties(capsuleType = capsuleType,
-    #                         dictAttributeNamingConventions = dictAttributeNamingConventions,
-    #                         relationshipType = relationshipType)
-    #     __setRelationshipObjectProperties(capsuleType = capsuleType,
-    #                         dictAttributeNamingConventions = dictAttributeNamingConventions,
-    #                         relationshipType = relationshipType)
-    #     if hasattr(relationshipType, 'name'):
-    #       # append the relationship's capsule type to _referred_by_name_capsules
-    #       #   used to identify permissible values for selecting by user 
-    #       if not relationshipType in capsuleType._referred_by_name_capsules:
-    #         # List have the reverse selection - so they are not included
-    #         #     for both display and manipulation lists
-    #         if not relationship.uselist:
-    #           #print(f"capsule type: {capsuleType.__name__}")
-    #           capsuleType._referred_by_name_capsules.append(relationshipType)
-
-
-        
+                          relationshipDescriptor = relationshipDescriptor)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -616,33 +455,15 @@ def __addManipulationList(capsuleType: type[T],
 def addListAttributes(capsuleList: typing.List[T],
                              callingGlobals):
   for capsuleType in capsuleList:
-    sqlalchemyTableType = capsuleType.sqlalchemyTableType
-    table = sqlalchemyTableType.__table__
-    tableTypeName = _capsule_utils.getSqlalchemyTableTypeName(table=table)
-    tableType = callingGlobals[tableTypeName]
-    relationshipNames: typing.List[str] = []
-    for relationship in tableType.__mapper__.relationships:
-      # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-      # Identify relationships that are lists (others treated above - if conventions met)
-      if relationship.uselist:
-        # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # Identify capsule class of the relationship                                                   relationship = relationship)
-        relationshipSqlaTableClassName = relationship.mapper.class_.__name__
-        relationshipCapsuleClassName = _capsule_utils.getSqlaToCapsuleName(relationshipSqlaTableClassName)
-        relationshipCapsuleClass = callingGlobals[relationshipCapsuleClassName]
-        isDisplayList = _capsule_utils.isDisplayList(sqlalchemyTableType = sqlalchemyTableType,
-                                                     relationship = relationship)
-        relationshipName = relationship.key
-        # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        # Identify relationships that are lists (others treated above - if conventions met)                                                   relationship = relationship)
-        if isDisplayList:
-          __addDisplayList(capsuleType = capsuleType,
-                           relationshipName = relationshipName, 
-                           relationshipCapsuleClass = relationshipCapsuleClass)
-        else: 
-          relationshipPropertyName = relationshipName.removesuffix("s")
-          __addManipulationList(capsuleType = capsuleType,
-                           relationshipName = relationshipName, 
-                           relationshipCapsuleClass = relationshipCapsuleClass)
-      else:
-        pass
+    schema = _capsule_schema.getSchema(capsuleType = capsuleType)
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Relationships that are lists (others treated above - if conventions met)
+    for relationshipDescriptor in schema.listRelationships:
+      if relationshipDescriptor.isDisplayList:
+        __addDisplayList(capsuleType = capsuleType,
+                         relationshipName = relationshipDescriptor.relationshipName, 
+                         relationshipCapsuleClass = relationshipDescriptor.capsuleType)
+      else: 
+        __addManipulationList(capsuleType = capsuleType,
+                         relationshipName = relationshipDescriptor.relationshipName, 
+                         relationshipCapsuleClass = relationshipDescriptor.capsuleType)
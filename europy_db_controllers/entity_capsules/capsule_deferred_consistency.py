@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import typing, contextlib
+
+import sqlalchemy
+from sqlalchemy import orm as sqlalchemy_orm
+
+
+DEFERRED_CONSISTENCY_SESSION_INFO_KEY = "europy_deferred_consistency"
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Exception of a failed relationship consistency check (inconsistent ids and names, 
+#   related entities not found or not unique - see _capsule_consistency)
+#   - the only failures collected as violations by the validation of the deferred checks
+class ConsistencyError(Exception):
+  pass
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Exception reporting all violations of the validation of the deferred checks at once
+class ConsistencyViolationsError(Exception):
+  def __init__(self,
+               violations: typing.List[str]) -> None:
+    self.violations = violations
+    super().__init__(f"[Inconsistent relationships] Exactly '{len(violations)}' violations " + \
+                     f"identified by the deferred consistency checks:\n" + \
+                     "\n".join(violations))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Session-scoped deferral of the relationship consistency checks (opt-in - e.g. bulk imports)
+#   - the consistency and sourcing checks of the capsules (see _capsule_consistency)
+#     are recorded per capsule and relationship instead of being run
+#   - the recorded checks are validated at once before each flush of the session (or
+#     by 'validate'):
+#       1. the related entities referred to by id or by name are resolved per related
+#          capsule type by set-based queries ('IN') and set on the capsules'
+#          sqlalchemyTables (entities referred to by id: on objects without db identity
+#          only - persistent objects source them from the identity map)
+#       2. the checks are run over the batch - the sourcing and, as the relationship
+#          entities may have been set by 1., the consistency checks
+#   - all violations are reported by one ConsistencyViolationsError (the session is not
+#     closed) - the failed checks stay recorded; other errors (e.g. of the db) propagate
+#   - until validated, the relationship attributes of the capsules are as set (neither
+#     sourced nor checked)
+class DeferredConsistency():
+  def __init__(self,
+               session: sqlalchemy_orm.Session) -> None:
+    self.session = session
+    # {id(<capsule>): (<capsule>, {<relationshipName>: <RelationshipDescriptor>})}
+    self._pendingChecks: typing.Dict[int, typing.Tuple[any, typing.Dict[str, any]]] = {}
+    # checks are run (not recorded) while validating
+    self.isValidating = False
+
+  def defer(self,
+            capsule: any,
+            relationshipDescriptor: any) -> bool:
+    # -> 'True' if the check is recorded (to be skipped by the caller)
+    if self.isValidating: return False
+    _, relationshipDescriptors = self._pendingChecks.setdefault(id(capsule), (capsule, {}))
+    relationshipDescriptors[relationshipDescriptor.relationshipName] = relationshipDescriptor
+    return True
+  def hasPendingChecks(self) -> bool:
+    return len(self._pendingChecks) > 0
+  def clear(self):
+    self._pendingChecks.clear()
+
+  def _resolveRelatedSqlalchemyTables(self,
+                                      pendingChecks: typing.List[typing.Tuple[any, typing.Dict[str, any]]]
+                                      ) -> typing.List[any]:
+    # {<related capsuleType>: {<id or name>: [(<capsule>, <RelationshipDescriptor>)]}}
+    idsOfCapsuleTypes: typing.Dict[type, typing.Dict[any, typing.List[tuple]]] = {}
+    namesOfCapsuleTypes: typing.Dict[type, typing.Dict[str, typing.List[tuple]]] = {}
+    for capsule, relationshipDescriptors in pendingChecks:
+      if capsule.sqlalchemyTable is None: continue
+      # read from the state - no load of expired attributes
+      instanceState = sqlalchemy.inspect(capsule.sqlalchemyTable)
+      stateDict = instanceState.dict
+      for relationshipDescriptor in relationshipDescriptors.values():
+        if relationshipDescriptor.capsuleType is None: continue
+        if stateDict.get(relationshipDescriptor.relationshipName) is not None: continue
+        relationshipId = stateDict.get(relationshipDescriptor.idAttr)
+        if relationshipId is not None:
+          capsulesOfIds = idsOfCapsuleTypes.setdefault(relationshipDescriptor.capsuleType, {})
+          capsulesOfId = capsulesOfIds.setdefault(relationshipId, [])
+          if instanceState.key is None:
+            capsulesOfId.append((capsule, relationshipDescriptor))
+        elif relationshipDescriptor.hasName:
+          name = getattr(capsule, relationshipDescriptor.internalNameAttr)
+          if name is None: continue
+          namesOfCapsuleTypes.setdefault(relationshipDescriptor.capsuleType, {}) \
+                             .setdefault(name, []).append((capsule, relationshipDescriptor))
+    # entities not resolved (ids not found, names of new or dirty entities, missing or
+    #   duplicate names) are sourced by the checks
+    result = []
+    def setRelatedSqlalchemyTables(sqlalchemyTablesOfKeys: typing.Dict[any, any],
+                                   capsulesOfKeys: typing.Dict[any, typing.List[tuple]]):
+      for key, sqlalchemyTable in sqlalchemyTablesOfKeys.items():
+        for capsule, relationshipDescriptor in capsulesOfKeys[key]:
+          setattr(capsule.sqlalchemyTable, relationshipDescriptor.relationshipName, sqlalchemyTable)
+        result.append(sqlalchemyTable)
+    for capsuleType, capsulesOfIds in idsOfCapsuleTypes.items():
+      setRelatedSqlalchemyTables(sqlalchemyTablesOfKeys = capsuleType._queryTablesByIds(
+                                                                session = self.session,
+                                                                ids = capsulesOfIds.keys(),
+                                                                raiseIfMissing = False),
+                                 capsulesOfKeys = capsulesOfIds)
+    for capsuleType, capsulesOfNames in namesOfCapsuleTypes.items():
+      setRelatedSqlalchemyTables(sqlalchemyTablesOfKeys = capsuleType._queryTablesByNames(
+                                                                session = self.session,
+                                                                names = capsulesOfNames.keys()),
+                                 capsulesOfKeys = capsulesOfNames)
+    return result
+
+  def validate(self) -> typing.List[str]:
+    # -> the violations (messages of the failed checks)
+    if not self.hasPendingChecks(): return []
+    pendingChecks = list(self._pendingChecks.values())
+    self._pendingChecks = {}
+    violations: typing.List[str] = []
+    self.isValidating = True
+    try:
+      with self.session.no_autoflush:
+        # references keep the resolved entities in the identity map while checking
+        resolvedSqlalchemyTables = self._resolveRelatedSqlalchemyTables(pendingChecks = pendingChecks)
+        for capsule, relationshipDescriptors in pendingChecks:
+          for relationshipDescriptor in relationshipDescriptors.values():
+            try:
+              getattr(capsule, relationshipDescriptor.sourceAndConsistencyCheckFncName)()
+              # the relationship entities set by the resolution are checked against the
+              #   capsule's relationship id and name (not checked by the sourcing if set)
+              getattr(capsule, relationshipDescriptor.consistencyCheckFncName)()
+            except ConsistencyError as e:
+              violations.append(str(e))
+              _, failedChecks = self._pendingChecks.setdefault(id(capsule), (capsule, {}))
+              failedChecks[relationshipDescriptor.relationshipName] = relationshipDescriptor
+        del resolvedSqlalchemyTables
+    finally:
+      self.isValidating = False
+    return violations
+  def validateOrRaise(self):
+    violations = self.validate()
+    if len(violations) > 0:
+      raise ConsistencyViolationsError(violations = violations)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Session events validating the deferred checks
+def _onBeforeFlush(session: sqlalchemy_orm.Session, flushContext, instances):
+  getDeferredConsistency(session = session).validateOrRaise()
+def _onRollback(session: sqlalchemy_orm.Session):
+  # the objects the checks were recorded on are expunged or expired
+  getDeferredConsistency(session = session).clear()
+
+_SESSION_EVENTS = [('before_flush', _onBeforeFlush),
+                   ('after_rollback', _onRollback)]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Activation of the deferred consistency checks on a session
+def getDeferredConsistency(session: sqlalchemy_orm.Session) -> DeferredConsistency:
+  if session is None: return None
+  return session.info.get(DEFERRED_CONSISTENCY_SESSION_INFO_KEY)
+def hasDeferredConsistency(session: sqlalchemy_orm.Session) -> bool:
+  return getDeferredConsistency(session = session) is not None
+def isValidating(session: sqlalchemy_orm.Session) -> bool:
+  deferredConsistency = getDeferredConsistency(session = session)
+  return deferredConsistency is not None and deferredConsistency.isValidating
+
+def enableDeferredConsistency(session: sqlalchemy_orm.Session) -> DeferredConsistency:
+  deferredConsistency = getDeferredConsistency(session = session)
+  if deferredConsistency is not None: return deferredConsistency
+  deferredConsistency = DeferredConsistency(session = session)
+  session.info[DEFERRED_CONSISTENCY_SESSION_INFO_KEY] = deferredConsistency
+  for eventName, eventFnc in _SESSION_EVENTS:
+    sqlalchemy.event.listen(session, eventName, eventFnc)
+  return deferredConsistency
+def disableDeferredConsistency(session: sqlalchemy_orm.Session):
+  # checks still pending are dropped
+  if not hasDeferredConsistency(session = session): return
+  for eventName, eventFnc in _SESSION_EVENTS:
+    sqlalchemy.event.remove(session, eventName, eventFnc)
+  del session.info[DEFERRED_CONSISTENCY_SESSION_INFO_KEY]
+
+@contextlib.contextmanager
+def deferredConsistency(session: sqlalchemy_orm.Session) -> typing.Iterator[DeferredConsistency]:
+  # checks deferred within the block - the checks not yet validated by a flush are
+  #   validated on exit
+  wasEnabled = hasDeferredConsistency(session = session)
+  result = enableDeferredConsistency(session = session)
+  try:
+    yield result
+    result.validateOrRaise()
+  finally:
+    if not wasEnabled:
+      disableDeferredConsistency(session = session)
+
+@contextlib.contextmanager
+def bulkConstruction(session: sqlalchemy_orm.Session) -> typing.Iterator[DeferredConsistency]:
+  # capsules constructed in bulk (e.g. _controller_json fromDict): the relationships
+  #   are sourced and checked for all capsules constructed within the block on exit
+  #   - joins the deferral of an enclosing block (or of the session): validated by the
+  #     enclosing block (or the next flush)
+  if hasDeferredConsistency(session = session):
+    yield getDeferredConsistency(session = session)
+    return
+  with deferredConsistency(session = session) as result:
+    yield result
@@ -4,14 +4,113 @@ import sqlalchemy as sqla
 import sqlalchemy.orm as sqla_orm
 
 from europy_db_controllers.entity_capsules import _capsule_base, _generic_capsule_attr, _capsule_utils, \
-                                            _capsule_init, _capsule_consistency, _capsule_json
+                                            _capsule_init, _capsule_consistency, _capsule_json, \
+                                            _capsule_schema
+from europy_db_controllers.utils import code_cache
 
 
 CB = typing.TypeVar("CB", bound=_capsule_base.CapsuleBase)
 
+CAPSULE_CODE_CACHE_NAME = "capsules"
+# modules generating source code stored in the code cache
+CAPSULE_CODE_GENERATOR_MODULES = [_capsule_init, _capsule_json, _capsule_utils, _capsule_schema]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Setup phases generating the attributes and methods of capsule types (run in order)
+#   - each phase is run over a list of capsule types
+#   - all capsule classes must be defined on 'callingGlobals' (related capsule types)
+def __addSchemas(capsuleList: typing.List[CB],
+                 callingGlobals: typing.Dict[str, typing.Any],
+                 codeCache: code_cache.CodeCache):
+  # Immutable schema of each capsule type (columns, relationship descriptors, naming
+  #    conventions, related capsule types, ...) read by all generated methods
+  _capsule_schema.addSchemas(capsuleList = capsuleList,
+                             callingGlobals = callingGlobals)
+def __addInitMethods(capsuleList: typing.List[CB],
+                     callingGlobals: typing.Dict[str, typing.Any],
+                     codeCache: code_cache.CodeCache):
+  # a. __init__ methods
+  _capsule_init.addInitMethods(capsuleList = capsuleList,
+                              callingGlobals = callingGlobals,
+                              codeCache = codeCache)
+def __addDataColumnAttributes(capsuleList: typing.List[CB],
+                              callingGlobals: typing.Dict[str, typing.Any],
+                              codeCache: code_cache.CodeCache):
+  # b. Add getter, setter properties and omit-if-none methods all data columns not
+  #    named 'name' or 'id' (latter with special treatment)
+  _generic_capsule_attr.addDataColumnAttributes(capsuleList = capsuleList,
+                                                callingGlobals = callingGlobals)
+def __addRelationshipAttributes(capsuleList: typing.List[CB],
+                                callingGlobals: typing.Dict[str, typing.Any],
+                                codeCache: code_cache.CodeCache):
+  # c. Add getter, setter properties and omit-if-none methods for relationships (for id, name,
+  #    and the capsule object) defined by foreign key columns
+  #    (the 'one' part of 'one'-to-'many' relationships - 1-to-1 out of scope!)
+  _generic_capsule_attr.addRelationshipAttributes(capsuleList= capsuleList,
+                                                  callingGlobals=callingGlobals)
+def __addRelationshipConsistencyChecks(capsuleList: typing.List[CB],
+                                       callingGlobals: typing.Dict[str, typing.Any],
+                                       codeCache: code_cache.CodeCache):
+  # d. Add getter, setter properties and omit-if-none methods for relationships (for id, name,
+  #    and the capsule object) defined by foreign key columns
+  #    (the 'one' part of 'one'-to-'many' relationships - 1-to-1 out of scope!)
+  _capsule_consistency.addRelationshipConsistencyChecks(capsuleList = capsuleList,
+                                                        callingGlobals = callingGlobals)
+def __addListAttributes(capsuleList: typing.List[CB],
+                        callingGlobals: typing.Dict[str, typing.Any],
+                        codeCache: code_cache.CodeCache):
+  # 3. Add attributes related to relationships defined as list of entities (for access only
+  #    - no manipulations permitted)
+  #    (the 'many' part of 'one'-to-'many' relationships)
+  _generic_capsule_attr.addListAttributes(capsuleList = capsuleList,
+                                          callingGlobals = callingGlobals)
+def __addJsonFunctions(capsuleList: typing.List[CB],
+                       callingGlobals: typing.Dict[str, typing.Any],
+                       codeCache: code_cache.CodeCache):
+  _capsule_json.addJsonFunctions(capsuleList = capsuleList,
+                                 callingGlobals = callingGlobals,
+                                 codeCache = codeCache)
+
+CAPSULE_SETUP_PHASES = [__addSchemas,
+                        __addInitMethods,
+                        __addDataColumnAttributes,
+                        __addRelationshipAttributes,
+                        __addRelationshipConsistencyChecks,
+                        __addListAttributes,
+                        __addJsonFunctions]
+
+def runSetupPhases(capsuleList: typing.List[CB],
+                   callingGlobals: typing.Dict[str, typing.Any],
+                   codeCache: code_cache.CodeCache):
+  for setupPhase in CAPSULE_SETUP_PHASES:
+    setupPhase(capsuleList = capsuleList,
+               callingGlobals = callingGlobals,
+               codeCache = codeCache)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Materializer of the capsule types set up in lazy mode (see _capsule_base.LazyCapsuleType)
+def __getMaterializer(callingGlobals: typing.Dict[str, typing.Any],
+                      codeCache: code_cache.CodeCache) -> typing.Callable[[CB], None]:
+  def materializer(capsuleType: CB):
+    runSetupPhases(capsuleList = [capsuleType],
+                   callingGlobals = callingGlobals,
+                   codeCache = codeCache)
+    codeCache.save()
+  return materializer
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Setup of the capsule classes of all tables of 'declarativeBase'
+#   - codeCacheDir: opt-in directory of the on-disk cache of compiled generated code
+#                   (see utils.code_cache) - 'None' regenerates the code on every start
+#   - lazy: capsule classes are registered as stubs only - each capsule class is set up
+#           on its first instantiation or first access of a generated attribute
+#           (startup cost scales with the capsule types actually used)
 def setupCapsules(declarativeBase: sqla_orm.DeclarativeBase,
                   capsuleList: typing.List[CB],
-                  callingGlobals: typing.Dict[str, typing.Any]):
+                  callingGlobals: typing.Dict[str, typing.Any],
+                  codeCacheDir: str = None,
+                  lazy: bool = False):
+  capsuleMetaclass = _capsule_base.LazyCapsuleType if lazy else type
   for key, table in declarativeBase.metadata.tables.items():
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # a. Capsule class definition:
@@ -20,7 +119,10 @@ def setupCapsules(declarativeBase: sqla_orm.DeclarativeBase,
     capsuleClassName = _capsule_utils.getCapsuleClassName(sqlalchemyTableType = sqlalchemyTableType)
     capsuleBaseClass = _capsule_base.CapsuleBaseWithName if _capsule_utils.hasName(sqlalchemyTableType) else \
               _capsule_base.CapsuleBase
-    capsuleType = types.new_class(capsuleClassName, (capsuleBaseClass,), {})
+    # instances without '__dict__' - the instance attributes are slots
+    instanceSlots = _capsule_schema.getInstanceSlots(sqlalchemyTableType = sqlalchemyTableType)
+    capsuleType = types.new_class(capsuleClassName, (capsuleBaseClass,), {'metaclass': capsuleMetaclass},
+                                  lambda namespace: namespace.update({'__slots__': instanceSlots}))
     callingGlobals[capsuleClassName] = capsuleType
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # b. Setting the attribute of the type of the sqlalchemyTable represented by the capsule
@@ -31,33 +133,26 @@ def setupCapsules(declarativeBase: sqla_orm.DeclarativeBase,
     capsuleList.append(callingGlobals[capsuleClassName])
 
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-  # a. __init__ methods
-  _capsule_init.addInitMethods(capsuleList = capsuleList,
-                              callingGlobals = callingGlobals)
-  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-  # b. Add getter, setter properties and omit-if-none methods all data columns not 
-  #    named 'name' or 'id' (latter with special treatment)
-  _generic_capsule_attr.addDataColumnAttributes(capsuleList = capsuleList,
-                                                callingGlobals = callingGlobals)
+  # Cache of the compiled generated code (keyed by the metadata of the capsule tables)
+  codeCache = code_cache.CodeCache(
+                    cacheDir = codeCacheDir,
+                    cacheName = CAPSULE_CODE_CACHE_NAME,
+                    fingerprint = code_cache.getMetadataFingerprint(
+                          sqlalchemyTableTypes = [capsuleType.sqlalchemyTableType \
+                                                      for capsuleType in capsuleList]),
+                    generatorModules = CAPSULE_CODE_GENERATOR_MODULES) \
+                if codeCacheDir is not None else code_cache.CodeCache()
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-  # c. Add getter, setter properties and omit-if-none methods for relationships (for id, name,
-  #    and the capsule object) defined by foreign key columns 
-  #    (the 'one' part of 'one'-to-'many' relationships - 1-to-1 out of scope!)
-  _generic_capsule_attr.addRelationshipAttributes(capsuleList= capsuleList,
-                                                  callingGlobals=callingGlobals)
+  # Lazy mode: the setup phases run per capsule type once it is used
+  if lazy:
+    materializer = __getMaterializer(callingGlobals = callingGlobals,
+                                     codeCache = codeCache)
+    for capsuleType in capsuleList:
+      capsuleType._materializer = materializer
+    return
   # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-  # d. Add getter, setter properties and omit-if-none methods for relationships (for id, name,
-  #    and the capsule object) defined by foreign key columns 
-  #    (the 'one' part of 'one'-to-'many' relationships - 1-to-1 out of scope!)
-  _capsule_consistency.addRelationshipConsistencyChecks(capsuleList = capsuleList,
-                                                        callingGlobals = callingGlobals)
-  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-  # 3. Add attributes related to relationships defined as list of entities (for access only
-  #    - no manipulations permitted)
-  #    (the 'many' part of 'one'-to-'many' relationships)
-  _generic_capsule_attr.addListAttributes(capsuleList = capsuleList,
-                                          callingGlobals = callingGlobals)
-  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-
-  _capsule_json.addJsonFunctions(capsuleList = capsuleList,
-                                 callingGlobals = callingGlobals)  
\ No newline at end of file
+  # Eager mode: all setup phases run over all capsule types
+  runSetupPhases(capsuleList = capsuleList,
+                 callingGlobals = callingGlobals,
+                 codeCache = codeCache)
+  codeCache.save()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import typing, threading, weakref
+
+import sqlalchemy
+from sqlalchemy import orm as sqlalchemy_orm
+from sqlalchemy.ext import declarative as sqlalchemy_decl
+
+
+NAME_INDEX_SESSION_INFO_KEY = "europy_name_index"
+NAME_ATTR_NAME = "name"
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Session-scoped index of the sqlalchemyTables by (sqlalchemyTableType, name) (opt-in)
+#   - holds the new and the persistent sqlalchemyTables of the session (all objects
+#     identified by name within the session - whether new, dirty or loaded from db)
+#   - a sqlalchemyTableType is indexed from its first name lookup on the session
+#     (seeded from the new objects and the identity map of the session)
+#   - the objects are indexed by their mapped class - the lookup of a type covers
+#     the type and its mapped subclasses (as 'isinstance', polymorphic tables)
+#   - kept in sync by session events (objects added, loaded, deleted, expunged) and
+#     the 'set' and 'refresh' events of the 'name' attribute of the indexed types
+#   - name lookups hit the index first and query the database only on a miss
+#     (see _capsule_base.CapsuleBaseWithName)
+class NameIndex():
+  def __init__(self,
+               session: sqlalchemy_orm.Session) -> None:
+    self.session = session
+    # {<mapped class>: {<name>: WeakSet(<sqlalchemyTable>)}}
+    self._tablesOfNames: typing.Dict[type, typing.Dict[str, weakref.WeakSet]] = {}
+    # {<sqlalchemyTable>: <name>} - the name an object is indexed by
+    self._namesOfTables = weakref.WeakKeyDictionary()
+
+  def isIndexed(self,
+                sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]) -> bool:
+    return sqlalchemyTableType in self._tablesOfNames
+  def _addSqlalchemyTableType(self,
+                              sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]):
+    mappedClasses = [mappedClass for mappedClass in self.__getMappedClasses(sqlalchemyTableType = sqlalchemyTableType) \
+                        if not self.isIndexed(sqlalchemyTableType = mappedClass)]
+    for mappedClass in mappedClasses:
+      _registerAttributeEvents(sqlalchemyTableType = mappedClass)
+      self._tablesOfNames[mappedClass] = {}
+    for sessionObjects in (self.session.new, self.session.identity_map.values()):
+      for sessionObject in sessionObjects:
+        if type(sessionObject) in mappedClasses:
+          self.add(sqlalchemyTable = sessionObject)
+
+  def add(self,
+          sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta,
+          name: str = None):
+    tablesOfNames = self._tablesOfNames.get(type(sqlalchemyTable))
+    if tablesOfNames is None: return # type not indexed
+    if name is None:
+      # read from the state - no load of expired attributes
+      name = sqlalchemy.inspect(sqlalchemyTable).dict.get(NAME_ATTR_NAME)
+    self.remove(sqlalchemyTable = sqlalchemyTable)
+    if name is None: return # indexed once a name is set or refreshed
+    tablesOfNames.setdefault(name, weakref.WeakSet()).add(sqlalchemyTable)
+    self._namesOfTables[sqlalchemyTable] = name
+  def remove(self,
+             sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta):
+    name = self._namesOfTables.pop(sqlalchemyTable, None)
+    if name is None: return
+    tablesOfName = self._tablesOfNames[type(sqlalchemyTable)].get(name)
+    if tablesOfName is None: return
+    tablesOfName.discard(sqlalchemyTable)
+    if len(tablesOfName) == 0:
+      del self._tablesOfNames[type(sqlalchemyTable)][name]
+  def clear(self):
+    # the indexed types are seeded again on their next lookup
+    self._tablesOfNames.clear()
+    self._namesOfTables = weakref.WeakKeyDictionary()
+
+  def __getMappedClasses(self,
+                         sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+                         ) -> typing.List[type]:
+    # the type and its mapped subclasses (as 'isinstance')
+    return [mapper.class_ for mapper in sqlalchemy.inspect(sqlalchemyTableType).self_and_descendants]
+  def getSqlalchemyTablesOfName(self,
+                                sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta],
+                                name: str) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    mappedClasses = self.__getMappedClasses(sqlalchemyTableType = sqlalchemyTableType)
+    if not all(self.isIndexed(sqlalchemyTableType = mappedClass) for mappedClass in mappedClasses):
+      self._addSqlalchemyTableType(sqlalchemyTableType = sqlalchemyTableType)
+    result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
+    for mappedClass in mappedClasses:
+      tablesOfName = self._tablesOfNames[mappedClass].get(name)
+      if tablesOfName is not None:
+        result.extend(tablesOfName)
+    return result
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Attribute events of the indexed sqlalchemyTableTypes (registered once per type -
+#    the events apply to objects of sessions with a name index only)
+_registeredSqlalchemyTableTypes = set()
+_registerLock = threading.Lock()
+
+def _getObjectsNameIndex(sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta) -> NameIndex:
+  session = sqlalchemy_orm.object_session(sqlalchemyTable)
+  if session is None: return None
+  return getNameIndex(session = session)
+
+def _onNameSet(sqlalchemyTable, value, oldValue, initiator):
+  nameIndex = _getObjectsNameIndex(sqlalchemyTable = sqlalchemyTable)
+  if nameIndex is None: return
+  nameIndex.add(sqlalchemyTable = sqlalchemyTable,
+                name = value)
+def _onRefresh(sqlalchemyTable, context, attrs):
+  if attrs is not None and not NAME_ATTR_NAME in attrs: return
+  nameIndex = _getObjectsNameIndex(sqlalchemyTable = sqlalchemyTable)
+  if nameIndex is None: return
+  nameIndex.add(sqlalchemyTable = sqlalchemyTable)
+
+def _registerAttributeEvents(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]):
+  with _registerLock:
+    if sqlalchemyTableType in _registeredSqlalchemyTableTypes: return
+    sqlalchemy.event.listen(getattr(sqlalchemyTableType, NAME_ATTR_NAME), 'set', _onNameSet)
+    sqlalchemy.event.listen(sqlalchemyTableType, 'refresh', _onRefresh)
+    _registeredSqlalchemyTableTypes.add(sqlalchemyTableType)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Session events maintaining the index
+def _onAdded(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  getNameIndex(session = session).add(sqlalchemyTable = sqlalchemyTable)
+def _onRemoved(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  getNameIndex(session = session).remove(sqlalchemyTable = sqlalchemyTable)
+def _onRollback(session: sqlalchemy_orm.Session):
+  # names of persistent objects are expired to their db state
+  getNameIndex(session = session).clear()
+
+_SESSION_EVENTS = [('transient_to_pending', _onAdded),
+                   ('loaded_as_persistent', _onAdded),
+                   ('detached_to_persistent', _onAdded),
+                   ('deleted_to_persistent', _onAdded),
+                   ('pending_to_transient', _onRemoved),
+                   ('persistent_to_deleted', _onRemoved),
+                   ('persistent_to_detached', _onRemoved),
+                   ('after_rollback', _onRollback)]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Activation of the name index on a session
+def getNameIndex(session: sqlalchemy_orm.Session) -> NameIndex:
+  return session.info.get(NAME_INDEX_SESSION_INFO_KEY)
+def hasNameIndex(session: sqlalchemy_orm.Session) -> bool:
+  return getNameIndex(session = session) is not None
+
+def enableNameIndex(session: sqlalchemy_orm.Session) -> NameIndex:
+  nameIndex = getNameIndex(session = session)
+  if nameIndex is not None: return nameIndex
+  nameIndex = NameIndex(session = session)
+  session.info[NAME_INDEX_SESSION_INFO_KEY] = nameIndex
+  for eventName, eventFnc in _SESSION_EVENTS:
+    sqlalchemy.event.listen(session, eventName, eventFnc)
+  return nameIndex
+def disableNameIndex(session: sqlalchemy_orm.Session):
+  if not hasNameIndex(session = session): return
+  for eventName, eventFnc in _SESSION_EVENTS:
+    sqlalchemy.event.remove(session, eventName, eventFnc)
+  del session.info[NAME_INDEX_SESSION_INFO_KEY]
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import typing, threading, weakref
+
+import sqlalchemy
+from sqlalchemy import orm as sqlalchemy_orm
+from sqlalchemy.ext import declarative as sqlalchemy_decl
+
+
+TYPE_INDEX_SESSION_INFO_KEY = "europy_type_index"
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Session-scoped index of the new, the dirty and the persistent sqlalchemyTables by 
+#   mapped class (opt-in)
+#   - replaces the scans of 'session.new', 'session.dirty' and 'session.identity_map' 
+#     per capsule type: the objects of a type are read in O(k) for the k objects of 
+#     the type
+#   - seeded from 'session.new', 'session.dirty' and the identity map when enabled
+#   - new and persistent objects: kept in sync by the session events (added, loaded, 
+#     flushed, deleted, expunged)
+#   - persistent and dirty objects: held weakly (as by the identity map) - objects 
+#     loaded (e.g. streamed) and referenced by the identity map only drop out of the
+#     index once garbage collected
+#   - dirty objects: logged by the attribute events of the mapped classes of the
+#     objects in the session (registered once per class) - the logged objects are
+#     filtered by their state on read (dirty as of 'session.dirty') and re-seeded
+#     after each flush and rollback
+#   - enabled by the controllers on their sessions (see _controller_base.ControllerBase)
+class TypeIndex():
+  def __init__(self,
+               session: sqlalchemy_orm.Session) -> None:
+    self.session = session
+    # {<mapped class>: {<InstanceState>: None}} (insertion ordered sets)
+    #   - new objects are held by the session: strong references
+    #   - persistent and dirty objects: weak references (the state lives as long as
+    #     its object)
+    self._newStates: typing.Dict[type, typing.Dict[sqlalchemy_orm.InstanceState, None]] = {}
+    self._dirtyStates: typing.Dict[type, weakref.WeakKeyDictionary[sqlalchemy_orm.InstanceState, None]] = {}
+    self._persistentStates: typing.Dict[type, weakref.WeakKeyDictionary[sqlalchemy_orm.InstanceState, None]] = {}
+    self.reset()
+
+  def reset(self):
+    self._newStates.clear()
+    self._dirtyStates.clear()
+    self._persistentStates.clear()
+    for mapObject in self.session.identity_map.values():
+      self.addPersistent(sqlalchemyTable = mapObject)
+    for newObject in self.session.new:
+      self.addNew(sqlalchemyTable = newObject)
+    for dirtyObject in self.session.dirty:
+      self.addDirty(sqlalchemyTable = dirtyObject)
+  def resetDirty(self):
+    self._dirtyStates.clear()
+    for dirtyObject in self.session.dirty:
+      self.addDirty(sqlalchemyTable = dirtyObject)
+
+  def addNew(self,
+             sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta):
+    _registerAttributeEvents(sqlalchemyTableType = type(sqlalchemyTable))
+    state = sqlalchemy.inspect(sqlalchemyTable)
+    self._newStates.setdefault(type(sqlalchemyTable), {})[state] = None
+  def removeNew(self,
+                sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta):
+    newStates = self._newStates.get(type(sqlalchemyTable))
+    if newStates is None: return
+    newStates.pop(sqlalchemy.inspect(sqlalchemyTable), None)
+  def addDirty(self,
+               sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta):
+    _registerAttributeEvents(sqlalchemyTableType = type(sqlalchemyTable))
+    state = sqlalchemy.inspect(sqlalchemyTable)
+    self._dirtyStates.setdefault(type(sqlalchemyTable), weakref.WeakKeyDictionary())[state] = None
+  def addPersistent(self,
+                    sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta):
+    _registerAttributeEvents(sqlalchemyTableType = type(sqlalchemyTable))
+    state = sqlalchemy.inspect(sqlalchemyTable)
+    self._persistentStates.setdefault(type(sqlalchemyTable), weakref.WeakKeyDictionary())[state] = None
+  def removePersistent(self,
+                       sqlalchemyTable: sqlalchemy_decl.DeclarativeMeta):
+    persistentStates = self._persistentStates.get(type(sqlalchemyTable))
+    if persistentStates is None: return
+    persistentStates.pop(sqlalchemy.inspect(sqlalchemyTable), None)
+
+  def __getMappedClasses(self,
+                         sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+                         ) -> typing.List[type]:
+    # the type and its mapped subclasses (as 'isinstance')
+    return [mapper.class_ for mapper in sqlalchemy.inspect(sqlalchemyTableType).self_and_descendants]
+  def getNewSqlalchemyTables(self,
+                             sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+                             ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
+    for mappedClass in self.__getMappedClasses(sqlalchemyTableType = sqlalchemyTableType):
+      for state in self._newStates.get(mappedClass, ()):
+        result.append(state.obj())
+    return result
+  def getDirtySqlalchemyTables(self,
+                               sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+                               ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
+    deletedSqlalchemyTables = None
+    for mappedClass in self.__getMappedClasses(sqlalchemyTableType = sqlalchemyTableType):
+      dirtyStates = self._dirtyStates.get(mappedClass)
+      if not dirtyStates: continue
+      if deletedSqlalchemyTables is None:
+        deletedSqlalchemyTables = self.session.deleted
+      for state in list(dirtyStates):
+        sqlalchemyTable = state.obj()
+        if sqlalchemyTable is None or not (state.persistent and state.modified):
+          # flushed, expired or no longer part of the session
+          del dirtyStates[state]
+          continue
+        if sqlalchemyTable in deletedSqlalchemyTables: continue
+        result.append(sqlalchemyTable)
+    return result
+  def getPersistentSqlalchemyTables(self,
+                                    sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]
+                                    ) -> typing.List[sqlalchemy_decl.DeclarativeMeta]:
+    # the objects of the identity map of the type
+    result: typing.List[sqlalchemy_decl.DeclarativeMeta] = []
+    for mappedClass in self.__getMappedClasses(sqlalchemyTableType = sqlalchemyTableType):
+      persistentStates = self._persistentStates.get(mappedClass)
+      if not persistentStates: continue
+      for state in list(persistentStates):
+        sqlalchemyTable = state.obj()
+        if sqlalchemyTable is None:
+          # being garbage collected (the identity map holds weak references only)
+          del persistentStates[state]
+          continue
+        result.append(sqlalchemyTable)
+    return result
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Attribute events of the mapped classes of the objects in sessions with a type index
+#    (registered once per class - the events fire for the objects of all sessions:
+#    objects of sessions without a type index are dismissed by the session id of their 
+#    state, before any lookup of the session)
+_registeredSqlalchemyTableTypes = set()
+_registerLock = threading.Lock()
+# {<session.hash_key>: <session>} of the sessions with a type index
+_indexedSessions = weakref.WeakValueDictionary()
+
+def _onModified(sqlalchemyTable, *args):
+  state = sqlalchemy_orm.attributes.instance_state(sqlalchemyTable)
+  session = _indexedSessions.get(state.session_id)
+  if session is None: return
+  if state.persistent:
+    getTypeIndex(session = session).addDirty(sqlalchemyTable = sqlalchemyTable)
+
+def _registerAttributeEvents(sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]):
+  if sqlalchemyTableType in _registeredSqlalchemyTableTypes: return
+  with _registerLock:
+    if sqlalchemyTableType in _registeredSqlalchemyTableTypes: return
+    mapper = sqlalchemy.inspect(sqlalchemyTableType)
+    for attr in mapper.all_orm_descriptors:
+      if not isinstance(attr, sqlalchemy_orm.InstrumentedAttribute): continue
+      eventNames = ['set', 'modified']
+      if getattr(attr.property, 'uselist', False):
+        eventNames = eventNames + ['append', 'remove', 'bulk_replace']
+      for eventName in eventNames:
+        sqlalchemy.event.listen(attr, eventName, _onModified)
+    _registeredSqlalchemyTableTypes.add(sqlalchemyTableType)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Session events maintaining the index
+def _onAddedNew(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  getTypeIndex(session = session).addNew(sqlalchemyTable = sqlalchemyTable)
+def _onRemovedNew(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  getTypeIndex(session = session).removeNew(sqlalchemyTable = sqlalchemyTable)
+def _onFlushedNew(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  typeIndex = getTypeIndex(session = session)
+  typeIndex.removeNew(sqlalchemyTable = sqlalchemyTable)
+  typeIndex.addPersistent(sqlalchemyTable = sqlalchemyTable)
+def _onAddedPersistent(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  typeIndex = getTypeIndex(session = session)
+  typeIndex.addPersistent(sqlalchemyTable = sqlalchemyTable)
+  # (re-)attached objects might carry changes
+  if sqlalchemy.inspect(sqlalchemyTable).modified:
+    typeIndex.addDirty(sqlalchemyTable = sqlalchemyTable)
+def _onLoaded(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  getTypeIndex(session = session).addPersistent(sqlalchemyTable = sqlalchemyTable)
+def _onRemovedPersistent(session: sqlalchemy_orm.Session, sqlalchemyTable):
+  getTypeIndex(session = session).removePersistent(sqlalchemyTable = sqlalchemyTable)
+def _onFlushed(session: sqlalchemy_orm.Session, flushContext):
+  getTypeIndex(session = session).resetDirty()
+def _onRollback(session: sqlalchemy_orm.Session):
+  getTypeIndex(session = session).reset()
+
+_SESSION_EVENTS = [('transient_to_pending', _onAddedNew),
+                   ('pending_to_persistent', _onFlushedNew),
+                   ('pending_to_transient', _onRemovedNew),
+                   ('detached_to_persistent', _onAddedPersistent),
+                   ('deleted_to_persistent', _onAddedPersistent),
+                   ('loaded_as_persistent', _onLoaded),
+                   ('persistent_to_deleted', _onRemovedPersistent),
+                   ('persistent_to_detached', _onRemovedPersistent),
+                   ('persistent_to_transient', _onRemovedPersistent),
+                   ('after_flush_postexec', _onFlushed),
+                   ('after_rollback', _onRollback)]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Activation of the type index on a session
+def getTypeIndex(session: sqlalchemy_orm.Session) -> TypeIndex:
+  return session.info.get(TYPE_INDEX_SESSION_INFO_KEY)
+def hasTypeIndex(session: sqlalchemy_orm.Session) -> bool:
+  return getTypeIndex(session = session) is not None
+
+def enableTypeIndex(session: sqlalchemy_orm.Session) -> TypeIndex:
+  typeIndex = getTypeIndex(session = session)
+  if typeIndex is not None: return typeIndex
+  typeIndex = TypeIndex(session = session)
+  session.info[TYPE_INDEX_SESSION_INFO_KEY] = typeIndex
+  _indexedSessions[session.hash_key] = session
+  for eventName, eventFnc in _SESSION_EVENTS:
+    sqlalchemy.event.listen(session, eventName, eventFnc)
+  return typeIndex
+def disableTypeIndex(session: sqlalchemy_orm.Session):
+  if not hasTypeIndex(session = session): return
+  for eventName, eventFnc in _SESSION_EVENTS:
+    sqlalchemy.event.remove(session, eventName, eventFnc)
+  _indexedSessions.pop(session.hash_key, None)
+  del session.info[TYPE_INDEX_SESSION_INFO_KEY]
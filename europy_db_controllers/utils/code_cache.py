@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import typing, types, os, sys, marshal, hashlib, tempfile, __future__
+import importlib.util, importlib.metadata
+from sqlalchemy.ext import declarative as sqlalchemy_decl
+from sqlalchemy.ext import hybrid as sqlalchemy_hyb
+
+
+PACKAGE_NAME = "europy_db_controllers"
+CODE_CACHE_FILE_SUFFIX = ".codecache"
+# generated code uses postponed evaluation of annotations (as the generating modules do)
+COMPILE_FLAGS = __future__.annotations.compiler_flag
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Version information entering the cache key
+#   - the package version as installed ('unknown' if run from a plain source tree)
+#   - the interpreter's bytecode magic number (marshal format is version specific)
+def getPackageVersion() -> str:
+  try:
+    return importlib.metadata.version(PACKAGE_NAME)
+  except importlib.metadata.PackageNotFoundError:
+    return "unknown"
+
+def getGeneratorModuleStamp(generatorModules: typing.List[types.ModuleType]) -> str:
+  # changes to the code generating modules invalidate the cache even if the
+  #    package version was not bumped (e.g. editable installs)
+  stamps = []
+  for module in generatorModules:
+    moduleStat = os.stat(module.__file__)
+    stamps.append(f"{module.__name__}:{moduleStat.st_mtime_ns}:{moduleStat.st_size}")
+  return "|".join(stamps)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Fingerprint of the metadata the generated code depends on
+def getSqlalchemyTableTypeFingerprint(
+                sqlalchemyTableType: typing.Type[sqlalchemy_decl.DeclarativeMeta]) -> str:
+  table = sqlalchemyTableType.__table__
+  items = [f"table:{table.name}:{sqlalchemyTableType.__name__}"]
+  for column in table.columns:
+    foreignKeys = ",".join(sorted(fk.target_fullname for fk in column.foreign_keys))
+    items.append(f"column:{column.name}:{type(column.type).__module__}." + \
+                 f"{type(column.type).__name__}:{column.primary_key}:{foreignKeys}")
+  for relationship in sqlalchemyTableType.__mapper__.relationships:
+    items.append(f"relationship:{relationship.key}:{relationship.mapper.class_.__name__}:" + \
+                 f"{relationship.uselist}")
+  for attrName in ('_changeTrackFields', '_exclude_from_json', '_display_lists', '_sorted_by'):
+    items.append(f"{attrName}:{getattr(sqlalchemyTableType, attrName, None)}")
+  for itemName, objType in vars(sqlalchemyTableType).items():
+    if isinstance(objType, sqlalchemy_hyb.hybrid_property):
+      items.append(f"hybrid:{itemName}:{objType.fset is not None}")
+  return "\n".join(items)
+
+def getMetadataFingerprint(
+                sqlalchemyTableTypes: typing.List[typing.Type[sqlalchemy_decl.DeclarativeMeta]],
+                furtherKeyItems: typing.List[str] = None) -> str:
+  items = [getSqlalchemyTableTypeFingerprint(sqlalchemyTableType = sqlalchemyTableType) \
+              for sqlalchemyTableType in sorted(sqlalchemyTableTypes, key = lambda x: x.__name__)]
+  if furtherKeyItems is not None:
+    items.extend(furtherKeyItems)
+  return "\n".join(items)
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Cache of compiled code objects of generated functions
+#   - 'cacheDir' None: no persistence, code is just compiled (default behaviour)
+#   - one file per cache name and key hash:
+#         <cacheDir>/<cacheName>-<sha256 of key>.codecache
+#   - the file holds a marshalled dict {<function name>: <code object>}
+#   - corrupted or incompatible files are ignored and overwritten
+class CodeCache():
+  def __init__(self,
+               cacheDir: str = None,
+               cacheName: str = "",
+               fingerprint: str = "",
+               generatorModules: typing.List[types.ModuleType] = None) -> None:
+    self.cacheDir: str = cacheDir
+    self.cacheName: str = cacheName
+    self._codeObjects: typing.Dict[str, types.CodeType] = {}
+    self._isModified: bool = False
+    self.filePath: str = None
+    if cacheDir is None: return
+    keyItems = [PACKAGE_NAME,
+                getPackageVersion(),
+                importlib.util.MAGIC_NUMBER.hex(),
+                getGeneratorModuleStamp(generatorModules = generatorModules or []),
+                fingerprint]
+    keyHash = hashlib.sha256("\n".join(keyItems).encode("utf-8")).hexdigest()
+    self.filePath = os.path.join(cacheDir, f"{cacheName}-{keyHash}{CODE_CACHE_FILE_SUFFIX}")
+    self._load()
+
+  @property
+  def isPersistent(self) -> bool:
+    return self.filePath is not None
+
+  def _load(self) -> None:
+    try:
+      with open(self.filePath, "rb") as cacheFile:
+        codeObjects = marshal.load(cacheFile)
+    except (OSError, EOFError, ValueError, TypeError):
+      return
+    if not isinstance(codeObjects, dict): return
+    self._codeObjects = {fncName: codeObject for fncName, codeObject in codeObjects.items() \
+                            if isinstance(fncName, str) and isinstance(codeObject, types.CodeType)}
+
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Returns the code object defining the function 'fncName'
+  #   - 'getSourceCode' is only called if the code object is not cached
+  def getCode(self,
+              fncName: str,
+              getSourceCode: typing.Callable[[], str]) -> types.CodeType:
+    codeObject = self._codeObjects.get(fncName)
+    if codeObject is None:
+      codeObject = compile(getSourceCode(), f"<{self.cacheName}:{fncName}>", "exec",
+                           flags = COMPILE_FLAGS, dont_inherit = True)
+      self._codeObjects[fncName] = codeObject
+      self._isModified = True
+    return codeObject
+
+  def execCode(self,
+               fncName: str,
+               getSourceCode: typing.Callable[[], str],
+               namespace: typing.Dict[str, any]) -> typing.Callable:
+    exec(self.getCode(fncName = fncName, getSourceCode = getSourceCode), namespace)
+    return namespace[fncName]
+
+  # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+  # Writes the cache file (atomic replace -> safe with concurrently starting workers)
+  def save(self) -> None:
+    if not (self.isPersistent and self._isModified): return
+    try:
+      os.makedirs(self.cacheDir, exist_ok = True)
+      fileDescriptor, tempPath = tempfile.mkstemp(dir = self.cacheDir, suffix = ".tmp")
+      try:
+        with os.fdopen(fileDescriptor, "wb") as tempFile:
+          marshal.dump(self._codeObjects, tempFile)
+        os.chmod(tempPath, 0o644) # readable by workers running as other users
+        os.replace(tempPath, self.filePath)
+      except BaseException:
+        os.unlink(tempPath)
+        raise
+    except OSError as exc:
+      # the cache is an optimisation only - a read-only or full disk must not break the setup
+      print(f"[CodeCache] Could not write code cache '{self.filePath}': {exc}", file = sys.stderr)
+      return
+    self._isModified = False
@@ -1,7 +1,9 @@
-import pandas as pd
-import json, os, openpyxl
+import json, os
+
+# pandas and openpyxl are imported on the first call of the Excel I/O functions
 
 def excel_to_json_dict(excel_file_path, sheet_name=0):
+    import pandas as pd
     # Read the Excel file
     df = pd.read_excel(excel_file_path, sheet_name=sheet_name, header=0, index_col=0)
     
@@ -21,6 +23,8 @@ def excel_to_json_dict(excel_file_path, sheet_name=0):
     return result
 
 def json_to_excel(json_file_path, output_excel_path, sheet_name='Sheet1'):
+    import pandas as pd
+    import openpyxl
     # Read the JSON file
     with open(json_file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -0,0 +1,94 @@
+import sys, os, uuid, datetime, typing
+
+import pytest
+import sqlalchemy as sqla
+from sqlalchemy import orm as sqla_orm
+from sqlalchemy.dialects import postgresql as sqla_pg
+
+# run from a source checkout without 'pip install -e .'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from europy_db_controllers import controller, _controller_base
+from europy_db_controllers.entity_capsules import capsule_main
+
+######################################################################################
+# Test schema: clients holding portfolios holding transactions
+######################################################################################
+class TestBase(sqla_orm.DeclarativeBase):
+  pass
+
+class _TableMixin:
+  _changeTrackFields = ['created_at', 'modified_at']
+  _exclude_from_json = []
+  _display_lists = []
+  _sorted_by = ['name']
+  id = sqla.Column(sqla_pg.UUID(as_uuid = True), primary_key = True, default = uuid.uuid4)
+  created_at = sqla.Column(sqla.DateTime, default = datetime.datetime.now)
+  modified_at = sqla.Column(sqla.DateTime, default = datetime.datetime.now)
+
+class ClientTable(_TableMixin, TestBase):
+  __tablename__ = 'client'
+  _exclude_from_json = ['portfolios']
+  _display_lists = ['portfolios']
+  name = sqla.Column(sqla.String, unique = True)
+  portfolios = sqla_orm.relationship('PortfolioTable', back_populates = 'client')
+
+class PortfolioTable(_TableMixin, TestBase):
+  __tablename__ = 'portfolio'
+  _exclude_from_json = ['client', 'transactions']
+  _display_lists = ['transactions']
+  name = sqla.Column(sqla.String, unique = True)
+  client_id = sqla.Column(sqla_pg.UUID(as_uuid = True), sqla.ForeignKey('client.id'))
+  client = sqla_orm.relationship('ClientTable', back_populates = 'portfolios')
+  transactions = sqla_orm.relationship('TransactionTable', back_populates = 'portfolio')
+
+class TransactionTable(_TableMixin, TestBase):
+  __tablename__ = 'transaction'
+  _exclude_from_json = ['portfolio']
+  _sorted_by = ['amount']
+  amount = sqla.Column(sqla.FLOAT)
+  portfolio_id = sqla.Column(sqla_pg.UUID(as_uuid = True), sqla.ForeignKey('portfolio.id'))
+  portfolio = sqla_orm.relationship('PortfolioTable', back_populates = 'transactions')
+
+@pytest.fixture(scope = "session")
+def capsules() -> typing.Dict[str, typing.Any]:
+  # {<capsule type name>: <capsule type>} - e.g. 'PortfolioCapsule'
+  callingGlobals = {'ClientTable': ClientTable,
+                    'PortfolioTable': PortfolioTable,
+                    'TransactionTable': TransactionTable}
+  capsule_main.setupCapsules(declarativeBase = TestBase,
+                             capsuleList = [],
+                             callingGlobals = callingGlobals)
+  return callingGlobals
+
+# Controllers: 'admin' (clients and portfolios) and 'data' (transactions)
+@pytest.fixture(scope = "session")
+def controllerType(capsules) -> type:
+  class KeyEnum(_controller_base.BaseControllerKeyEnum):
+    ADMIN = "admin"
+    DATA = "data"
+  class Admin(_controller_base.ControllerBase):
+    _key = "admin"
+    _content = [capsules['ClientCapsule'], capsules['PortfolioCapsule']]
+  class Data(_controller_base.ControllerBase):
+    _key = "data"
+    _content = [capsules['TransactionCapsule']]
+  class Controller(_controller_base.ControllerBase):
+    _key = ""
+    _subControllerTypes = [Admin, Data]
+    def __init__(self, session):
+      super().__init__(session)
+      self.admin = Admin(session)
+      self.data = Data(session)
+  callingGlobals = dict(capsules, Admin = Admin, Data = Data, Controller = Controller)
+  return controller.setupControllerClass(callingGlobals = callingGlobals,
+                                         controllerTypeNames = ["Admin", "Data", "Controller"],
+                                         controllerTypeEnumType = KeyEnum)
+
+@pytest.fixture
+def session(capsules) -> typing.Iterator[sqla_orm.Session]:
+  engine = sqla.create_engine('sqlite://')
+  TestBase.metadata.create_all(engine)
+  with sqla_orm.Session(engine) as result:
+    yield result
+  engine.dispose()
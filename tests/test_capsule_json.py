@@ -0,0 +1,52 @@
+import uuid, datetime
+
+import sqlalchemy as sqla
+from sqlalchemy import orm as sqla_orm
+from sqlalchemy.dialects import postgresql as sqla_pg
+
+from europy_db_controllers.entity_capsules import capsule_main, _capsule_json
+
+
+######################################################################################
+# Densely connected schema: every table refers to every other table
+######################################################################################
+class DenseBase(sqla_orm.DeclarativeBase):
+  pass
+
+DENSE_TABLE_NAMES = ['node_a', 'node_b', 'node_c', 'node_d', 'node_e', 'node_f', 'node_g']
+
+def _getDenseTableType(tableName: str) -> type:
+  namespace = {'__tablename__': tableName,
+               '_changeTrackFields': [],
+               '_exclude_from_json': [],
+               '_display_lists': [],
+               '_sorted_by': ['name'],
+               'id': sqla.Column(sqla_pg.UUID(as_uuid = True), primary_key = True, default = uuid.uuid4),
+               'name': sqla.Column(sqla.String, unique = True)}
+  for relatedTableName in DENSE_TABLE_NAMES:
+    if relatedTableName == tableName: continue
+    relatedTableTypeName = _getDenseTableTypeName(tableName = relatedTableName)
+    namespace[f"{relatedTableName}_id"] = sqla.Column(sqla_pg.UUID(as_uuid = True), 
+                                                      sqla.ForeignKey(f"{relatedTableName}.id"))
+    namespace[relatedTableName] = sqla_orm.relationship(relatedTableTypeName,
+                                                        foreign_keys = f"{_getDenseTableTypeName(tableName)}.{relatedTableName}_id")
+  return type(_getDenseTableTypeName(tableName = tableName), (DenseBase,), namespace)
+
+def _getDenseTableTypeName(tableName: str) -> str:
+  return "".join(part.capitalize() for part in tableName.split('_')) + "Table"
+
+
+def test_loaderOptionsExpandEachCapsuleTypeOnce():
+  callingGlobals = {}
+  for tableName in DENSE_TABLE_NAMES:
+    tableType = _getDenseTableType(tableName = tableName)
+    callingGlobals[tableType.__name__] = tableType
+  capsule_main.setupCapsules(declarativeBase = DenseBase,
+                             capsuleList = [],
+                             callingGlobals = callingGlobals)
+  loaderOptions = _capsule_json.getToDictLoaderOptions(capsuleType = callingGlobals['NodeACapsule'])
+  # one loaded path per relationship of the schema (not per path through the schema)
+  loadedRelationships = [loadElement.path[-2] for loaderOption in loaderOptions
+                                              for loadElement in loaderOption.context]
+  assert len(loadedRelationships) == len(set(loadedRelationships)) == \
+         len(DENSE_TABLE_NAMES) * (len(DENSE_TABLE_NAMES) - 1)
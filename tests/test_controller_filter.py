@@ -0,0 +1,117 @@
+import pytest
+import sqlalchemy as sqla
+
+from europy_db_controllers import _controller_base, _controller_filter
+
+from conftest import ClientTable, TransactionTable
+
+
+@pytest.fixture
+def controller(controllerType, session):
+  # c1: p1 (1.0, 2.0), p2 (3.0) / c2: p3 (4.0, None)
+  result = controllerType(session)
+  clients = {name: result.admin.client(name = name) for name in ('c1', 'c2')}
+  portfolios = {name: result.admin.portfolio(name = name, client = clients[clientName]) \
+                  for name, clientName in (('p1', 'c1'), ('p2', 'c1'), ('p3', 'c2'))}
+  for amount, portfolioName in ((1.0, 'p1'), (2.0, 'p1'), (3.0, 'p2'), (4.0, 'p3'), (None, 'p3')):
+    result.data.transaction(amount = amount, portfolio = portfolios[portfolioName])
+  session.commit()
+  return result
+
+SCOPES = [_controller_base.ControllerDataScopes.STORED_ON_DB, 
+          _controller_base.ControllerDataScopes.ALL]
+
+@pytest.mark.parametrize("scope", SCOPES)
+def test_dottedPathsFollowManyToOneHops(controller, scope):
+  transactions = controller.data.transactions(scope = scope,
+                                              filterConditions = {'portfolio.client.name': 'c1'})
+  assert sorted(transaction.amount for transaction in transactions) == [1.0, 2.0, 3.0]
+  assert controller.data.lenOfTransactions(scope = scope,
+                                           filterConditions = {'portfolio.client.name': 'c1',
+                                                               'portfolio.name': 'p1'}) == 2
+
+@pytest.mark.parametrize("scope", SCOPES)
+def test_collectionHopsDoNotMultiplyRows(controller, scope):
+  filterConditions = {'portfolios.transactions.amount': 1.0}
+  assert [client.name for client in controller.admin.clients(scope = scope, 
+                                                             filterConditions = filterConditions)] == ['c1']
+  # both portfolios of 'c1' match
+  filterConditions = {'portfolios.client.name': 'c1'}
+  assert [client.name for client in controller.admin.clients(scope = scope, 
+                                                             filterConditions = filterConditions)] == ['c1']
+  assert controller.admin.lenOfClients(scope = scope, filterConditions = filterConditions) == 1
+
+def test_newObjectsAreFilteredAlongTheirRelationships(controller):
+  portfolio = controller.admin.portfolio(name = 'p4', client = controller.admin.client(name = 'c3'))
+  controller.data.transaction(amount = 5.0, portfolio = portfolio)
+  transactions = controller.data.transactions(scope = _controller_base.ControllerDataScopes.NEW_AND_DIRTY,
+                                              filterConditions = {'portfolio.client.name': 'c3'})
+  assert [transaction.amount for transaction in transactions] == [5.0]
+
+def test_sqlOfFilterPaths():
+  dbQuery = _controller_filter.addDbFilterConditions(
+                  sqlalchemyTableType = TransactionTable,
+                  dbQuery = sqla.select(TransactionTable),
+                  filterConditions = {'portfolio.client.name': 'c1', 'portfolio.name': 'p1'})
+  sql = str(dbQuery)
+  # the prefix shared by both paths is joined once
+  assert sql.count("JOIN portfolio") == 1 and sql.count("JOIN client") == 1
+  assert not "EXISTS" in sql
+  dbQuery = _controller_filter.addDbFilterConditions(
+                  sqlalchemyTableType = ClientTable,
+                  dbQuery = sqla.select(ClientTable),
+                  filterConditions = {'portfolios.name': 'p1'})
+  sql = str(dbQuery)
+  assert "EXISTS" in sql and not "JOIN" in sql
+
+def test_unknownFilterPathRaises(controller):
+  with pytest.raises(AttributeError, match = "Cannot find relationship 'owner'"):
+    list(controller.data.transactions(scope = _controller_base.ControllerDataScopes.ALL,
+                                      filterConditions = {'portfolio.owner.name': 'c1'}))
+  with pytest.raises(AttributeError, match = "Cannot find attribute 'title'"):
+    list(controller.data.transactions(scope = _controller_base.ControllerDataScopes.STORED_ON_DB,
+                                      filterConditions = {'portfolio.title': 'p1'}))
+
+OPERATOR_CASES = [({'amount': {'>=': 2.0, '<': 4.0}}, [2.0, 3.0]),
+                  ({'amount': {'in': [1.0, 4.0]}}, [1.0, 4.0]),
+                  ({'amount': {'not in': [1.0]}}, [2.0, 3.0, 4.0]),
+                  ({'amount': {'between': [2.0, 3.0]}}, [2.0, 3.0]),
+                  ({'amount': {'!=': 1.0}}, [2.0, 3.0, 4.0]),
+                  ({'amount': {'!=': None}}, [1.0, 2.0, 3.0, 4.0]),
+                  ({'amount': {'is null': True}}, [None]),
+                  ({'amount': None}, [None]),
+                  ({'portfolio.name': {'like': 'p_'}, 'amount': {'>': 2.0}}, [3.0, 4.0]),
+                  ({'portfolio.client.name': {'startswith': 'c2'}}, [4.0, None])]
+
+@pytest.mark.parametrize("scope", SCOPES)
+@pytest.mark.parametrize("filterConditions, amounts", OPERATOR_CASES)
+def test_filterOperators(controller, scope, filterConditions, amounts):
+  # same (sql) semantics on the db and on session objects - 'None' only matches '==' / 'is null'
+  transactions = controller.data.transactions(scope = scope, 
+                                              filterConditions = filterConditions,
+                                              sortedBy = None)
+  assert sorted((transaction.amount for transaction in transactions), 
+                key = lambda amount: (amount is None, amount)) == amounts
+  assert controller.data.lenOfTransactions(scope = scope, filterConditions = filterConditions) == len(amounts)
+
+@pytest.mark.parametrize("scope", SCOPES)
+def test_likeWildcardsAreLiteralInStartswith(controller, scope):
+  controller.admin.client(name = 'c%')
+  controller.session.commit()
+  assert [client.name for client in controller.admin.clients(scope = scope, 
+                                                             filterConditions = {'name': {'startswith': 'c%'}})] == ['c%']
+  assert len(list(controller.admin.clients(scope = scope, 
+                                           filterConditions = {'name': {'like': 'c%'}}))) == 3
+
+def test_invalidOperatorSpecsRaise(controller):
+  with pytest.raises(ValueError, match = r"Unknown filter operators\] \['gte'\]"):
+    controller.data.lenOfTransactions(scope = _controller_base.ControllerDataScopes.ALL,
+                                      filterConditions = {'amount': {'>=': 1.0, 'gte': 2.0}})
+  with pytest.raises(ValueError, match = "Two bounds"):
+    controller.data.lenOfTransactions(scope = _controller_base.ControllerDataScopes.ALL,
+                                      filterConditions = {'amount': {'between': [1.0]}})
+
+def test_dictsWithoutOperatorsAreValues():
+  assert not _controller_filter.isFilterOperatorSpec({'currency': 'EUR'})
+  assert not _controller_filter.isFilterOperatorSpec({})
+  assert _controller_filter.FilterPredicate(filterValue = {'currency': 'EUR'}).evaluate(value = {'currency': 'EUR'})
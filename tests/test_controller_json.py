@@ -0,0 +1,87 @@
+import uuid, datetime
+
+import pytest
+import sqlalchemy as sqla
+from sqlalchemy import orm as sqla_orm
+from sqlalchemy.dialects import postgresql as sqla_pg
+
+from europy_db_controllers import controller, _controller_base
+from europy_db_controllers.entity_capsules import capsule_main
+
+######################################################################################
+# Schema of two content types with a relationship of the same name ('counterparty')
+#   referring to different tables
+######################################################################################
+class CounterpartyBase(sqla_orm.DeclarativeBase):
+  pass
+
+class _TableMixin:
+  _changeTrackFields = ['created_at', 'modified_at']
+  _exclude_from_json = []
+  _display_lists = []
+  _sorted_by = ['name']
+  id = sqla.Column(sqla_pg.UUID(as_uuid = True), primary_key = True, default = uuid.uuid4)
+  created_at = sqla.Column(sqla.DateTime, default = datetime.datetime.now)
+  modified_at = sqla.Column(sqla.DateTime, default = datetime.datetime.now)
+  name = sqla.Column(sqla.String, unique = True)
+
+class DeskTable(_TableMixin, CounterpartyBase):
+  __tablename__ = 'desk'
+
+class BrokerTable(_TableMixin, CounterpartyBase):
+  __tablename__ = 'broker'
+
+class TradeTable(_TableMixin, CounterpartyBase):
+  __tablename__ = 'trade'
+  _exclude_from_json = ['counterparty']
+  counterparty_id = sqla.Column(sqla_pg.UUID(as_uuid = True), sqla.ForeignKey('desk.id'))
+  counterparty = sqla_orm.relationship('DeskTable')
+
+class OrderTable(_TableMixin, CounterpartyBase):
+  __tablename__ = 'order'
+  _exclude_from_json = ['counterparty']
+  counterparty_id = sqla.Column(sqla_pg.UUID(as_uuid = True), sqla.ForeignKey('broker.id'))
+  counterparty = sqla_orm.relationship('BrokerTable')
+
+@pytest.fixture(scope = "module")
+def counterpartyGlobals():
+  callingGlobals = {tableType.__name__: tableType \
+                      for tableType in (DeskTable, BrokerTable, TradeTable, OrderTable)}
+  capsule_main.setupCapsules(declarativeBase = CounterpartyBase,
+                             capsuleList = [],
+                             callingGlobals = callingGlobals)
+  class KeyEnum(_controller_base.BaseControllerKeyEnum):
+    BOOK = "book"
+  class Book(_controller_base.ControllerBase):
+    _key = "book"
+    _content = [callingGlobals['TradeCapsule'], callingGlobals['OrderCapsule']]
+  class Controller(_controller_base.ControllerBase):
+    _key = ""
+    _subControllerTypes = [Book]
+    def __init__(self, session):
+      super().__init__(session)
+      self.book = Book(session)
+  callingGlobals['Book'] = Book
+  callingGlobals['Controller'] = Controller
+  controller.setupControllerClass(callingGlobals = callingGlobals,
+                                  controllerTypeNames = ["Book", "Controller"],
+                                  controllerTypeEnumType = KeyEnum)
+  return callingGlobals
+
+def test_fromDictResolvesSameRelationshipNameOfContentTypes(counterpartyGlobals):
+  engine = sqla.create_engine('sqlite://')
+  CounterpartyBase.metadata.create_all(engine)
+  with sqla_orm.Session(engine) as session:
+    session.add_all([DeskTable(name = 'x'), BrokerTable(name = 'x')])
+    session.commit()
+    controllerDict = {'book': {'trade': {0: {'id': None, 'name': 't1', 'counterparty_id': None, 'counterparty_name': 'x'}},
+                      'trade_delete': {},
+                      'order': {0: {'id': None, 'name': 'o1', 'counterparty_id': None, 'counterparty_name': 'x'}},
+                      'order_delete': {}}}
+    counterpartyGlobals['Controller']._controllerDataFromDict(session = session, controllerDict = controllerDict)
+    session.commit()
+    trade = session.scalars(sqla.select(TradeTable)).one()
+    order = session.scalars(sqla.select(OrderTable)).one()
+    assert type(trade.counterparty) is DeskTable
+    assert type(order.counterparty) is BrokerTable
+  engine.dispose()
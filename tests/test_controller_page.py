@@ -0,0 +1,69 @@
+import uuid, datetime, decimal
+
+import pytest
+
+from europy_db_controllers import _controller_base, _controller_utils
+
+from conftest import PortfolioTable, TransactionTable
+
+
+@pytest.fixture
+def controller(controllerType, session):
+  # runs of equal amounts (and of 'None' amounts) spanning the page boundaries
+  portfolios = [PortfolioTable(name = 'p1'), PortfolioTable(name = 'p2')]
+  session.add_all(portfolios)
+  session.add_all([TransactionTable(amount = [None, 1.0, 2.0, 2.0, 3.0][i % 5], 
+                                    portfolio = portfolios[i % 2]) for i in range(23)])
+  session.commit()
+  return controllerType(session)
+
+def _getAllPages(controller, pageSize, **kwargs):
+  result = []
+  cursor = None
+  while True:
+    page, cursor = controller.data.pageOfTransactions(pageSize = pageSize, cursor = cursor, **kwargs)
+    assert len(page) <= pageSize
+    result.extend(page)
+    if cursor is None: return result
+
+@pytest.mark.parametrize("pageSize", [1, 3, 4, 23, 50])
+@pytest.mark.parametrize("filterConditions", [None, {'portfolio.name': 'p1'}])
+def test_pagesCoverSortOrderAcrossTiesAndNone(controller, pageSize, filterConditions):
+  transactions = _getAllPages(controller = controller, 
+                              pageSize = pageSize, 
+                              sortedBy = 'amount', 
+                              filterConditions = filterConditions)
+  expected = sorted(controller.data.transactions(scope = _controller_base.ControllerDataScopes.STORED_ON_DB,
+                                                 filterConditions = filterConditions,
+                                                 sortedBy = None),
+                    key = lambda transaction: (transaction.amount is None, transaction.amount or 0.0, transaction.id))
+  assert [transaction.id for transaction in transactions] == [transaction.id for transaction in expected]
+
+def test_lastPageHasNoCursor(controller):
+  page, cursor = controller.data.pageOfTransactions(pageSize = 23)
+  assert len(page) == 23 and cursor is None
+  page, cursor = controller.data.pageOfTransactions(pageSize = 22)
+  page, cursor = controller.data.pageOfTransactions(pageSize = 22, cursor = cursor)
+  assert len(page) == 1 and cursor is None
+
+@pytest.mark.parametrize("sortValue", [None, True, 7, 1.5, "x", decimal.Decimal("1.10"), uuid.uuid4(),
+                                       datetime.datetime(2024, 1, 2, 3, 4, 5), datetime.date(2024, 1, 2),
+                                       datetime.time(3, 4, 5)])
+def test_cursorRoundTrip(sortValue):
+  sortId = uuid.uuid4()
+  cursor = _controller_utils.encodePageCursor(sortAttributeNames = ['amount'],
+                                              sortValues = [sortValue, sortId])
+  sortValues = _controller_utils.decodePageCursor(cursor = cursor, sortAttributeNames = ['amount'])
+  assert sortValues == [sortValue, sortId]
+  assert [type(value) for value in sortValues] == [type(sortValue), uuid.UUID]
+
+def test_invalidCursorsRaise(controller):
+  with pytest.raises(TypeError, match = "not supported as sort values"):
+    _controller_utils.encodePageCursor(sortAttributeNames = ['amount'], sortValues = [object(), uuid.uuid4()])
+  with pytest.raises(ValueError, match = "Invalid cursor"):
+    controller.data.pageOfTransactions(pageSize = 3, cursor = 'abc', sortedBy = 'amount')
+  _, cursor = controller.data.pageOfTransactions(pageSize = 3, sortedBy = 'amount')
+  with pytest.raises(ValueError, match = "sort order"):
+    controller.data.pageOfTransactions(pageSize = 3, cursor = cursor, sortedBy = 'id')
+  with pytest.raises(ValueError, match = "Page size"):
+    controller.data.pageOfTransactions(pageSize = 0)
@@ -0,0 +1,97 @@
+import uuid
+
+import pytest
+import sqlalchemy as sqla
+
+from europy_db_controllers.entity_capsules import capsule_deferred_consistency
+
+from conftest import PortfolioTable
+
+
+def test_bulkConstructionReportsIdNameMismatch(capsules, session):
+  ClientCapsule = capsules['ClientCapsule']
+  PortfolioCapsule = capsules['PortfolioCapsule']
+  ClientCapsule(session = session, name = 'c1').addToSession()
+  clientTwo = ClientCapsule(session = session, name = 'c2')
+  clientTwo.addToSession()
+  session.commit()
+  clientTwoId = clientTwo.id
+  session.expunge_all()
+  with pytest.raises(capsule_deferred_consistency.ConsistencyViolationsError) as excInfo:
+    with capsule_deferred_consistency.bulkConstruction(session = session):
+      PortfolioCapsule(session = session, name = 'x3', client_name = 'c1', client_id = clientTwoId)
+  assert len(excInfo.value.violations) == 1
+  assert "_client_name" in excInfo.value.violations[0]
+
+def test_bulkConstructionSourcesRelationships(capsules, session):
+  ClientCapsule = capsules['ClientCapsule']
+  PortfolioCapsule = capsules['PortfolioCapsule']
+  client = ClientCapsule(session = session, name = 'c1')
+  client.addToSession()
+  session.commit()
+  clientId = client.id
+  session.expunge_all()
+  with capsule_deferred_consistency.bulkConstruction(session = session):
+    byName = PortfolioCapsule(session = session, name = 'p1', client_name = 'c1')
+    byId = PortfolioCapsule(session = session, name = 'p2', client_id = clientId)
+  assert byName.client_id == clientId
+  assert byId.client_name == 'c1'
+
+def getBadPortfolioDict(capsules, session) -> dict:
+  # 'client_name' of a client neither on the db nor in the session
+  capsules['ClientCapsule'](session = session, name = 'c1').addToSession()
+  session.commit()
+  return {'admin': {'client': {}, 'client_delete': {},
+                    'portfolio': {0: {'id': None, 'name': 'p1', 'client_id': None, 'client_name': 'c1'},
+                                  1: {'id': None, 'name': 'p2', 'client_id': None, 'client_name': 'nope'}},
+                    'portfolio_delete': {}}}
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_fromDictBadUploadClosesSession(capsules, controllerType, session, bulk):
+  controllerDict = getBadPortfolioDict(capsules = capsules, session = session)
+  with pytest.raises(Exception, match = "Badly specified relationship name") as excInfo:
+    controllerType._controllerDataFromDict(session = session, controllerDict = controllerDict, bulk = bulk)
+  assert not isinstance(excInfo.value, capsule_deferred_consistency.ConsistencyViolationsError)
+  assert len(session.identity_map) == 0 and len(session.new) == 0
+  assert not capsule_deferred_consistency.hasDeferredConsistency(session = session)
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_fromDictDefersChecksInBulkOnly(capsules, controllerType, session, monkeypatch, bulk):
+  capsules['ClientCapsule'](session = session, name = 'c1').addToSession()
+  session.commit()
+  PortfolioCapsule = capsules['PortfolioCapsule']
+  isDeferred = []
+  originalFromDict = PortfolioCapsule.fromDict.__func__
+  def fromDict(cls, **kwargs):
+    isDeferred.append(capsule_deferred_consistency.hasDeferredConsistency(session = kwargs['session']))
+    return originalFromDict(cls, **kwargs)
+  monkeypatch.setattr(PortfolioCapsule, 'fromDict', classmethod(fromDict))
+  controllerType._controllerDataFromDict(session = session,
+                                         controllerDict = {'admin': {'client': {}, 'client_delete': {},
+                                                           'portfolio': {0: {'id': None, 'name': 'p1',
+                                                                             'client_id': None, 'client_name': 'c1'}},
+                                                           'portfolio_delete': {}}},
+                                         bulk = bulk)
+  assert isDeferred == [bulk]
+  assert session.scalars(sqla.select(PortfolioTable)).one().client.name == 'c1'
+
+def test_validationPropagatesOtherErrors(capsules, session, monkeypatch):
+  ClientCapsule = capsules['ClientCapsule']
+  PortfolioCapsule = capsules['PortfolioCapsule']
+  ClientCapsule(session = session, name = 'c1').addToSession()
+  session.commit()
+  sourceAndConsistencyCheckFncName = PortfolioCapsule._schema.getRelationship('client').sourceAndConsistencyCheckFncName
+  def failingCheck(self):
+    raise RuntimeError("db gone")
+  with pytest.raises(RuntimeError, match = "db gone"):
+    with capsule_deferred_consistency.deferredConsistency(session = session):
+      PortfolioCapsule(session = session, name = 'p1', client_name = 'c1')
+      monkeypatch.setattr(PortfolioCapsule, sourceAndConsistencyCheckFncName, failingCheck)
+
+def test_validationReportsMissingIds(capsules, session):
+  PortfolioCapsule = capsules['PortfolioCapsule']
+  with pytest.raises(capsule_deferred_consistency.ConsistencyViolationsError) as excInfo:
+    with capsule_deferred_consistency.deferredConsistency(session = session):
+      PortfolioCapsule(session = session, name = 'p1', client_id = uuid.uuid4())
+      PortfolioCapsule(session = session, name = 'p2', client_name = 'nope')
+  assert len(excInfo.value.violations) == 2
@@ -0,0 +1,51 @@
+import sys, os, time, threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench_setup
+from europy_db_controllers import controller
+from europy_db_controllers.entity_capsules import capsule_main
+
+
+def test_controllerSetupKeepsCapsuleStubsUnmaterialized():
+  callingGlobals = bench_setup.makeSchema(numberOfTables = 20, numberOfColumns = 4)
+  capsuleList = []
+  capsule_main.setupCapsules(declarativeBase = callingGlobals['BenchBase'],
+                             capsuleList = capsuleList,
+                             callingGlobals = callingGlobals,
+                             lazy = True)
+  controllerTypeNames, controllerKeyEnumType = bench_setup.makeControllers(
+                             callingGlobals = callingGlobals,
+                             capsuleList = capsuleList,
+                             tablesPerController = 4)
+  controller.setupControllerClass(callingGlobals = callingGlobals,
+                                  controllerTypeNames = controllerTypeNames,
+                                  controllerTypeEnumType = controllerKeyEnumType)
+  assert [capsuleType for capsuleType in capsuleList if capsuleType.isMaterialized] == []
+
+def test_concurrentLookupsWaitForMaterialization(monkeypatch):
+  callingGlobals = bench_setup.makeSchema(numberOfTables = 3, numberOfColumns = 2)
+  capsuleList = []
+  capsule_main.setupCapsules(declarativeBase = callingGlobals['BenchBase'],
+                             capsuleList = capsuleList,
+                             callingGlobals = callingGlobals,
+                             lazy = True)
+  # the json functions are added by the last setup phase - delayed
+  lastSetupPhase = capsule_main.CAPSULE_SETUP_PHASES[-1]
+  def slowSetupPhase(**kwargs):
+    time.sleep(0.1)
+    return lastSetupPhase(**kwargs)
+  monkeypatch.setattr(capsule_main, 'CAPSULE_SETUP_PHASES',
+                      capsule_main.CAPSULE_SETUP_PHASES[:-1] + [slowSetupPhase])
+  capsuleType = capsuleList[1]
+  errors = []
+  def lookUpGeneratedAttribute():
+    try:
+      capsuleType.toDict
+    except AttributeError as e:
+      errors.append(e)
+  threads = [threading.Thread(target = lookUpGeneratedAttribute) for _ in range(4)]
+  for thread in threads: thread.start()
+  for thread in threads: thread.join()
+  assert errors == []
+  assert capsuleType.isMaterialized
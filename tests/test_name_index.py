@@ -0,0 +1,40 @@
+import sqlalchemy as sqla
+from sqlalchemy import orm as sqla_orm
+
+from europy_db_controllers.entity_capsules import capsule_name_index
+
+
+class PolymorphicBase(sqla_orm.DeclarativeBase):
+  pass
+
+class AssetTable(PolymorphicBase):
+  __tablename__ = 'asset'
+  id = sqla.Column(sqla.Integer, primary_key = True)
+  name = sqla.Column(sqla.String, unique = True)
+  kind = sqla.Column(sqla.String)
+  __mapper_args__ = {'polymorphic_on': kind, 'polymorphic_identity': 'asset'}
+
+class BondTable(AssetTable):
+  __mapper_args__ = {'polymorphic_identity': 'bond'}
+
+
+def test_lookupCoversMappedSubclasses():
+  engine = sqla.create_engine('sqlite://')
+  PolymorphicBase.metadata.create_all(engine)
+  with sqla_orm.Session(engine) as session:
+    session.add_all([AssetTable(name = 'a1'), BondTable(name = 'b1')])
+    session.commit()
+    session.close()
+    nameIndex = capsule_name_index.enableNameIndex(session = session)
+    assets = session.scalars(sqla.select(AssetTable)).all()
+    assert [type(asset) for asset in nameIndex.getSqlalchemyTablesOfName(AssetTable, 'b1')] == [BondTable]
+    assert nameIndex.getSqlalchemyTablesOfName(BondTable, 'a1') == []
+    # rows added and renamed after the type is indexed
+    newBond = BondTable(name = 'b2')
+    session.add(newBond)
+    assert nameIndex.getSqlalchemyTablesOfName(AssetTable, 'b2') == [newBond]
+    newBond.name = 'b3'
+    assert nameIndex.getSqlalchemyTablesOfName(AssetTable, 'b2') == []
+    assert nameIndex.getSqlalchemyTablesOfName(AssetTable, 'b3') == [newBond]
+    del assets
+  engine.dispose()
@@ -0,0 +1,63 @@
+import uuid, random
+
+import pytest
+import sqlalchemy as sqla
+
+from conftest import TransactionTable
+
+
+@pytest.fixture
+def transactionIds(session):
+  session.add_all([TransactionTable(amount = float(i)) for i in range(7)])
+  session.commit()
+  result = list(session.scalars(sqla.select(TransactionTable.id).order_by(TransactionTable.amount)))
+  session.expunge_all()
+  return result
+
+@pytest.fixture
+def queries(session):
+  # statements executed on the engine of the session
+  result = []
+  def onExecute(*args):
+    result.append(args[2])
+  sqla.event.listen(session.get_bind(), 'before_cursor_execute', onExecute)
+  yield result
+  sqla.event.remove(session.get_bind(), 'before_cursor_execute', onExecute)
+
+def test_chunkedQueriesKeepInputOrder(capsules, session, transactionIds, queries, monkeypatch):
+  TransactionCapsule = capsules['TransactionCapsule']
+  monkeypatch.setattr(TransactionCapsule, '_ids_query_chunk_size', 3)
+  ids = list(transactionIds)
+  random.Random(5).shuffle(ids)
+  ids = ids + ids[:2] # duplicates are returned at each position
+  transactions = TransactionCapsule.queryByIds(session = session, ids = ids)
+  assert [transaction.id for transaction in transactions] == ids
+  assert transactions[0].sqlalchemyTable is transactions[-2].sqlalchemyTable
+  # distinct ids only, 3 per query
+  assert len(queries) == 3
+  assert all(query.count("?") <= 3 for query in queries)
+
+def test_idsInSessionAreNotQueried(capsules, session, transactionIds, queries):
+  TransactionCapsule = capsules['TransactionCapsule']
+  TransactionCapsule.queryByIds(session = session, ids = transactionIds[:4])
+  del queries[:]
+  transactions = TransactionCapsule.queryByIds(session = session, ids = list(reversed(transactionIds)))
+  assert [transaction.id for transaction in transactions] == list(reversed(transactionIds))
+  assert len(queries) == 1
+
+def test_refreshReloadsIdsInSession(capsules, session, transactionIds):
+  TransactionCapsule = capsules['TransactionCapsule']
+  transaction, = TransactionCapsule.queryByIds(session = session, ids = transactionIds[:1])
+  session.execute(sqla.update(TransactionTable).where(TransactionTable.id == transactionIds[0]).values(amount = -1.0),
+                  execution_options = {'synchronize_session': False})
+  assert TransactionCapsule.queryByIds(session = session, ids = transactionIds[:1])[0].amount == 0.0
+  assert TransactionCapsule.queryByIds(session = session, ids = transactionIds[:1], refresh = True)[0].amount == -1.0
+  assert transaction.amount == -1.0
+
+def test_missingIdsRaise(capsules, session, transactionIds):
+  TransactionCapsule = capsules['TransactionCapsule']
+  missingIds = [uuid.uuid4(), uuid.uuid4()]
+  with pytest.raises(Exception, match = "exactly '2' ids missing") as exceptionInfo:
+    TransactionCapsule.queryByIds(session = session, ids = transactionIds[:2] + missingIds)
+  assert all(str(missingId) in str(exceptionInfo.value) for missingId in missingIds)
+  assert not str(transactionIds[0]) in str(exceptionInfo.value)
@@ -0,0 +1,40 @@
+import sqlalchemy as sqla
+
+from europy_db_controllers import _controller_utils
+
+from conftest import ClientTable
+
+
+def iterClients(capsules, session):
+  ClientCapsule = capsules['ClientCapsule']
+  return _controller_utils.iterDbSqlalchemyTables(
+              capsuleType = ClientCapsule,
+              session = session,
+              orderByClauses = _controller_utils.getDbOrderByClauses(capsuleType = ClientCapsule,
+                                                                     sortedBy = ""))
+
+def test_autoflushUnchangedByPartlyConsumedIterator(capsules, session, monkeypatch):
+  monkeypatch.setattr(_controller_utils, 'STREAM_YIELD_PER', 2)
+  session.add_all([ClientTable(name = f"c{i}") for i in range(5)])
+  session.commit()
+  clients = iterClients(capsules = capsules, session = session)
+  assert next(clients).name == "c0"
+  assert session.autoflush
+  # pending rows are flushed by the next query
+  session.add(ClientTable(name = "new"))
+  assert session.scalars(sqla.select(ClientTable).where(ClientTable.name == "new")).one_or_none() is not None
+  assert [client.name for client in clients][:4] == ["c1", "c2", "c3", "c4"]
+  assert session.autoflush
+
+def test_interleavedIteratorsKeepAutoflush(capsules, session, monkeypatch):
+  monkeypatch.setattr(_controller_utils, 'STREAM_YIELD_PER', 2)
+  session.add_all([ClientTable(name = f"c{i}") for i in range(5)])
+  session.commit()
+  first = iterClients(capsules = capsules, session = session)
+  second = iterClients(capsules = capsules, session = session)
+  next(first)
+  next(second)
+  first.close()
+  assert session.autoflush
+  assert len(list(second)) == 4
+  assert session.autoflush
@@ -0,0 +1,44 @@
+import sqlalchemy as sqla
+
+from europy_db_controllers.entity_capsules import capsule_type_index
+
+from conftest import TransactionTable
+
+
+def test_streamedRowsAreNotRetained(session):
+  session.add_all([TransactionTable(amount = float(i)) for i in range(2000)])
+  session.commit()
+  session.close()
+  typeIndex = capsule_type_index.enableTypeIndex(session = session)
+  for transaction in session.scalars(sqla.select(TransactionTable)).yield_per(100):
+    pass
+  del transaction
+  assert len(typeIndex.getPersistentSqlalchemyTables(TransactionTable)) == len(session.identity_map) == 0
+
+def test_referencedRowsAreIndexed(session):
+  session.add_all([TransactionTable(amount = float(i)) for i in range(10)])
+  session.commit()
+  session.close()
+  typeIndex = capsule_type_index.enableTypeIndex(session = session)
+  transactions = session.scalars(sqla.select(TransactionTable)).all()
+  transactions[0].amount = -1.0
+  assert len(typeIndex.getPersistentSqlalchemyTables(TransactionTable)) == 10
+  assert typeIndex.getDirtySqlalchemyTables(TransactionTable) == [transactions[0]]
+
+def test_controllerEnablesTypeIndex(session, controllerType):
+  controllerType(session = session)
+  assert capsule_type_index.hasTypeIndex(session = session)
+
+def test_writesOfSessionsWithoutTypeIndexAreDismissed(session, monkeypatch):
+  session.add_all([TransactionTable(amount = float(i)) for i in range(2)])
+  session.commit()
+  otherSession = sqla.orm.Session(bind = session.get_bind())
+  capsule_type_index.enableTypeIndex(session = otherSession)
+  otherSession.scalars(sqla.select(TransactionTable)).all()[0].amount = -1.0
+  lookedUp = []
+  monkeypatch.setattr(capsule_type_index.sqlalchemy_orm, 'object_session', 
+                      lambda sqlalchemyTable: lookedUp.append(sqlalchemyTable))
+  transactions = session.scalars(sqla.select(TransactionTable)).all()
+  transactions[0].amount = -2.0
+  assert lookedUp == []
+  otherSession.close()